@@ -0,0 +1,349 @@
+import hashlib
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[float, float, float, float]
+
+# Manifeste du contrôle de précision d'une variante quantifiée, à côté du modèle
+GATE_SUFFIX = ".gate.json"
+
+
+def gate_manifest_path(artifact: Path) -> Path:
+    """Manifeste du contrôle de précision d'un modèle exporté"""
+    return artifact.with_name(artifact.name + GATE_SUFFIX)
+
+
+class InferenceBackend:
+    """
+    Backend d'inférence YOLO sur CPU
+
+    Le backend PyTorch charge directement `best.pt`. Les autres backends
+    exportent `best.pt` au premier démarrage dans un répertoire de cache
+    (une entrée par version des poids et taille d'entrée) puis chargent
+    l'export. Tous passent par ultralytics pour le pré/post-traitement,
+    les détections ont donc le même format quel que soit le backend.
+
+    Les variantes quantifiées (`gated`) ne sont pas exportées au démarrage:
+    elles sont construites par `quantization.py` et ne se chargent que si
+    leur manifeste atteste le contrôle de précision contre le modèle FP32.
+    """
+
+    name = "torch"
+    export_format: Optional[str] = None
+    export_suffix = ""
+    export_options: dict = {}
+    gated = False
+
+    def __init__(self, weights_path: str, imgsz: int = 640, cache_dir: Optional[str] = None):
+        """
+        Args:
+            weights_path: Chemin des poids PyTorch (best.pt)
+            imgsz: Taille d'entrée du modèle
+            cache_dir: Répertoire des modèles exportés (à côté des poids par défaut)
+        """
+        self.weights_path = Path(weights_path)
+        self.imgsz = imgsz
+        self.cache_dir = Path(cache_dir) if cache_dir else self.weights_path.parent / "cache"
+        self.model = None
+        # Manifeste du contrôle de précision (variantes quantifiées)
+        self.manifest: Optional[dict] = None
+
+    def weights_digest(self) -> str:
+        """Empreinte des poids: identifie une version du modèle"""
+        return hashlib.sha1(self.weights_path.read_bytes()).hexdigest()[:12]
+
+    def artifact_path(self) -> Path:
+        """Chemin du modèle chargé par ce backend"""
+        if self.export_format is None:
+            return self.weights_path
+        return self.cache_dir / f"{self.weights_path.stem}-{self.weights_digest()}-{self.imgsz}{self.export_suffix}"
+
+    def prepare(self) -> Path:
+        """Exporte le modèle si l'export n'est pas déjà en cache"""
+        if self.gated:
+            return self.check_gate()
+        artifact = self.artifact_path()
+        if artifact.exists():
+            return artifact
+        return self.export(artifact)
+
+    def export(self, artifact: Path) -> Path:
+        """Exporte `best.pt` vers le chemin du cache"""
+        from ultralytics import YOLO
+
+        logger.info(f"Export du modèle {self.weights_path} au format {self.export_format}...")
+        # Export à batch dynamique pour le micro-batching
+        exported = Path(YOLO(str(self.weights_path)).export(
+            format=self.export_format, imgsz=self.imgsz, dynamic=True, **self.export_options
+        ))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(exported), str(artifact))
+        logger.info(f"Modèle exporté en cache: {artifact}")
+        return artifact
+
+    def check_gate(self) -> Path:
+        """
+        Vérifie qu'une variante quantifiée a passé le contrôle de précision
+
+        Raises:
+            RuntimeError: Variante non construite ou refusée par le contrôle
+        """
+        artifact = self.artifact_path()
+        manifest_path = gate_manifest_path(artifact)
+        if not artifact.exists() or not manifest_path.exists():
+            raise RuntimeError(
+                f"Variante {self.name} absente de {self.cache_dir}: la construire avec "
+                f"`python quantization.py build --variant {self.name}`"
+            )
+        manifest = json.loads(manifest_path.read_text())
+        if not manifest.get("passed"):
+            failures = "; ".join(manifest.get("failures", []))
+            raise RuntimeError(f"Variante {self.name} refusée par le contrôle de précision: {failures}")
+        self.manifest = manifest
+        return artifact
+
+    def load(self) -> dict:
+        """
+        Charge le modèle (export au besoin)
+
+        Returns:
+            Durées d'import des modules lourds et de chargement des poids (ms)
+        """
+        start_time = time.perf_counter()
+        # Import paresseux: ultralytics (et torch) ne sont chargés qu'ici
+        from ultralytics import YOLO
+        imports_ms = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        artifact = self.prepare()
+        self.model = YOLO(str(artifact), task="detect")
+        weights_ms = (time.perf_counter() - start_time) * 1000
+
+        logger.info(f"Modèle chargé avec le backend {self.name}: {artifact}")
+        return {"imports_ms": round(imports_ms, 1), "weights_ms": round(weights_ms, 1)}
+
+    def warmup(self, runs: int = 3, frame_shape: Sequence[int] = (480, 640), batch_size: int = 1) -> float:
+        """
+        Inférences de chauffe à la taille des frames de production
+
+        Le premier appel initialise le graphe, les allocateurs et les caches du
+        runtime: sans chauffe, ce coût est payé par les premières frames réelles.
+
+        Args:
+            runs: Nombre d'inférences sur une frame seule
+            frame_shape: Taille des frames de production (hauteur, largeur)
+            batch_size: Taille de batch maximale, chauffée par un appel supplémentaire
+
+        Returns:
+            Durée totale de la chauffe (ms)
+        """
+        start_time = time.perf_counter()
+        frame = np.zeros((int(frame_shape[0]), int(frame_shape[1]), 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.predict([frame])
+        if runs > 0 and batch_size > 1:
+            self.predict([frame] * batch_size)
+        return (time.perf_counter() - start_time) * 1000
+
+    def predict(self, images: List[np.ndarray], imgsz: Optional[int] = None) -> List[Any]:
+        """
+        Inférence sur un batch d'images BGR, renvoie les résultats ultralytics
+
+        Args:
+            images: Images BGR
+            imgsz: Taille d'entrée pour cet appel (celle du backend par défaut),
+                par exemple réduite pour des recadrages
+        """
+        return self.model(images, imgsz=imgsz or self.imgsz)
+
+
+class OnnxBackend(InferenceBackend):
+    """Inférence avec ONNX Runtime"""
+    name = "onnx"
+    export_format = "onnx"
+    export_suffix = ".onnx"
+
+
+class OpenVinoBackend(InferenceBackend):
+    """Inférence avec OpenVINO (répertoire *_openvino_model)"""
+    name = "openvino"
+    export_format = "openvino"
+    export_suffix = "_openvino_model"
+
+
+class OnnxInt8Backend(OnnxBackend):
+    """
+    ONNX Runtime, modèle quantifié INT8 (quantification statique)
+
+    Poids et activations en INT8, échelles calibrées sur des frames réelles
+    par `quantization.py build`.
+    """
+    name = "onnx-int8"
+    export_suffix = "-int8.onnx"
+    gated = True
+
+
+class OpenVinoFp16Backend(OpenVinoBackend):
+    """
+    OpenVINO, poids FP16
+
+    Réservé aux CPU qui calculent nativement en FP16 (AVX512-FP16, ARM):
+    ailleurs, OpenVINO repasse en FP32 et seul le fichier est plus petit.
+    """
+    name = "openvino-fp16"
+    export_suffix = "-fp16_openvino_model"
+    export_options = {"half": True}
+    gated = True
+
+
+class _StubBoxes:
+    """Boîtes au format ultralytics (`data`: x1, y1, x2, y2, confiance, classe)"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class _StubResult:
+    def __init__(self, data: np.ndarray):
+        self.boxes = _StubBoxes(data)
+
+
+class StubBackend(InferenceBackend):
+    """
+    Modèle factice pour les benchmarks et les tests de charge
+
+    Ne charge ni ultralytics ni poids: chaque appel attend un temps fixe
+    plus un temps par image (sans tenir le GIL, comme un vrai runtime), puis
+    renvoie un ballon au centre de chaque image. Les mesures de l'API isolent
+    ainsi le coût du serveur (décodage, batching, file, post-traitement).
+    """
+    name = "stub"
+    # Coût simulé d'un appel au modèle (ms)
+    latency_ms = 5.0
+    per_image_ms = 1.0
+
+    def prepare(self) -> Path:
+        return self.weights_path
+
+    def weights_digest(self) -> str:
+        return super().weights_digest() if self.weights_path.exists() else "stub"
+
+    def load(self) -> dict:
+        self.model = self
+        logger.info("Modèle factice chargé (backend stub)")
+        return {"imports_ms": 0.0, "weights_ms": 0.0}
+
+    def predict(self, images: List[np.ndarray], imgsz: Optional[int] = None) -> List[Any]:
+        time.sleep((self.latency_ms + self.per_image_ms * len(images)) / 1000)
+        results = []
+        for image in images:
+            height, width = image.shape[:2]
+            size = min(height, width) / 10
+            results.append(_StubResult(np.array(
+                [[width / 2 - size, height / 2 - size, width / 2 + size, height / 2 + size, 0.9, 0.0]],
+                dtype=np.float32
+            )))
+        return results
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (InferenceBackend, OnnxBackend, OpenVinoBackend, OnnxInt8Backend, OpenVinoFp16Backend,
+                    StubBackend)
+}
+
+
+def create_backend(name: str, weights_path: str, imgsz: int = 640,
+                   cache_dir: Optional[str] = None) -> InferenceBackend:
+    """Instancie le backend demandé par la configuration"""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend d'inférence inconnu: {name} (attendu: {', '.join(BACKENDS)})")
+    return BACKENDS[name](weights_path, imgsz=imgsz, cache_dir=cache_dir)
+
+
+def detections_array(result: Any) -> np.ndarray:
+    """
+    Toutes les détections d'un résultat ultralytics, en un seul transfert vers l'hôte
+
+    Returns:
+        Tableau (N, 6) float32: x1, y1, x2, y2, confiance, classe
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.empty((0, 6), dtype=np.float32)
+    data = boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float32)
+    if data.shape[1] == 7:
+        # Résultat de suivi: colonne d'identifiant avant la confiance
+        data = data[:, [0, 1, 2, 3, 5, 6]]
+    return data
+
+
+def select_detections(detections: np.ndarray, classes: Optional[Sequence[int]] = None,
+                      min_confidence: float = 0.0, top_k: Optional[int] = None) -> np.ndarray:
+    """
+    Filtre les détections par classe et confiance puis garde les `top_k` plus confiantes
+
+    Opérations vectorisées sur tout le tableau: le coût ne dépend pas d'une
+    boucle Python sur les boîtes candidates.
+
+    Args:
+        detections: Tableau (N, 6) de `detections_array`
+        classes: Classes retenues (toutes par défaut)
+        min_confidence: Confiance minimale
+        top_k: Nombre maximal de détections (toutes par défaut)
+
+    Returns:
+        Tableau (K, 6) trié par confiance décroissante
+    """
+    mask = detections[:, 4] >= min_confidence
+    if classes is not None:
+        mask &= np.isin(detections[:, 5], classes)
+    selected = detections[mask]
+
+    confidences = -selected[:, 4]
+    if top_k is not None and top_k < len(selected):
+        # Sélection partielle puis tri des seules k meilleures
+        candidates = np.argpartition(confidences, top_k - 1)[:top_k]
+        order = candidates[np.argsort(confidences[candidates], kind="stable")]
+    else:
+        order = np.argsort(confidences, kind="stable")
+    return selected[order]
+
+
+def extract_top_detection(result: Any) -> Optional[Tuple[Box, float]]:
+    """
+    Extrait la détection la plus confiante d'un résultat ultralytics
+
+    Returns:
+        Tuple ((x1, y1, x2, y2), confiance) ou None si aucune détection
+    """
+    top = select_detections(detections_array(result), top_k=1)
+    if len(top) == 0:
+        return None
+    x1, y1, x2, y2, confidence = top[0, :5].tolist()
+    return (x1, y1, x2, y2), confidence
+
+
+def extract_top_box(result: Any) -> Optional[Box]:
+    """
+    Extrait la bbox de la détection la plus confiante d'un résultat ultralytics
+
+    Returns:
+        Tuple (x1, y1, x2, y2) ou None si aucune détection
+    """
+    detection = extract_top_detection(result)
+    return detection[0] if detection is not None else None
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+from inference_pool import PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Regroupe les frames de requêtes concurrentes pour un seul appel au modèle
+
+    Les frames soumises sont collectées pendant une courte fenêtre (ou jusqu'à
+    la taille maximale du batch), traitées ensemble par `run_batch`, puis
+    chaque résultat est renvoyé à la requête qui l'a soumis.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        observer: Optional[Callable[[int, List[float]], None]] = None
+    ):
+        """
+        Args:
+            run_batch: Coroutine qui traite une liste d'éléments et renvoie
+                une liste de résultats dans le même ordre
+            max_batch_size: Nombre maximal de frames par batch
+            max_wait_ms: Durée maximale d'attente pour remplir un batch
+            observer: Appelé à chaque batch lancé avec sa taille et le temps
+                passé par chaque frame à attendre le batch (s)
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size doit être >= 1")
+
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000
+        self.observer = observer
+
+        # Éléments en attente: (élément, future, heure de soumission)
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._not_empty: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatching: Set[asyncio.Task] = set()
+
+        # Statistiques de remplissage des batches
+        self.batch_count = 0
+        self.frame_count = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.size_histogram = [0] * (max_batch_size + 1)
+
+    async def start(self):
+        """Démarre la tâche de collecte des batches"""
+        self._not_empty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._worker = asyncio.create_task(self._collect())
+        logger.info(
+            f"Batching démarré (taille max: {self.max_batch_size}, "
+            f"fenêtre: {self.max_wait * 1000:.1f}ms)"
+        )
+
+    async def stop(self):
+        """Arrête la collecte et annule les frames en attente"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # Les batches en cours annulent eux-mêmes leurs futures (voir _dispatch)
+        dispatching = list(self._dispatching)
+        for task in dispatching:
+            task.cancel()
+        await asyncio.gather(*dispatching, return_exceptions=True)
+
+        for _, future, _ in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Soumet une frame au prochain batch et attend son résultat
+
+        Args:
+            item: Élément à traiter (image)
+
+        Returns:
+            Résultat correspondant à cet élément
+        """
+        if self._worker is None:
+            raise RuntimeError("Le scheduler de batching n'est pas démarré")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self._not_empty.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        """
+        Soumet plusieurs frames et attend tous leurs résultats
+
+        Les frames peuvent partir dans des batches différents: on attend la
+        fin de tous avant de lever la première erreur, pour que l'appelant ne
+        réutilise pas une frame qu'un autre batch est encore en train de lire.
+        """
+        results = await asyncio.gather(*(self.submit(item) for item in items), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
+
+    async def _collect(self):
+        """Boucle de collecte: attend la fenêtre ou un batch plein puis lance le traitement"""
+        while True:
+            await self._not_empty.wait()
+
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if not self._pending:
+                self._not_empty.clear()
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+
+            # Ignorer les requêtes abandonnées entre-temps
+            batch = [entry for entry in batch if not entry[1].done()]
+            if batch:
+                if self.observer is not None:
+                    now = time.perf_counter()
+                    self.observer(len(batch), [now - submitted_at for _, _, submitted_at in batch])
+                # Le batch est traité en tâche de fond pour que la collecte
+                # continue pendant l'inférence (plusieurs workers possibles)
+                task = asyncio.create_task(self._dispatch(batch))
+                self._dispatching.add(task)
+                task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        """Traite un batch et renvoie chaque résultat à sa requête"""
+        start_time = time.perf_counter()
+        try:
+            results = await self.run_batch([item for item, _, _ in batch])
+        except asyncio.CancelledError:
+            # Arrêt pendant l'inférence: les requêtes du batch échouent au lieu d'attendre indéfiniment
+            for _, future, _ in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        except Exception as e:
+            if not isinstance(e, PoolSaturatedError):
+                logger.error(f"Erreur lors du traitement du batch: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._record(len(batch), (time.perf_counter() - start_time) * 1000)
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size: int, duration_ms: float):
+        """Met à jour les statistiques de remplissage"""
+        self.batch_count += 1
+        self.frame_count += size
+        self.last_batch_size = size
+        self.last_batch_ms = duration_ms
+        self.size_histogram[size] += 1
+
+    @property
+    def pending(self) -> int:
+        """Nombre de frames en attente du prochain batch"""
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        """Retourne les statistiques de remplissage des batches"""
+        mean_size = self.frame_count / self.batch_count if self.batch_count else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.max_wait * 1000,
+            "batches": self.batch_count,
+            "frames": self.frame_count,
+            "pending": len(self._pending),
+            "dispatching": len(self._dispatching),
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "mean_batch_size": round(mean_size, 2),
+            "mean_fill_ratio": round(mean_size / self.max_batch_size, 3),
+            "size_histogram": {
+                str(size): count
+                for size, count in enumerate(self.size_histogram)
+                if count
+            }
+        }
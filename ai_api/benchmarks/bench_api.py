@@ -0,0 +1,288 @@
+"""
+Benchmark reproductible de l'API de détection
+
+Usage:
+    python benchmarks/bench_api.py --backend stub --output bench-stub.json
+    python benchmarks/bench_api.py --backend torch --weights ./models/best.pt --output bench-torch.json
+    python benchmarks/compare_results.py bench-avant.json bench-apres.json
+
+L'application FastAPI tourne dans le processus du benchmark (transport ASGI,
+sans réseau): les latences ne mélangent ni réseau, ni encodage côté client,
+ni caméra. `/detect_ball` est mesuré pour plusieurs tailles d'image et
+niveaux de concurrence (p50/p95/p99, débit), puis le décodage, l'inférence,
+le post-traitement et le calcul d'IoU sont mesurés séparément.
+
+Le backend `stub` (modèle factice à coût fixe) isole le coût du serveur; un
+vrai backend mesure le chemin complet. Les frames sont synthétiques et
+générées avec une graine fixe; la configuration (variables d'environnement
+lues par l'API, commit git, machine) est écrite avec les résultats.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compare_backends import percentile  # noqa: E402
+
+DEFAULT_SIZES = ["320x240", "640x480", "1280x720"]
+DEFAULT_CONCURRENCY = [1, 4, 16]
+TARGET_BBOX = {"x1": 50, "y1": 300, "x2": 150, "y2": 400}
+# Variables d'environnement de l'API recopiées dans les résultats
+API_SETTINGS = (
+    "INFERENCE_BACKEND", "MODEL_INPUT_SIZE", "BATCH_MAX_SIZE", "BATCH_WINDOW_MS",
+    "INFERENCE_POOL_MODE", "INFERENCE_WORKERS", "INFERENCE_MAX_QUEUE", "WARMUP_RUNS"
+)
+
+
+def parse_size(value: str):
+    width, height = (int(v) for v in value.lower().split("x"))
+    return width, height
+
+
+def latency_stats(latencies_ms) -> dict:
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(float(np.mean(latencies_ms)), 4),
+        "p50_ms": round(percentile(latencies_ms, 50), 4),
+        "p95_ms": round(percentile(latencies_ms, 95), 4),
+        "p99_ms": round(percentile(latencies_ms, 99), 4),
+        "max_ms": round(max(latencies_ms), 4)
+    }
+
+
+def make_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Frame synthétique déterministe: fond bruité et un ballon"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (9, 9), 0)
+    radius = max(min(width, height) // 16, 4)
+    cv2.circle(frame, (width // 2, height // 2), radius, (255, 255, 255), -1)
+    return frame
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = 90) -> bytes:
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Encodage JPEG impossible")
+    return encoded.tobytes()
+
+
+def git_revision() -> dict:
+    root = Path(__file__).resolve().parent.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def time_call(fn, repeat: int, warmup: int = 3) -> dict:
+    """Latences d'une fonction appelée `repeat` fois après `warmup` appels de chauffe"""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latency_stats(latencies)
+
+
+async def bench_endpoint(client, payload: bytes, concurrency: int, requests_count: int) -> dict:
+    """
+    Boucle fermée: `concurrency` clients envoient `requests_count` requêtes au total
+
+    Les réponses 503 (pool saturé) sont comptées à part et exclues des latences.
+    """
+    data = {"target_bbox": json.dumps(TARGET_BBOX)}
+    latencies, statuses = [], {}
+    remaining = requests_count
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start_time = time.perf_counter()
+            response = await client.post(
+                "/detect_ball", files={"file": ("frame.jpg", payload, "image/jpeg")}, data=data
+            )
+            elapsed = (time.perf_counter() - start_time) * 1000
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                latencies.append(elapsed)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_s = time.perf_counter() - start_time
+    return {
+        "concurrency": concurrency,
+        "requests": requests_count,
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(503, 0),
+        "errors": sum(count for status, count in statuses.items() if status not in (200, 503)),
+        "throughput_rps": round(statuses.get(200, 0) / wall_s, 2),
+        **(latency_stats(latencies) if latencies else {})
+    }
+
+
+async def run_api_benchmarks(main, sizes, concurrency_levels, requests_count: int, warmup: int) -> list:
+    """Mesure /detect_ball dans le processus, pour chaque taille d'image et niveau de concurrence"""
+    import httpx
+
+    await main.app.router.startup()
+    try:
+        while not main.readiness["ready"]:
+            if main.readiness["error"]:
+                raise RuntimeError(f"Démarrage de l'API en échec: {main.readiness['error']}")
+            await asyncio.sleep(0.05)
+
+        results = []
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            for size in sizes:
+                width, height = parse_size(size)
+                payload = encode_jpeg(make_frame(width, height))
+                await bench_endpoint(client, payload, 1, warmup)
+                for concurrency in concurrency_levels:
+                    entry = await bench_endpoint(client, payload, concurrency, requests_count)
+                    entry["size"] = size
+                    results.append(entry)
+                    print(f"  {size:>9} c={concurrency:<3} {entry['throughput_rps']:>8.1f} req/s  "
+                          f"p50 {entry.get('p50_ms', 0):>8.2f}  p95 {entry.get('p95_ms', 0):>8.2f}  "
+                          f"p99 {entry.get('p99_ms', 0):>8.2f} ms  503: {entry['rejected']}")
+        return results
+    finally:
+        await main.app.router.shutdown()
+
+
+def run_micro_benchmarks(main, args, sizes) -> dict:
+    """Décodage, inférence, post-traitement et IoU mesurés séparément"""
+    from backends import create_backend, detections_array, select_detections
+    from geometry import iou_matrix, paired_iou
+    from ingest import FrameDecoder
+
+    decoder = FrameDecoder(target_size=args.imgsz)
+    backend = create_backend(args.backend, args.weights, imgsz=args.imgsz, cache_dir=args.cache_dir)
+    backend.load()
+    target = main.BoundingBox(**TARGET_BBOX)
+    micro = {"decode": {}, "inference": {}, "postprocess": {}}
+
+    for size in sizes:
+        width, height = parse_size(size)
+        frame = make_frame(width, height)
+        payload = encode_jpeg(frame)
+        micro["decode"][size] = time_call(
+            lambda: decoder.release(decoder.decode(payload)), args.micro_repeat
+        )
+        micro["inference"][size] = time_call(lambda: backend.predict([frame]), args.micro_repeat)
+        result = backend.predict([frame])[0]
+        micro["postprocess"][size] = time_call(
+            lambda: main.build_detection_response(
+                select_detections(detections_array(result), top_k=1), target
+            ),
+            args.micro_repeat
+        )
+
+    width, height = parse_size(sizes[0])
+    frames = [make_frame(width, height, seed) for seed in range(main.BATCH_MAX_SIZE)]
+    micro["inference"][f"{sizes[0]}_batch{len(frames)}"] = time_call(
+        lambda: backend.predict(frames), max(args.micro_repeat // 4, 5)
+    )
+
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 600, size=(1000, 2))
+    boxes = np.hstack([corners, corners + rng.uniform(10, 80, size=(1000, 2))])
+    targets = boxes[::-1].copy()
+    micro["iou"] = {
+        "hit_test_1x2": time_call(lambda: iou_matrix(boxes[0], targets[:2]), args.micro_repeat * 10),
+        "paired_1000": time_call(lambda: paired_iou(boxes, targets), args.micro_repeat)
+    }
+    return micro
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reproductible de l'API de détection")
+    parser.add_argument("--backend", default="stub", help="Backend d'inférence (stub: modèle factice)")
+    parser.add_argument("--weights", default="./models/best.pt", help="Poids PyTorch (best.pt)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Tailles d'image LARGEURxHAUTEUR")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes par mesure")
+    parser.add_argument("--warmup", type=int, default=10, help="Requêtes de chauffe par taille d'image")
+    parser.add_argument("--micro-repeat", type=int, default=100, help="Répétitions des micro-benchmarks")
+    parser.add_argument("--stub-latency-ms", type=float, default=None, help="Coût fixe d'un appel au modèle factice")
+    parser.add_argument("--stub-per-image-ms", type=float, default=None, help="Coût par image du modèle factice")
+    parser.add_argument("--skip-api", action="store_true", help="Micro-benchmarks seulement")
+    parser.add_argument("--skip-micro", action="store_true", help="Benchmark de l'API seulement")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    # L'API lit sa configuration à l'import
+    os.environ["INFERENCE_BACKEND"] = args.backend
+    os.environ["MODEL_PATH"] = args.weights
+    os.environ["MODEL_INPUT_SIZE"] = str(args.imgsz)
+    if args.cache_dir:
+        os.environ["MODEL_CACHE_DIR"] = args.cache_dir
+
+    from backends import StubBackend
+    if args.stub_latency_ms is not None:
+        StubBackend.latency_ms = args.stub_latency_ms
+    if args.stub_per_image_ms is not None:
+        StubBackend.per_image_ms = args.stub_per_image_ms
+
+    import main as api
+
+    results = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__
+        },
+        "config": {
+            **{name.lower(): getattr(api, name) for name in API_SETTINGS},
+            "stub_latency_ms": StubBackend.latency_ms if args.backend == "stub" else None,
+            "stub_per_image_ms": StubBackend.per_image_ms if args.backend == "stub" else None,
+            "requests": args.requests,
+            "sizes": args.sizes,
+            "concurrency": args.concurrency
+        }
+    }
+
+    if not args.skip_api:
+        print(f"🔄 /detect_ball (backend {args.backend})...")
+        results["api"] = asyncio.run(
+            run_api_benchmarks(api, args.sizes, args.concurrency, args.requests, args.warmup)
+        )
+    if not args.skip_micro:
+        print("🔄 Micro-benchmarks...")
+        results["micro"] = run_micro_benchmarks(api, args, args.sizes)
+        for stage, entries in results["micro"].items():
+            for name, entry in entries.items():
+                print(f"  {stage:<12} {name:<18} p50 {entry['p50_ms']:>9.4f}  p95 {entry['p95_ms']:>9.4f} ms")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
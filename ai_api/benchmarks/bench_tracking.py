@@ -0,0 +1,151 @@
+"""
+Suivi multi-sessions: BallTracker (un filtre OpenCV par piste) contre BatchedBallTracker
+
+Usage:
+    python benchmarks/bench_tracking.py --sessions 500 --frames 300
+    python benchmarks/bench_tracking.py --logs session1.jsonl session2.jsonl --sessions 200
+
+Chaque session rejoue une séquence de détections: un journal JSON Lines de
+`video_processing.py` (lignes `detection`, frames sans ligne = pas de
+ballon), ou une trajectoire synthétique (graine fixe, détections manquées
+aléatoires). Les journaux sont répartis sur les sessions, décalés pour ne
+pas être synchrones. Les trackers reçoivent les mêmes mesures: les
+écarts de résultats et le temps par frame (toutes sessions) sont affichés.
+`per_track` est le chemin de l'API (`update_one`, une session à la fois,
+les frames des sessions arrivant séparément).
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compare_backends import percentile  # noqa: E402
+from tracking import BallTracker, BatchedBallTracker  # noqa: E402
+
+
+def load_sequence(path: str) -> np.ndarray:
+    """Bbox par frame d'un journal de session, (N, 4), NaN sans détection"""
+    detections = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") == "detection":
+                detections[record["frame"]] = (record["x1"], record["y1"], record["x2"], record["y2"])
+    boxes = np.full((max(detections, default=-1) + 1, 4), np.nan)
+    for frame, box in detections.items():
+        boxes[frame] = box
+    return boxes
+
+
+def synthetic_sequences(sessions: int, frames: int, miss_rate: float, seed: int = 0) -> np.ndarray:
+    """Trajectoires de ballon bruitées, (sessions, frames, 4)"""
+    rng = np.random.default_rng(seed)
+    position = rng.uniform(50, 550, size=(sessions, 2))
+    velocity = rng.normal(0, 6, size=(sessions, 2))
+    boxes = np.empty((sessions, frames, 4))
+    for frame in range(frames):
+        position += velocity + rng.normal(0, 2, size=(sessions, 2))
+        # Rebond sur les bords de l'image
+        velocity[(position < 0) | (position > 600)] *= -1
+        boxes[:, frame] = np.hstack([position - 25, position + 25])
+    boxes[rng.random((sessions, frames)) < miss_rate] = np.nan
+    return boxes
+
+
+def replay(sequences: np.ndarray) -> dict:
+    sessions, frames = sequences.shape[:2]
+    trackers = [BallTracker() for _ in range(sessions)]
+    batched = BatchedBallTracker()
+    tracks = [batched.add(now=0.0) for _ in range(sessions)]
+    per_track = BatchedBallTracker()
+    per_track_rows = [per_track.add(now=0.0) for _ in range(sessions)]
+
+    single_ms, batched_ms, per_track_ms = [], [], []
+    max_error = 0.0
+    mismatches = 0
+    for frame in range(frames):
+        boxes = sequences[:, frame]
+        started_at = time.perf_counter()
+        expected = [
+            tracker.update(None if np.isnan(box[0]) else dict(zip(("x1", "y1", "x2", "y2"), box)))
+            for tracker, box in zip(trackers, boxes)
+        ]
+        single_ms.append((time.perf_counter() - started_at) * 1000)
+
+        started_at = time.perf_counter()
+        result, is_prediction = batched.update(tracks, boxes, now=float(frame))
+        batched_ms.append((time.perf_counter() - started_at) * 1000)
+
+        started_at = time.perf_counter()
+        for track, box in zip(per_track_rows, boxes.tolist()):
+            per_track.update_one(track, None if box[0] != box[0] else box, now=float(frame))
+        per_track_ms.append((time.perf_counter() - started_at) * 1000)
+
+        for state, prediction, reference in zip(result, is_prediction, expected):
+            mismatches += (
+                int(state[0]) != reference["x"] or int(state[1]) != reference["y"]
+                or bool(prediction) != reference["is_prediction"]
+            )
+            max_error = max(max_error, abs(float(state[2]) - float(reference["vx"])),
+                            abs(float(state[3]) - float(reference["vy"])))
+        states = np.array([tracker.kalman.statePost.ravel() for tracker in trackers])
+        max_error = max(max_error, float(np.abs(states - batched.state[tracks]).max()),
+                        float(np.abs(states - per_track.state[per_track_rows]).max()))
+
+    def summary(latencies):
+        return {
+            "mean_ms": round(float(np.mean(latencies)), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3)
+        }
+
+    return {
+        "sessions": sessions,
+        "frames": frames,
+        "ball_tracker": summary(single_ms),
+        "batched": summary(batched_ms),
+        "per_track": summary(per_track_ms),
+        "speedup": round(float(np.mean(single_ms)) / max(float(np.mean(batched_ms)), 1e-9), 1),
+        "max_state_error": max_error,
+        "position_mismatches": mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BallTracker et BatchedBallTracker")
+    parser.add_argument("--logs", nargs="*", default=[], help="Journaux JSON Lines de video_processing.py")
+    parser.add_argument("--sessions", type=int, default=500, help="Nombre de sessions simultanées")
+    parser.add_argument("--frames", type=int, default=300, help="Frames par session (synthétique)")
+    parser.add_argument("--miss-rate", type=float, default=0.2, help="Part de frames sans détection (synthétique)")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    if args.logs:
+        recorded = [load_sequence(path) for path in args.logs]
+        frames = min(len(boxes) for boxes in recorded)
+        sequences = np.stack([
+            np.roll(recorded[i % len(recorded)][:frames], i // len(recorded), axis=0)
+            for i in range(args.sessions)
+        ])
+    else:
+        sequences = synthetic_sequences(args.sessions, args.frames, args.miss_rate)
+
+    results = replay(sequences)
+    print(f"{results['sessions']} sessions x {results['frames']} frames")
+    for name in ("ball_tracker", "batched", "per_track"):
+        stats = results[name]
+        print(f"  {name:<13} moyenne {stats['mean_ms']:8.3f} ms  p50 {stats['p50_ms']:8.3f} ms  "
+              f"p99 {stats['p99_ms']:8.3f} ms par frame")
+    print(f"  gain x{results['speedup']}, écart max {results['max_state_error']:.2e}, "
+          f"positions entières différentes (arrondi float32): {results['position_mismatches']}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
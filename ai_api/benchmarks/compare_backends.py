@@ -0,0 +1,114 @@
+"""
+Comparaison des backends d'inférence (latence et concordance des détections)
+
+Usage:
+    python benchmarks/compare_backends.py --images ./frames --backends torch onnx openvino
+
+Le premier backend sert de référence: pour les autres, on mesure la part
+d'images où la décision "ballon détecté" est identique et l'IoU moyen de
+la bbox détectée par rapport à la référence.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backends import BACKENDS, create_backend, extract_top_box  # noqa: E402
+from geometry import paired_iou  # noqa: E402
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_backend(name, weights, images, imgsz, cache_dir, warmup):
+    """Charge un backend et renvoie (latences ms, bbox par image)"""
+    backend = create_backend(name, weights, imgsz=imgsz, cache_dir=cache_dir)
+    backend.load()
+
+    for _ in range(warmup):
+        backend.predict([images[0]])
+
+    latencies, boxes = [], []
+    for image in images:
+        start_time = time.perf_counter()
+        result = backend.predict([image])[0]
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        boxes.append(extract_top_box(result))
+    return latencies, boxes
+
+
+def compare(reference_boxes, boxes) -> dict:
+    """Concordance des détections d'un backend avec la référence"""
+    same_decision = sum((a is None) == (b is None) for a, b in zip(reference_boxes, boxes))
+    pairs = [(a, b) for a, b in zip(reference_boxes, boxes) if a is not None and b is not None]
+    ious = paired_iou([a for a, _ in pairs], [b for _, b in pairs]).tolist() if pairs else []
+    return {
+        "decision_agreement": round(same_decision / len(boxes), 4),
+        "mean_iou": round(statistics.mean(ious), 4) if ious else None,
+        "min_iou": round(min(ious), 4) if ious else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare la latence et les détections des backends d'inférence")
+    parser.add_argument("--images", required=True, help="Répertoire d'images de test")
+    parser.add_argument("--weights", default="./models/best.pt", help="Poids PyTorch (best.pt)")
+    parser.add_argument("--backends", nargs="+", default=[name for name in BACKENDS if name != "stub"],
+                        choices=list(BACKENDS))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    images = [cv2.imread(str(p)) for p in paths]
+    if not images:
+        print(f"❌ Aucune image trouvée dans {args.images}")
+        return
+
+    print(f"📷 {len(images)} images, backends: {', '.join(args.backends)}")
+    results = {}
+    reference_boxes = None
+    for name in args.backends:
+        print(f"🔄 Backend {name}...")
+        latencies, boxes = run_backend(name, args.weights, images, args.imgsz, args.cache_dir, args.warmup)
+        entry = {
+            "mean_ms": round(statistics.mean(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "detection_rate": round(sum(box is not None for box in boxes) / len(boxes), 4)
+        }
+        if reference_boxes is None:
+            reference_boxes = boxes
+        else:
+            entry.update(compare(reference_boxes, boxes))
+        results[name] = entry
+
+    print(f"\n{'backend':<10} {'mean':>8} {'p50':>8} {'p95':>8} {'détect.':>8} {'accord':>8} {'IoU moy':>8}")
+    for name, entry in results.items():
+        agreement = entry.get("decision_agreement")
+        mean_iou = entry.get("mean_iou")
+        print(f"{name:<10} {entry['mean_ms']:>8.2f} {entry['p50_ms']:>8.2f} {entry['p95_ms']:>8.2f} "
+              f"{entry['detection_rate']:>8.2%} "
+              f"{'réf.' if agreement is None else f'{agreement:.2%}':>8} "
+              f"{'-' if mean_iou is None else f'{mean_iou:.3f}':>8}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"images": len(images), "imgsz": args.imgsz, "backends": results}, indent=2))
+        print(f"\n💾 Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Comparaison de deux résultats de `bench_api.py` (par exemple deux commits)
+
+Usage:
+    python benchmarks/compare_results.py bench-avant.json bench-apres.json --threshold 10
+
+Chaque latence (p50/p95/p99) et chaque débit présents dans les deux fichiers
+est comparé; une variation défavorable au-delà du seuil est signalée comme
+régression (code de sortie 1 avec --fail-on-regression).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_KEYS = ("throughput_rps",)
+
+
+def flatten(results: dict) -> dict:
+    """Métriques comparables, indexées par un chemin lisible"""
+    metrics = {}
+    for entry in results.get("api", []):
+        prefix = f"api/{entry['size']}/c{entry['concurrency']}"
+        for key in LATENCY_KEYS + THROUGHPUT_KEYS:
+            if key in entry:
+                metrics[f"{prefix}/{key}"] = entry[key]
+    for stage, entries in results.get("micro", {}).items():
+        for name, entry in entries.items():
+            for key in LATENCY_KEYS:
+                metrics[f"micro/{stage}/{name}/{key}"] = entry[key]
+    return metrics
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    """
+    Returns:
+        Liste de (métrique, base, nouveau, variation %, régression)
+    """
+    base_metrics, new_metrics = flatten(base), flatten(new)
+    rows = []
+    for name in base_metrics:
+        if name not in new_metrics:
+            continue
+        before, after = base_metrics[name], new_metrics[name]
+        change = (after - before) / before * 100 if before else 0.0
+        # Latence: plus haut est pire; débit: plus bas est pire
+        worse = -change if name.endswith(THROUGHPUT_KEYS) else change
+        rows.append((name, before, after, change, worse > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare deux résultats de benchmark")
+    parser.add_argument("base", help="Résultats de référence (JSON)")
+    parser.add_argument("new", help="Nouveaux résultats (JSON)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Seuil de régression (%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    base = json.loads(Path(args.base).read_text())
+    new = json.loads(Path(args.new).read_text())
+    for label, results in (("base", base), ("new", new)):
+        meta = results.get("meta", {})
+        print(f"{label:<5} {meta.get('commit') or '?':.12}{' (modifié)' if meta.get('dirty') else ''} "
+              f"{meta.get('timestamp', '')} backend={results.get('config', {}).get('inference_backend')}")
+
+    rows = compare(base, new, args.threshold)
+    print(f"\n{'métrique':<48} {'base':>10} {'new':>10} {'écart':>8}")
+    for name, before, after, change, regression in rows:
+        print(f"{name:<48} {before:>10.3f} {after:>10.3f} {change:>+7.1f}%{'  ⚠️' if regression else ''}")
+
+    regressions = [row for row in rows if row[4]]
+    print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0f}% sur {len(rows)} métriques")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
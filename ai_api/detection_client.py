@@ -0,0 +1,176 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+import requests
+
+
+def fetch_config(url: str, timeout: float = 2.0) -> Optional[dict]:
+    """Paramètres annoncés par l'API (GET /config), None si indisponibles"""
+    try:
+        response = requests.get(url, timeout=timeout)
+        if response.ok:
+            return response.json()
+    except requests.RequestException:
+        pass
+    return None
+
+
+class DetectionResult:
+    """Réponse de l'API pour une frame, avec son heure de capture"""
+
+    __slots__ = ("seq", "captured_at", "sent_at", "received_at", "response", "context", "error")
+
+    def __init__(self, seq: int, captured_at: float, sent_at: float, context: Any = None):
+        self.seq = seq
+        self.captured_at = captured_at
+        self.sent_at = sent_at
+        self.received_at: Optional[float] = None
+        self.response: Optional[dict] = None
+        self.context = context
+        self.error: Optional[str] = None
+
+    @property
+    def latency(self) -> float:
+        """Aller-retour de la requête (s)"""
+        return self.received_at - self.sent_at
+
+    @property
+    def delay(self) -> float:
+        """Délai de bout en bout: de la capture de la frame à la réception du résultat (s)"""
+        return self.received_at - self.captured_at
+
+
+class AsyncDetectionClient:
+    """
+    Client HTTP non bloquant pour la boucle d'affichage
+
+    Les frames sont envoyées depuis des threads de fond, avec au plus
+    `max_in_flight` requêtes en cours: quand la limite est atteinte, la
+    frame n'est pas envoyée (l'affichage ne se bloque jamais). Les résultats
+    sont rendus dans l'ordre de capture: une réponse pour une frame plus
+    ancienne que le dernier résultat appliqué est abandonnée.
+    """
+
+    def __init__(self, url: str, max_in_flight: int = 2, timeout: float = 1.0,
+                 session_factory: Callable[[], requests.Session] = requests.Session):
+        """
+        Args:
+            url: Endpoint de détection
+            max_in_flight: Nombre maximal de requêtes simultanées
+            timeout: Délai maximal d'une requête (s)
+            session_factory: Création d'une session HTTP (une par thread d'envoi)
+        """
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._session_factory = session_factory
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="detection-client")
+        self._lock = threading.Lock()
+        self._completed: List[DetectionResult] = []
+        self._seq = 0
+        self._last_applied_seq = 0
+
+        # Compteurs
+        self.in_flight = 0
+        self.sent = 0
+        self.skipped = 0
+        self.applied = 0
+        self.stale = 0
+        self.errors = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+        self.last_delay = 0.0
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.max_in_flight
+
+    def submit(self, files: dict, data: dict, captured_at: float, context: Any = None) -> bool:
+        """
+        Envoie une frame sans bloquer
+
+        Args:
+            files: Fichiers de la requête multipart
+            data: Champs de formulaire
+            captured_at: Heure de capture de la frame
+            context: Donnée rendue avec le résultat (ex. cible envoyée)
+
+        Returns:
+            False si la limite de requêtes en cours est atteinte (frame non envoyée)
+        """
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.skipped += 1
+                return False
+            self.in_flight += 1
+            self._seq += 1
+            result = DetectionResult(self._seq, captured_at, time.time(), context)
+        self.sent += 1
+        self._executor.submit(self._send, result, files, data)
+        return True
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._session_factory()
+        return session
+
+    def _send(self, result: DetectionResult, files: dict, data: dict):
+        try:
+            response = self._session().post(self.url, files=files, data=data, timeout=self.timeout)
+            if response.ok:
+                result.response = response.json()
+            else:
+                result.error = f"{response.status_code} - {response.text}"
+        except Exception as e:
+            result.error = str(e)
+        result.received_at = time.time()
+        with self._lock:
+            self.in_flight -= 1
+            self._completed.append(result)
+
+    def poll(self) -> List[DetectionResult]:
+        """
+        Résultats arrivés depuis le dernier appel, à appliquer dans l'ordre
+
+        Les réponses plus anciennes (en ordre de capture) que le dernier
+        résultat appliqué sont abandonnées; les erreurs sont rendues pour
+        être affichées mais ne comptent pas comme résultat appliqué.
+        """
+        with self._lock:
+            completed, self._completed = self._completed, []
+        fresh = []
+        for result in sorted(completed, key=lambda r: r.seq):
+            if result.error is not None:
+                self.errors += 1
+                fresh.append(result)
+                continue
+            if result.seq < self._last_applied_seq:
+                self.stale += 1
+                continue
+            self._last_applied_seq = result.seq
+            self.applied += 1
+            self.last_delay = result.delay
+            self.total_delay += result.delay
+            self.max_delay = max(self.max_delay, result.delay)
+            fresh.append(result)
+        return fresh
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "applied": self.applied,
+            "stale": self.stale,
+            "errors": self.errors,
+            "last_delay_ms": round(self.last_delay * 1000, 1),
+            "mean_delay_ms": round(self.total_delay / self.applied * 1000, 1) if self.applied else 0.0,
+            "max_delay_ms": round(self.max_delay * 1000, 1)
+        }
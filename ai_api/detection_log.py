@@ -0,0 +1,332 @@
+"""
+Journal binaire des détections, un fichier par session
+
+Chaque frame traitée ajoute un enregistrement de taille fixe (48 octets):
+heure, bbox du ballon, confiance, cible, ballon sur la cible. Le fichier
+commence par un en-tête de 64 octets (type de session, durée et cibles
+d'une session Touch & Dash). Les écritures sont regroupées par un thread
+dédié, hors du chemin des requêtes; la lecture projette le fichier en
+mémoire (`np.memmap`) sous forme de tableau structuré, sans copie.
+
+Usage (audit d'une session avant émission du score):
+    python detection_log.py replay logs/session-0123abcd.detlog
+    python detection_log.py replay logs/*.detlog --json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from exercise import MAX_SCORE, POINTS_PER_TOUCH
+from geometry import overlap_matrix
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BALLLOG1"
+VERSION = 1
+EXTENSION = ".detlog"
+
+# Types de journaux: session Touch & Dash du serveur (cibles et durée dans l'en-tête),
+# ou flux /detect_ball d'un client (cible de chaque frame dans l'enregistrement)
+KIND_SESSION = 1
+KIND_STREAM = 2
+
+HEADER_DTYPE = np.dtype({
+    "names": ["magic", "version", "kind", "duration", "targets"],
+    "formats": ["S8", "<u4", "<u4", "<f8", ("<f4", (2, 4))],
+    "offsets": [0, 8, 12, 16, 24],
+    "itemsize": 64
+})
+
+RECORD_DTYPE = np.dtype({
+    "names": ["time", "box", "confidence", "target", "hit"],
+    "formats": ["<f8", ("<f4", (4,)), "<f4", ("<f4", (4,)), "u1"],
+    "offsets": [0, 8, 24, 28, 44],
+    "itemsize": 48
+})
+
+# Enregistrement: (heure, bbox ou NaN, confiance ou NaN, cible, ballon sur la cible)
+Record = Tuple[float, Tuple[float, float, float, float], float, Tuple[float, float, float, float], bool]
+
+NO_BOX = (math.nan, math.nan, math.nan, math.nan)
+
+
+def log_path(directory: str, key: str) -> Path:
+    """Fichier du journal d'une session (clé réduite aux caractères sûrs)"""
+    return Path(directory) / (re.sub(r"[^A-Za-z0-9_.-]", "_", key) + EXTENSION)
+
+
+def make_header(kind: int, targets: Optional[Sequence[Sequence[float]]] = None,
+                duration: float = 0.0) -> np.ndarray:
+    header = np.zeros(1, HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["kind"] = kind
+    header["duration"] = duration
+    header["targets"] = np.nan if targets is None else np.asarray(targets, np.float32)
+    return header
+
+
+class DetectionLogWriter:
+    """
+    Écriture des journaux en tâche de fond
+
+    `append` ne fait que déposer l'enregistrement dans une file (aucune
+    entrée/sortie sur le chemin de la requête). Le thread d'écriture
+    regroupe les enregistrements par session et les ajoute au fichier toutes
+    les `flush_interval` secondes, ou dès que `max_buffered` enregistrements
+    attendent. Si la file est pleine (disque trop lent), les enregistrements
+    sont abandonnés et comptés plutôt que de ralentir l'API.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0, max_buffered: int = 4096,
+                 max_pending: int = 100_000):
+        """
+        Args:
+            directory: Répertoire des journaux (créé au besoin)
+            flush_interval: Intervalle maximal entre deux écritures (s)
+            max_buffered: Nombre d'enregistrements qui déclenche une écriture
+            max_pending: Taille maximale de la file d'attente
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        # En-têtes des sessions dont le fichier n'est pas encore créé
+        self._headers: Dict[str, np.ndarray] = {}
+
+        # Compteurs
+        self.records = 0
+        self.bytes = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="detection-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Écrit les enregistrements en attente et arrête le thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def open(self, key: str, kind: int = KIND_SESSION, targets: Optional[Sequence[Sequence[float]]] = None,
+             duration: float = 0.0):
+        """Déclare une session (en-tête écrit avec son premier enregistrement)"""
+        self._put((key, make_header(kind, targets, duration)))
+
+    def append(self, key: str, timestamp: float, box: Optional[Sequence[float]], confidence: float,
+               target: Sequence[float], hit: bool):
+        """
+        Ajoute le résultat d'une frame au journal d'une session
+
+        Args:
+            key: Clé de la session (nom du fichier)
+            timestamp: Heure de la frame (s)
+            box: Bbox du ballon (x1, y1, x2, y2), None si aucun ballon
+            confidence: Confiance de la détection (NaN si inconnue)
+            target: Cible courante (x1, y1, x2, y2)
+            hit: Le ballon touche la cible
+        """
+        self._put((key, (timestamp, NO_BOX if box is None else tuple(box), confidence, tuple(target), hit)))
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        buffered: Dict[str, List[Record]] = {}
+        count = 0
+        deadline = time.monotonic() + self.flush_interval
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                running = False
+            elif item:
+                key, value = item
+                if isinstance(value, np.ndarray):
+                    self._headers[key] = value
+                else:
+                    buffered.setdefault(key, []).append(value)
+                    count += 1
+
+            if not running or count >= self.max_buffered or time.monotonic() >= deadline:
+                if buffered:
+                    self._flush(buffered)
+                buffered, count = {}, 0
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, buffered: Dict[str, List[Record]]):
+        for key, records in buffered.items():
+            data = np.array(records, dtype=RECORD_DTYPE)
+            try:
+                with open(log_path(self.directory, key), "ab") as f:
+                    if f.tell() == 0:
+                        header = self._headers.get(key)
+                        f.write((header if header is not None else make_header(KIND_STREAM)).tobytes())
+                    f.write(data.tobytes())
+            except OSError as e:
+                self.errors += 1
+                logger.error(f"Écriture du journal de détections {key} impossible: {e}")
+                continue
+            # Fichier créé: l'en-tête n'est plus utile
+            self._headers.pop(key, None)
+            self.records += len(records)
+            self.bytes += data.nbytes
+        self.flushes += 1
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "records": self.records,
+            "bytes": self.bytes,
+            "flushes": self.flushes,
+            "pending": self._queue.qsize(),
+            "dropped": self.dropped,
+            "errors": self.errors
+        }
+
+
+def read_log(path: str) -> Tuple[dict, np.ndarray]:
+    """
+    Ouvre un journal en projection mémoire
+
+    Un enregistrement incomplet en fin de fichier (arrêt pendant une
+    écriture) est ignoré.
+
+    Returns:
+        Tuple (en-tête, tableau structuré RECORD_DTYPE en lecture seule)
+    """
+    size = os.path.getsize(path)
+    if size < HEADER_DTYPE.itemsize:
+        raise ValueError(f"{path}: fichier trop court pour un journal de détections")
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path}: ce n'est pas un journal de détections")
+    if header["version"] != VERSION:
+        raise ValueError(f"{path}: version {header['version']} non prise en charge")
+
+    count = (size - HEADER_DTYPE.itemsize) // RECORD_DTYPE.itemsize
+    records = (
+        np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+        if count else np.empty(0, RECORD_DTYPE)
+    )
+    return {
+        "kind": int(header["kind"]),
+        "duration": float(header["duration"]),
+        "targets": header["targets"].astype(np.float64)
+    }, records
+
+
+def replay(path: str) -> dict:
+    """
+    Recalcule touches, score et événements à partir d'un journal
+
+    Les contacts ballon/cible de toutes les frames sont calculés en une
+    opération vectorisée; seules les frames avec contact passent par les
+    règles du Touch & Dash (cible courante, alternance, durée, score
+    maximal). Le résultat est comparé aux indicateurs enregistrés.
+
+    Returns:
+        Touches, score, événements recalculés et frames dont l'indicateur
+        enregistré diffère du recalcul
+    """
+    started_at = time.perf_counter()
+    header, records = read_log(path)
+    times = np.asarray(records["time"])
+    start = times[0] if len(times) else 0.0
+    boxes = np.asarray(records["box"], np.float64)
+    detected = ~np.isnan(boxes[:, 0])
+    hits = np.zeros(len(records), bool)
+    touches = 0
+    events = []
+
+    if header["kind"] == KIND_SESSION:
+        # Règles de TouchAndDashSession.process_detection
+        targets = header["targets"]
+        contacts = overlap_matrix(boxes, targets) & detected[:, None]
+        in_time = times - start < header["duration"]
+        target_index = 0
+        for i in np.flatnonzero(contacts.any(axis=1) & in_time):
+            if not contacts[i, target_index]:
+                continue
+            hits[i] = True
+            touches += 1
+            events.append({"type": "touch", "frame": int(i), "touches": touches,
+                           "elapsed_s": round(float(times[i] - start), 3)})
+            target_index = 1 - target_index
+            if touches * POINTS_PER_TOUCH >= MAX_SCORE:
+                break
+    else:
+        # Flux /detect_ball: une touche quand le ballon atteint une cible différente de la précédente
+        targets = np.asarray(records["target"], np.float64)
+        contacts = detected & (
+            (boxes[:, 0] < targets[:, 2]) & (boxes[:, 2] > targets[:, 0]) &
+            (boxes[:, 1] < targets[:, 3]) & (boxes[:, 3] > targets[:, 1])
+        )
+        hits = contacts
+        last_target = None
+        for i in np.flatnonzero(contacts):
+            target = tuple(targets[i])
+            if target == last_target:
+                continue
+            last_target = target
+            touches += 1
+            events.append({"type": "touch", "frame": int(i), "touches": touches,
+                           "elapsed_s": round(float(times[i] - start), 3)})
+
+    mismatches = np.flatnonzero(hits != records["hit"].astype(bool))
+    return {
+        "log": Path(path).name,
+        "kind": "session" if header["kind"] == KIND_SESSION else "stream",
+        "frames": len(records),
+        "detections": int(detected.sum()),
+        "span_s": round(float(times[-1] - start), 3) if len(times) else 0.0,
+        "touches": touches,
+        "score": min(touches * POINTS_PER_TOUCH, MAX_SCORE),
+        "events": events,
+        "hit_mismatches": mismatches.tolist(),
+        "replay_ms": round((time.perf_counter() - started_at) * 1000, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journaux binaires des détections")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="Recalcule score et touches depuis des journaux")
+    replay_parser.add_argument("logs", nargs="+", help="Fichiers .detlog")
+    replay_parser.add_argument("--json", action="store_true", help="Résultats complets en JSON")
+    args = parser.parse_args()
+
+    results = [replay(path) for path in args.logs]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        status = "OK" if not result["hit_mismatches"] else f"{len(result['hit_mismatches'])} écart(s)"
+        print(f"{result['log']}: {result['kind']}, {result['frames']} frames, {result['touches']} touches, "
+              f"score {result['score']} ({status}, {result['replay_ms']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
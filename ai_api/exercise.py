@@ -0,0 +1,227 @@
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geometry import as_boxes, overlap_matrix
+
+# Règles du Touch & Dash (identiques au jeu du frontend)
+EXERCISE_NAME = "Touch and Dash"
+DEFAULT_DURATION_S = 30.0
+POINTS_PER_TOUCH = 5
+MAX_SCORE = 100
+
+# Cibles par défaut, dans les coordonnées de la frame envoyée (sans miroir)
+DEFAULT_TARGETS = (
+    (50.0, 300.0, 150.0, 400.0),   # Cible gauche
+    (490.0, 300.0, 590.0, 400.0),  # Cible droite
+)
+TARGET_SIDES = ("left", "right")
+
+Box = Tuple[float, float, float, float]
+
+
+def boxes_overlap(box1: Box, box2: Box) -> bool:
+    """Vérifie si deux bbox (x1, y1, x2, y2) se chevauchent, même légèrement"""
+    return bool(overlap_matrix(box1, box2)[0, 0])
+
+
+class TouchAndDashSession:
+    """
+    État d'une session Touch & Dash côté serveur
+
+    La session garde la cible courante, détecte les touches, alterne les
+    côtés, compte les touches et le temps, et calcule le score final (0-100).
+    Le chronomètre démarre à la première frame traitée.
+    """
+
+    __slots__ = (
+        "session_id", "targets", "target_index", "touches", "duration",
+        "created_at", "started_at", "finished_at", "last_activity", "tracker", "target_boxes",
+        "cache_scope", "motion_gate"
+    )
+
+    def __init__(self, session_id: str, targets: Sequence[Box] = DEFAULT_TARGETS,
+                 duration: float = DEFAULT_DURATION_S):
+        if len(targets) != 2:
+            raise ValueError("Le Touch & Dash nécessite exactement deux cibles")
+
+        self.session_id = session_id
+        self.targets = tuple(tuple(float(v) for v in target) for target in targets)
+        # Toutes les cibles en un tableau (M, 4): un seul test de chevauchement par frame
+        self.target_boxes = as_boxes(self.targets)
+        self.target_index = 0
+        self.touches = 0
+        self.duration = float(duration)
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_activity = self.created_at
+        # Suivi du ballon propre à la session (inférence ROI), attaché par l'API
+        self.tracker = None
+        # Portée du cache de résultats des frames presque identiques, attachée par l'API
+        self.cache_scope = None
+        # Porte de mouvement (saut des frames sans changement utile), attachée par l'API
+        self.motion_gate = None
+
+    def targets_hit(self, ball_bbox: Box) -> np.ndarray:
+        """Cibles touchées par le ballon, (M,) booléens"""
+        return overlap_matrix(ball_bbox, self.target_boxes)[0]
+
+    @property
+    def current_target(self) -> Box:
+        return self.targets[self.target_index]
+
+    @property
+    def score(self) -> int:
+        return min(self.touches * POINTS_PER_TOUCH, MAX_SCORE)
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def elapsed(self, now: Optional[float] = None) -> float:
+        """Temps écoulé depuis la première frame (secondes)"""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else (time.time() if now is None else now)
+        return min(end - self.started_at, self.duration)
+
+    def process_detection(self, ball_bbox: Optional[Box], now: Optional[float] = None) -> List[dict]:
+        """
+        Fait avancer la session avec la détection d'une frame
+
+        Args:
+            ball_bbox: Bbox du ballon (x1, y1, x2, y2) ou None si non détecté
+            now: Horodatage de la frame (time.time() par défaut)
+
+        Returns:
+            Liste d'événements produits par cette frame
+        """
+        now = time.time() if now is None else now
+        self.last_activity = now
+        if self.finished:
+            return []
+
+        if self.started_at is None:
+            self.started_at = now
+
+        if now - self.started_at >= self.duration:
+            return [self.finish(now)]
+
+        events = []
+        if ball_bbox is not None and self.targets_hit(ball_bbox)[self.target_index]:
+            self.touches += 1
+            events.append({
+                "type": "touch",
+                "touches": self.touches,
+                "score": self.score,
+                "side": TARGET_SIDES[self.target_index],
+                "elapsed_s": round(now - self.started_at, 3)
+            })
+
+            # Alterner la cible
+            self.target_index = 1 - self.target_index
+            events.append({
+                "type": "target",
+                "side": TARGET_SIDES[self.target_index],
+                "target_bbox": self.target_dict()
+            })
+
+            if self.score >= MAX_SCORE:
+                events.append(self.finish(now))
+
+        return events
+
+    def finish(self, now: Optional[float] = None) -> dict:
+        """Termine la session et renvoie l'événement de fin"""
+        if self.finished_at is None:
+            self.finished_at = time.time() if now is None else now
+            if self.started_at is None:
+                self.started_at = self.finished_at
+        return {
+            "type": "finished",
+            "touches": self.touches,
+            "score": self.score,
+            "elapsed_s": round(self.elapsed(), 3)
+        }
+
+    def target_dict(self) -> dict:
+        x1, y1, x2, y2 = self.current_target
+        return {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        """État courant de la session"""
+        elapsed = self.elapsed(now)
+        return {
+            "session_id": self.session_id,
+            "exercise": EXERCISE_NAME,
+            "current_target": self.target_dict(),
+            "target_side": TARGET_SIDES[self.target_index],
+            "touches": self.touches,
+            "score": self.score,
+            "elapsed_s": round(elapsed, 3),
+            "remaining_s": round(self.duration - elapsed, 3),
+            "started": self.started_at is not None,
+            "finished": self.finished
+        }
+
+
+class SessionStore:
+    """Sessions d'exercice en mémoire, expirées après une période d'inactivité"""
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl_s: float = 600.0,
+                 on_remove: Optional[Callable[[TouchAndDashSession], None]] = None):
+        """
+        Args:
+            max_sessions: Nombre maximal de sessions simultanées
+            idle_ttl_s: Durée d'inactivité avant expiration (s)
+            on_remove: Appelé pour chaque session retirée (fin ou expiration),
+                pour libérer ses ressources (piste de suivi, cache)
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self.on_remove = on_remove
+        self._sessions: Dict[str, TouchAndDashSession] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, targets: Sequence[Box] = DEFAULT_TARGETS,
+               duration: float = DEFAULT_DURATION_S) -> TouchAndDashSession:
+        """Crée une nouvelle session (les sessions inactives sont purgées d'abord)"""
+        self.expire()
+        if len(self._sessions) >= self.max_sessions:
+            raise OverflowError("Nombre maximal de sessions atteint")
+
+        session = TouchAndDashSession(uuid.uuid4().hex, targets, duration)
+        self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[TouchAndDashSession]:
+        return self._sessions.get(session_id)
+
+    def remove(self, session_id: str) -> Optional[TouchAndDashSession]:
+        session = self._sessions.pop(session_id, None)
+        if session is not None and self.on_remove is not None:
+            self.on_remove(session)
+        return session
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Supprime les sessions inactives depuis plus de `idle_ttl_s`"""
+        now = time.time() if now is None else now
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if now - session.last_activity > self.idle_ttl_s
+        ]
+        for session_id in expired:
+            self.remove(session_id)
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self._sessions),
+            "finished_sessions": sum(1 for session in self._sessions.values() if session.finished),
+            "max_sessions": self.max_sessions
+        }
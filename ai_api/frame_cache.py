@@ -0,0 +1,152 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Clé d'une frame: (dimensions et variante, empreinte perceptuelle)
+FrameKey = Tuple[Tuple, int]
+
+
+def perceptual_hash(image: np.ndarray, hash_size: int = 16) -> int:
+    """
+    Empreinte perceptuelle (dHash) d'une image BGR
+
+    L'image est réduite à (hash_size + 1) x hash_size en niveaux de gris, puis
+    chaque bit indique si un pixel est plus clair que son voisin de droite.
+    Deux frames presque identiques ont des empreintes à faible distance de
+    Hamming; le calcul ne coûte qu'une réduction de l'image.
+
+    Returns:
+        Entier de hash_size² bits
+    """
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = np.packbits((small[:, 1:] > small[:, :-1]).ravel())
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+class _Entry:
+    __slots__ = ("shape", "fingerprint", "value", "created_at", "cost_ms")
+
+    def __init__(self, shape: Tuple, fingerprint: int, value: Any, created_at: float, cost_ms: float):
+        self.shape = shape
+        self.fingerprint = fingerprint
+        self.value = value
+        self.created_at = created_at
+        self.cost_ms = cost_ms
+
+
+class FrameResultCache:
+    """
+    Cache des résultats d'inférence pour les frames presque identiques
+
+    Chaque portée (session, caméra) garde ses dernières frames, repérées par
+    leur empreinte perceptuelle. Une frame dont l'empreinte est à au plus
+    `tolerance` bits d'une frame en cache (mêmes dimensions) reprend son
+    résultat au lieu de repasser par le modèle. Les entrées expirent après
+    `ttl_s` (le résultat est revérifié au moins à ce rythme, même pour une
+    scène immobile); portées et entrées sont évincées par ordre LRU.
+    """
+
+    def __init__(self, max_entries: int = 16, max_scopes: int = 1000, ttl_s: float = 2.0,
+                 tolerance: int = 2, hash_size: int = 16):
+        """
+        Args:
+            max_entries: Nombre maximal de frames gardées par portée
+            max_scopes: Nombre maximal de portées
+            ttl_s: Durée de vie d'un résultat (s)
+            tolerance: Distance de Hamming maximale entre deux empreintes
+                (0: frames identiques à l'échelle de l'empreinte)
+            hash_size: Côté de la grille de l'empreinte (hash_size² bits)
+        """
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self.ttl_s = ttl_s
+        self.tolerance = tolerance
+        self.hash_size = hash_size
+        self._scopes: "OrderedDict[Hashable, OrderedDict[int, _Entry]]" = OrderedDict()
+        self._next_id = 0
+
+        # Compteurs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_ms = 0.0
+
+    def key(self, image: np.ndarray, *variant: Hashable) -> FrameKey:
+        """Clé d'une frame: dimensions, variante (ex. échelle) et empreinte perceptuelle"""
+        return (image.shape[:2] + variant, perceptual_hash(image, self.hash_size))
+
+    def get(self, scope: Hashable, key: FrameKey, now: Optional[float] = None) -> Optional[Any]:
+        """Résultat d'une frame presque identique de la même portée, ou None"""
+        now = time.monotonic() if now is None else now
+        entries = self._scopes.get(scope)
+        shape, fingerprint = key
+        if entries is not None:
+            self._scopes.move_to_end(scope)
+            for entry_id, entry in reversed(list(entries.items())):
+                if now - entry.created_at > self.ttl_s:
+                    del entries[entry_id]
+                    self.expirations += 1
+                    continue
+                if entry.shape == shape and bin(entry.fingerprint ^ fingerprint).count("1") <= self.tolerance:
+                    entries.move_to_end(entry_id)
+                    self.hits += 1
+                    self.saved_ms += entry.cost_ms
+                    return entry.value
+        self.misses += 1
+        return None
+
+    def put(self, scope: Hashable, key: FrameKey, value: Any, cost_ms: float = 0.0,
+            now: Optional[float] = None):
+        """
+        Ajoute le résultat d'une frame
+
+        Args:
+            scope: Portée (session, caméra)
+            key: Clé de la frame (`key`)
+            value: Résultat à réutiliser
+            cost_ms: Coût de l'inférence évitée par un succès (temps économisé)
+        """
+        now = time.monotonic() if now is None else now
+        entries = self._scopes.get(scope)
+        if entries is None:
+            entries = self._scopes[scope] = OrderedDict()
+            if len(self._scopes) > self.max_scopes:
+                _, evicted = self._scopes.popitem(last=False)
+                self.evictions += len(evicted)
+        else:
+            self._scopes.move_to_end(scope)
+
+        self._next_id += 1
+        entries[self._next_id] = _Entry(key[0], key[1], value, now, cost_ms)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def drop(self, scope: Hashable):
+        """Oublie une portée (fin de session)"""
+        self._scopes.pop(scope, None)
+
+    def clear(self):
+        """Oublie toutes les portées (résultats d'un modèle remplacé)"""
+        self._scopes.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "scopes": len(self._scopes),
+            "entries": sum(len(entries) for entries in self._scopes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_ms": round(self.saved_ms, 1),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "tolerance": self.tolerance,
+            "ttl_s": self.ttl_s
+        }
@@ -0,0 +1,90 @@
+from typing import Iterable, Mapping, Sequence, Union
+
+import numpy as np
+
+# Bbox (x1, y1, x2, y2): une seule (4,) ou un tableau (N, 4)
+BoxesLike = Union[np.ndarray, Sequence[float], Sequence[Sequence[float]]]
+
+
+def as_boxes(boxes: BoxesLike) -> np.ndarray:
+    """Convertit une bbox ou une liste de bbox (x1, y1, x2, y2) en tableau (N, 4)"""
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def from_dicts(boxes: Iterable[Mapping[str, float]]) -> np.ndarray:
+    """Convertit des bbox au format dict {"x1", "y1", "x2", "y2"} en tableau (N, 4)"""
+    return as_boxes([(box["x1"], box["y1"], box["x2"], box["y2"]) for box in boxes])
+
+
+def box_areas(boxes: BoxesLike) -> np.ndarray:
+    """Aires des bbox, (N,)"""
+    boxes = as_boxes(boxes)
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def intersection_areas(detections: BoxesLike, targets: BoxesLike) -> np.ndarray:
+    """
+    Aires d'intersection de N détections avec M cibles
+
+    Returns:
+        Tableau (N, M)
+    """
+    detections, targets = as_boxes(detections), as_boxes(targets)
+    top_left = np.maximum(detections[:, None, :2], targets[None, :, :2])
+    bottom_right = np.minimum(detections[:, None, 2:], targets[None, :, 2:])
+    sizes = np.clip(bottom_right - top_left, 0.0, None)
+    return sizes[..., 0] * sizes[..., 1]
+
+
+def iou_matrix(detections: BoxesLike, targets: BoxesLike) -> np.ndarray:
+    """
+    IoU (intersection sur union) de N détections avec M cibles
+
+    Returns:
+        Tableau (N, M) de valeurs entre 0 et 1
+    """
+    intersections = intersection_areas(detections, targets)
+    unions = box_areas(detections)[:, None] + box_areas(targets)[None, :] - intersections
+    return np.divide(intersections, unions, out=np.zeros_like(intersections), where=unions > 0)
+
+
+def overlap_matrix(detections: BoxesLike, targets: BoxesLike) -> np.ndarray:
+    """
+    Chevauchement (même léger) de N détections avec M cibles
+
+    Des bbox qui se touchent seulement par un bord ne se chevauchent pas.
+
+    Returns:
+        Tableau booléen (N, M)
+    """
+    detections, targets = as_boxes(detections), as_boxes(targets)
+    return ((detections[:, None, 0] < targets[None, :, 2]) & (detections[:, None, 2] > targets[None, :, 0]) &
+            (detections[:, None, 1] < targets[None, :, 3]) & (detections[:, None, 3] > targets[None, :, 1]))
+
+
+def containment_matrix(detections: BoxesLike, targets: BoxesLike) -> np.ndarray:
+    """
+    Part de chaque détection contenue dans chaque cible
+
+    Returns:
+        Tableau (N, M) de valeurs entre 0 et 1 (1: détection entièrement dans la cible)
+    """
+    intersections = intersection_areas(detections, targets)
+    areas = box_areas(detections)[:, None]
+    return np.divide(intersections, areas, out=np.zeros_like(intersections), where=areas > 0)
+
+
+def paired_iou(boxes1: BoxesLike, boxes2: BoxesLike) -> np.ndarray:
+    """
+    IoU de bbox appariées une à une (boxes1[i] avec boxes2[i])
+
+    Returns:
+        Tableau (N,)
+    """
+    boxes1, boxes2 = as_boxes(boxes1), as_boxes(boxes2)
+    top_left = np.maximum(boxes1[:, :2], boxes2[:, :2])
+    bottom_right = np.minimum(boxes1[:, 2:], boxes2[:, 2:])
+    sizes = np.clip(bottom_right - top_left, 0.0, None)
+    intersections = sizes[:, 0] * sizes[:, 1]
+    unions = box_areas(boxes1) + box_areas(boxes2) - intersections
+    return np.divide(intersections, unions, out=np.zeros_like(intersections), where=unions > 0)
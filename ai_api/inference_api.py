@@ -1,29 +1,94 @@
 import cv2
 import requests
-import json
 import time
 
+from detection_client import fetch_config
+from rate_control import AdaptiveRateScheduler, FrameQualityController
+
 # === Configuration de l'API ===
-API_URL = "http://localhost:8000/detect_ball"
+SESSIONS_URL = "http://localhost:8000/sessions"
+CONFIG_URL = "http://localhost:8000/config"
 
 # === Bbox en bas à gauche et à droite ===
 bbox_bas_gauche = {"x1": 50, "y1": 300, "x2": 150, "y2": 400}
 bbox_bas_droite = {"x1": 490, "y1": 300, "x2": 590, "y2": 400}
 
-# Démarre avec la cible à gauche
-current_target = bbox_bas_gauche
+# Session Touch & Dash tenue par le serveur (cible courante, touches, score)
+session_id = None
+current_target = None
+finished = False
 frame_count = 0
 last_ball_position = None
 
+# Fréquence de détection adaptée à la vitesse du ballon, à la cible et à la latence de l'API
+rate = AdaptiveRateScheduler()
+# Taille et qualité JPEG des frames réglées d'après l'API, l'aller-retour et la confiance des détections
+quality = None
+
+def create_session():
+    """Crée la session d'exercice côté serveur, cibles dans le repère de la caméra"""
+    response = requests.post(SESSIONS_URL, json={"targets": [bbox_bas_gauche, bbox_bas_droite]}, timeout=2.0)
+    response.raise_for_status()
+    return response.json()
+
+def apply_events(events):
+    """Applique les événements de la session (touche, nouvelle cible, fin)"""
+    global current_target, finished
+    for event in events:
+        if event["type"] == "touch":
+            print(f"🥅 Cible atteinte ! Touches: {event['touches']} | Score: {event['score']}")
+        elif event["type"] == "target":
+            print(f"🎯 Nouvelle cible: {event['side']}")
+            current_target = event["target_bbox"]
+        elif event["type"] == "finished":
+            print(f"🏁 Exercice terminé: {event['touches']} touches, score {event['score']}/100")
+            finished = True
+
+def send_frame(frame, timeout=None):
+    """
+    Envoie la frame réduite et encodée avec les réglages courants à la session
+
+    Le serveur ramène la détection dans le repère des cibles (`scale`).
+
+    Returns:
+        Tuple (réponse, latence en s, facteur d'échelle de la frame envoyée)
+    """
+    payload, scale = quality.encode(frame)
+    files = {'file': ("frame.jpg", payload, 'image/jpeg')}
+    data = {'scale': scale}
+    start_time = time.time()
+    try:
+        response = requests.post(f"{SESSIONS_URL}/{session_id}/frame", files=files, data=data, timeout=timeout)
+    except requests.exceptions.Timeout:
+        # Trop lent: compte comme un aller-retour au-dessus de la cible
+        quality.observe(time.time() - start_time, None)
+        raise
+    latency = time.time() - start_time
+    confidence = response.json().get("confidence") if response.ok else None
+    quality.observe(latency, confidence)
+    return response, latency, scale
+
 def main():
-    global current_target, frame_count, last_ball_position
+    global session_id, current_target, frame_count, last_ball_position, quality
+    quality = FrameQualityController.from_config(fetch_config(CONFIG_URL))
     cap = cv2.VideoCapture(0)
 
     if not cap.isOpened():
         print("❌ Impossible d'ouvrir la webcam")
         return
 
+    try:
+        state = create_session()
+    except requests.RequestException as e:
+        print(f"❌ Impossible de créer la session: {e}")
+        cap.release()
+        return
+    session_id = state["session_id"]
+    current_target = state["current_target"]
+    print(f"🏃 Session {session_id}: {state['exercise']}, {state['remaining_s']:.0f}s")
+
     print("📷 Appuyez sur 's' pour capturer une image, 'q' pour quitter")
+    print(f"🎚️ Frames adaptatives: {quality.stats()}")
 
     while True:
         ret, frame = cap.read()
@@ -41,20 +106,19 @@ def main():
         cv2.putText(frame, "Target", (int(current_target["x1"]), int(current_target["y1"] - 10)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
 
-        # Détection du ballon toutes les 10 frames
-        if frame_count % 10 == 0:
-            _, img_encoded = cv2.imencode('.jpg', frame)
-            files = {'file': ("frame.jpg", img_encoded.tobytes(), 'image/jpeg')}
-            data = {'target_bbox': json.dumps(current_target)}
-
+        # Détection du ballon à intervalle adaptatif, jusqu'à la fin de l'exercice
+        if not finished and rate.should_detect():
             try:
-                response = requests.post(API_URL, files=files, data=data, timeout=0.5)
+                response, latency, scale = send_frame(frame, timeout=0.5)
+                rate.record_latency(latency)
                 if response.ok:
                     result = response.json()
-                    if "ball_bbox" in result:
-                        last_ball_position = result["ball_bbox"]
+                    # Bbox déjà dans le repère de la caméra (celui des cibles)
+                    last_ball_position = result["ball_bbox"]
+                    apply_events(result["events"])
             except:
                 pass
+            rate.observe(last_ball_position, current_target)
 
         # Afficher la bbox du ballon si disponible
         if last_ball_position:
@@ -71,33 +135,33 @@ def main():
         key = cv2.waitKey(1)
         if key == ord('q'):
             break
-        elif key == ord('s'):
-            # Capture l'image et envoie à l'API
-            _, img_encoded = cv2.imencode('.jpg', frame)
-            files = {'file': ("frame.jpg", img_encoded.tobytes(), 'image/jpeg')}
-            data = {'target_bbox': json.dumps(current_target)}
-
-            start_time = time.time()
-            response = requests.post(API_URL, files=files, data=data)
-            latency = (time.time() - start_time) * 1000  # en ms
+        elif key == ord('s') and not finished:
+            # Capture l'image et envoie à la session
+            settings = quality.settings()
+            response, latency, scale = send_frame(frame)
+            latency *= 1000  # en ms
 
             if response.ok:
                 result = response.json()
                 print(f"✅ Détection: {result}")
-                print(f"⏱️ Latence: {latency:.2f} ms")
-
-                if result.get("reaches_target"):
-                    print("🥅 Cible atteinte ! 🎯 Changement de côté...")
-                    # Alterner la cible
-                    if current_target == bbox_bas_gauche:
-                        current_target = bbox_bas_droite
-                    else:
-                        current_target = bbox_bas_gauche
+                print(f"⏱️ Latence: {latency:.2f} ms | Frame: {settings}")
+                apply_events(result["events"])
             else:
                 print(f"❌ Erreur API: {response.status_code} - {response.text}")
 
     cap.release()
     cv2.destroyAllWindows()
+    try:
+        response = requests.delete(f"{SESSIONS_URL}/{session_id}", timeout=2.0)
+        if response.ok:
+            final = response.json()
+            print(f"📊 Score final: {final['touches']} touches, {final['score']}/100")
+        else:
+            print(f"⚠️ Session non close: {response.status_code} - {response.text}")
+    except requests.RequestException as e:
+        print(f"⚠️ Impossible de clore la session: {e}")
+    print(f"📊 Détection adaptative: {rate.stats()}")
+    print(f"📊 Frames adaptatives: {quality.stats()}")
 
 if __name__ == "__main__":
     main()
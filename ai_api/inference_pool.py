@@ -0,0 +1,503 @@
+import asyncio
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+POOL_MODES = ("thread", "process", "shm")
+
+# Emplacement d'une frame dans un segment de mémoire partagée: (offset, forme, dtype)
+FrameLayout = Tuple[int, Tuple[int, ...], str]
+
+
+class PoolSaturatedError(Exception):
+    """Levée quand la file d'attente du pool d'inférence est pleine"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("File d'attente d'inférence pleine")
+        self.retry_after = retry_after
+
+
+def _barrier_call(barrier: threading.Barrier, fn: Callable) -> Any:
+    """Attend que tous les threads du pool soient démarrés, puis appelle `fn`"""
+    barrier.wait()
+    return fn()
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[float, Any]:
+    """Exécute `fn` dans le worker en notant l'heure de début (pour le temps d'attente)"""
+    started_at = time.time()
+    return started_at, fn(*args)
+
+
+def _write_frames(buffer: memoryview, images: Sequence[np.ndarray]) -> List[FrameLayout]:
+    """Copie les frames à la suite dans un segment de mémoire partagée"""
+    layouts = []
+    offset = 0
+    for image in images:
+        np.ndarray(image.shape, dtype=image.dtype, buffer=buffer, offset=offset)[...] = image
+        layouts.append((offset, image.shape, image.dtype.str))
+        offset += image.nbytes
+    return layouts
+
+
+def _read_frames(buffer: memoryview, layouts: Sequence[FrameLayout]) -> List[np.ndarray]:
+    """Vues NumPy (sans copie) sur les frames d'un segment de mémoire partagée"""
+    return [
+        np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+        for offset, shape, dtype in layouts
+    ]
+
+
+def _picklable_error(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+def _shm_worker(tasks: "multiprocessing.Queue", results: "multiprocessing.Queue",
+                initializer: Optional[Callable], initargs: Tuple):
+    """
+    Boucle d'un processus d'inférence de `SharedMemoryPool`
+
+    Chaque tâche est (id, slot, nom du segment, emplacements des frames, fn, args).
+    Les frames sont lues sur place dans la mémoire partagée, seul le résultat
+    de `fn` est sérialisé vers le processus principal.
+    """
+    init_error = None
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception as e:
+            # Le worker reste actif pour renvoyer l'erreur à chaque tâche
+            init_error = _picklable_error(e)
+
+    attached: Dict[int, shared_memory.SharedMemory] = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, slot, shm_name, layouts, fn, args = task
+            started_at = time.time()
+            if init_error is not None:
+                results.put((task_id, started_at, time.time(), False, init_error))
+                continue
+
+            try:
+                if shm_name is None:
+                    result = fn(*args)
+                else:
+                    segment = attached.get(slot)
+                    if segment is None or segment.name != shm_name:
+                        # Le slot a été réalloué (batch plus grand): on suit le nouveau segment
+                        if segment is not None:
+                            segment.close()
+                        segment = attached[slot] = shared_memory.SharedMemory(name=shm_name)
+                    images = _read_frames(segment.buf, layouts)
+                    try:
+                        result = fn(images, *args)
+                    finally:
+                        del images
+                results.put((task_id, started_at, time.time(), True, result))
+            except Exception as e:
+                results.put((task_id, started_at, time.time(), False, _picklable_error(e)))
+    finally:
+        for segment in attached.values():
+            segment.close()
+
+
+class InferencePool:
+    """
+    Pool de workers dédié à l'inférence, avec une file d'attente bornée
+
+    L'inférence tourne hors de la boucle asyncio (threads ou processus). Quand
+    la file est pleine, `run` échoue immédiatement avec `PoolSaturatedError`
+    au lieu d'accumuler de la latence.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = 1,
+        max_queue: int = 4,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = ()
+    ):
+        """
+        Args:
+            mode: "thread" ou "process"
+            workers: Nombre de workers d'inférence
+            max_queue: Nombre de jobs pouvant attendre un worker libre
+            initializer: Fonction exécutée au démarrage de chaque worker
+                (chargement du modèle)
+            initargs: Arguments de l'initializer
+        """
+        if mode not in POOL_MODES:
+            raise ValueError(f"Mode de pool inconnu: {mode} (attendu: {', '.join(POOL_MODES)})")
+        if workers < 1:
+            raise ValueError("workers doit être >= 1")
+
+        self.mode = mode
+        self.workers = workers
+        self.max_queue = max(max_queue, 0)
+
+        # Statistiques de la file d'attente
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.last_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        # Appelé après chaque job avec (attente, exécution) en secondes (métriques)
+        self.observer: Optional[Callable[[float, float], None]] = None
+
+        self._start(initializer, initargs)
+
+    def _start(self, initializer: Optional[Callable], initargs: Tuple):
+        """Démarre l'executor des workers"""
+        if self.mode == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference",
+                initializer=initializer,
+                initargs=initargs
+            )
+        elif self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=initializer,
+                initargs=initargs
+            )
+        else:
+            raise ValueError(f"Le mode {self.mode} nécessite SharedMemoryPool (voir create_pool)")
+
+    @property
+    def capacity(self) -> int:
+        """Nombre maximal de jobs acceptés (en cours + en attente)"""
+        return self.workers + self.max_queue
+
+    @property
+    def queued(self) -> int:
+        """Nombre de jobs en attente d'un worker"""
+        return max(self.in_flight - self.workers, 0)
+
+    def is_saturated(self) -> bool:
+        return self.in_flight >= self.capacity
+
+    def retry_after(self) -> int:
+        """Estimation (en secondes) du temps nécessaire pour vider la file"""
+        if not self.completed:
+            return 1
+        mean_run_s = self.total_run_ms / self.completed / 1000
+        return max(1, math.ceil(mean_run_s * (self.queued + 1) / self.workers))
+
+    async def prime(self, report: Callable = os.getpid) -> List[Any]:
+        """
+        Démarre tous les workers (et leur initialisation) avant la première requête
+
+        Args:
+            report: Fonction appelée dans les workers une fois initialisés
+                (importable au niveau module en mode process)
+
+        Returns:
+            Résultats de `report`, un par appel
+        """
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            # La barrière force la création d'un thread par worker
+            barrier = threading.Barrier(self.workers)
+            calls = [loop.run_in_executor(self._executor, _barrier_call, barrier, report) for _ in range(self.workers)]
+        else:
+            calls = [loop.run_in_executor(self._executor, report) for _ in range(self.workers)]
+        reports = await asyncio.gather(*calls)
+        logger.info(f"Pool d'inférence prêt ({self.workers} worker(s) en mode {self.mode})")
+        return list(reports)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Exécute `fn(*args)` dans un worker du pool
+
+        Args:
+            fn: Fonction à exécuter (importable au niveau module en mode process)
+            *args: Arguments de la fonction
+
+        Returns:
+            Résultat de la fonction
+
+        Raises:
+            PoolSaturatedError: si la file d'attente est pleine
+        """
+        if self.is_saturated():
+            self.rejected += 1
+            raise PoolSaturatedError(retry_after=self.retry_after())
+
+        self.in_flight += 1
+        submitted_at = time.time()
+        try:
+            started_at, result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _timed_call, fn, args
+            )
+        finally:
+            self.in_flight -= 1
+
+        self._record(submitted_at, started_at, time.time())
+        return result
+
+    def _record(self, submitted_at: float, started_at: float, finished_at: float):
+        """Met à jour les temps d'attente et d'exécution après un job"""
+        wait_ms = max(started_at - submitted_at, 0.0) * 1000
+        self.completed += 1
+        self.last_wait_ms = wait_ms
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.total_run_ms += (finished_at - started_at) * 1000
+        if self.observer is not None:
+            self.observer(wait_ms / 1000, max(finished_at - started_at, 0.0))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Retourne la profondeur de file et les temps d'attente"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "last_wait_ms": round(self.last_wait_ms, 2),
+            "mean_wait_ms": round(self.total_wait_ms / self.completed, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "mean_run_ms": round(self.total_run_ms / self.completed, 2) if self.completed else 0.0
+        }
+
+
+class SharedMemoryPool(InferencePool):
+    """
+    Pool de processus d'inférence alimentés par mémoire partagée
+
+    Le processus principal (HTTP/WebSocket) copie les frames d'un batch dans
+    un segment de mémoire partagée (un slot par job accepté) et n'envoie aux
+    workers que les emplacements des frames: les pixels ne sont jamais
+    sérialisés. Les workers sont créés par fork, après le chargement éventuel
+    du modèle dans le processus principal: modules et poids sont alors
+    partagés en copie à l'écriture au lieu d'être dupliqués.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_queue: int = 4,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = (),
+        slot_bytes: int = 8 * 1024 * 1024
+    ):
+        """
+        Args:
+            workers: Nombre de processus d'inférence
+            max_queue: Nombre de jobs pouvant attendre un worker libre
+            initializer: Fonction exécutée au démarrage de chaque processus
+                (chauffe du modèle)
+            initargs: Arguments de l'initializer
+            slot_bytes: Taille initiale de chaque segment (agrandi au besoin)
+        """
+        self.slot_bytes = slot_bytes
+        super().__init__("shm", workers, max_queue, initializer, initargs)
+
+    def _start(self, initializer: Optional[Callable], initargs: Tuple):
+        # fork: les workers héritent du modèle déjà chargé (spawn sinon)
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+            for _ in range(self.capacity)
+        ]
+        self._free_slots = list(range(self.capacity))
+        self._task_ids = itertools.count()
+        # id de tâche -> (future, slot, worker)
+        self._pending: Dict[int, Tuple[asyncio.Future, Optional[int], int]] = {}
+        self._worker_load = [0] * self.workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+        self._results = context.Queue()
+        self._task_queues = [context.Queue() for _ in range(self.workers)]
+        self._processes = [
+            context.Process(
+                target=_shm_worker,
+                args=(tasks, self._results, initializer, initargs),
+                name=f"inference-{index}",
+                daemon=True
+            )
+            for index, tasks in enumerate(self._task_queues)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+
+    def _read_results(self):
+        """Thread de lecture des résultats: les futures sont résolues dans la boucle asyncio"""
+        while not self._closed:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [index for index, process in enumerate(self._processes) if not process.is_alive()]
+                if dead and self._loop is not None and not self._closed:
+                    self._loop.call_soon_threadsafe(self._fail_workers, dead)
+                continue
+            except (EOFError, OSError):
+                break
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._resolve, message)
+
+    def _resolve(self, message: Tuple):
+        task_id, started_at, finished_at, ok, payload = message
+        entry = self._pending.pop(task_id, None)
+        if entry is None:
+            return
+        future, slot, worker = entry
+        self._release(slot, worker)
+        if future.done():
+            return
+        if ok:
+            future.set_result((started_at, finished_at, payload))
+        else:
+            future.set_exception(payload)
+
+    def _fail_workers(self, workers: List[int]):
+        """Échoue les jobs d'un processus d'inférence arrêté"""
+        for task_id, (future, slot, worker) in list(self._pending.items()):
+            if worker in workers:
+                del self._pending[task_id]
+                self._release(slot, worker)
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Processus d'inférence {worker} arrêté"))
+
+    def is_saturated(self) -> bool:
+        # Un job annulé (client parti, délai dépassé) ne compte plus dans in_flight mais garde
+        # son slot jusqu'à la réponse du worker: l'admission suit aussi les slots libres
+        return super().is_saturated() or not self._free_slots
+
+    def _release(self, slot: Optional[int], worker: int):
+        if slot is not None:
+            self._free_slots.append(slot)
+        self._worker_load[worker] -= 1
+
+    def _ensure_slot_size(self, slot: int, nbytes: int) -> shared_memory.SharedMemory:
+        """Réalloue le segment d'un slot s'il est trop petit pour le batch"""
+        segment = self._slots[slot]
+        if segment.size < nbytes:
+            logger.info(f"Agrandissement du segment de mémoire partagée {slot}: {segment.size} -> {nbytes} octets")
+            segment.close()
+            segment.unlink()
+            segment = self._slots[slot] = shared_memory.SharedMemory(create=True, size=nbytes)
+        return segment
+
+    def _submit(self, worker: int, fn: Callable, args: Tuple,
+                images: Optional[Sequence[np.ndarray]] = None) -> asyncio.Future:
+        """Envoie une tâche à un worker (frames copiées dans un slot libre)"""
+        self._loop = asyncio.get_running_loop()
+        task_id = next(self._task_ids)
+        slot = shm_name = layouts = None
+        if images is not None:
+            slot = self._free_slots.pop()
+            segment = self._ensure_slot_size(slot, sum(image.nbytes for image in images))
+            layouts = _write_frames(segment.buf, images)
+            shm_name = segment.name
+
+        future = self._loop.create_future()
+        self._pending[task_id] = (future, slot, worker)
+        self._worker_load[worker] += 1
+        self._task_queues[worker].put((task_id, slot, shm_name, layouts, fn, args))
+        return future
+
+    async def prime(self, report: Callable = os.getpid) -> List[Any]:
+        """Attend l'initialisation de chaque processus (un appel à `report` par worker)"""
+        calls = [self._submit(worker, report, ()) for worker in range(self.workers)]
+        reports = [payload for _, _, payload in await asyncio.gather(*calls)]
+        logger.info(f"Pool d'inférence prêt ({self.workers} processus en mémoire partagée)")
+        return reports
+
+    async def run(self, fn: Callable, images: Sequence[np.ndarray], *args) -> Any:
+        """
+        Exécute `fn(images, *args)` dans le processus le moins chargé
+
+        Args:
+            fn: Fonction à exécuter (importable au niveau module), qui ne
+                doit pas conserver de référence aux frames
+            images: Frames transmises par mémoire partagée
+            *args: Autres arguments (sérialisés)
+
+        Returns:
+            Résultat de la fonction
+
+        Raises:
+            PoolSaturatedError: si la file d'attente est pleine
+        """
+        if self.is_saturated():
+            self.rejected += 1
+            raise PoolSaturatedError(retry_after=self.retry_after())
+
+        alive = [index for index, process in enumerate(self._processes) if process.is_alive()]
+        if not alive:
+            raise RuntimeError("Aucun processus d'inférence actif")
+        worker = min(alive, key=self._worker_load.__getitem__)
+        self.in_flight += 1
+        submitted_at = time.time()
+        try:
+            started_at, finished_at, result = await self._submit(worker, fn, args, images)
+        finally:
+            self.in_flight -= 1
+
+        self._record(submitted_at, started_at, finished_at)
+        return result
+
+    def shutdown(self, wait: bool = True):
+        self._closed = True
+        for tasks in self._task_queues:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5 if wait else 0)
+            if process.is_alive():
+                process.terminate()
+        for future, _, _ in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        for segment in self._slots:
+            segment.close()
+            segment.unlink()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["shm_bytes"] = sum(segment.size for segment in self._slots)
+        stats["alive_workers"] = sum(process.is_alive() for process in self._processes)
+        return stats
+
+
+def create_pool(mode: str = "thread", workers: int = 1, max_queue: int = 4,
+                initializer: Optional[Callable] = None, initargs: Tuple = ()) -> InferencePool:
+    """Instancie le pool d'inférence demandé par la configuration"""
+    if mode == "shm":
+        return SharedMemoryPool(workers, max_queue, initializer, initargs)
+    return InferencePool(mode, workers, max_queue, initializer, initargs)
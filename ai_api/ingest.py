@@ -0,0 +1,236 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# PyTurboJPEG (optionnel): décodage JPEG réduit directement dans un buffer NumPy
+try:
+    from turbojpeg import TurboJPEG
+    _turbojpeg = TurboJPEG()
+except Exception as e:  # module absent ou libturbojpeg introuvable
+    logger.info(f"PyTurboJPEG indisponible, décodage OpenCV utilisé: {e}")
+    _turbojpeg = None
+
+# Formats de frame acceptés par l'API
+FRAME_FORMATS = ("encoded", "bgr", "i420", "nv12")
+RAW_DTYPES = ("uint8",)
+
+# Facteurs de réduction DCT supportés par libjpeg (du plus fort au plus faible)
+JPEG_REDUCTION_FACTORS = (8, 4, 2)
+_CV2_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+_YUV_CONVERSIONS = {
+    "i420": cv2.COLOR_YUV2BGR_I420,
+    "nv12": cv2.COLOR_YUV2BGR_NV12,
+}
+
+# Marqueurs SOF (Start Of Frame) portant les dimensions de l'image
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class FrameFormatError(ValueError):
+    """Frame invalide ou format non supporté"""
+
+
+@dataclass
+class DecodedFrame:
+    """
+    Frame décodée en BGR pour le modèle
+
+    `scale_x` / `scale_y` convertissent les coordonnées de l'image décodée
+    vers celles de la frame d'origine (décodage à résolution réduite).
+    """
+    image: np.ndarray
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+    pooled: bool = False
+
+
+class BufferPool:
+    """Buffers NumPy réutilisables, indexés par forme, pour éviter une allocation par frame"""
+
+    def __init__(self, max_per_shape: int = 16):
+        self.max_per_shape = max_per_shape
+        self._free: Dict[Tuple[int, ...], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        with self._lock:
+            free = self._free.get(shape)
+            if free:
+                self.reused += 1
+                return free.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype=np.uint8)
+
+    def release(self, array: np.ndarray):
+        with self._lock:
+            free = self._free.setdefault(array.shape, [])
+            if len(free) < self.max_per_shape:
+                free.append(array)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "allocated": self.allocated,
+                "reused": self.reused,
+                "free": sum(len(free) for free in self._free.values())
+            }
+
+
+def turbojpeg_available() -> bool:
+    return _turbojpeg is not None
+
+
+def is_jpeg(data: bytes) -> bool:
+    return data[:2] == b"\xff\xd8"
+
+
+def jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Lit les dimensions d'un JPEG dans son en-tête, sans le décoder
+
+    Returns:
+        Tuple (largeur, hauteur) ou None si l'en-tête est illisible
+    """
+    index = 2
+    size = len(data)
+    while index + 9 < size:
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        if marker == 0xFF:
+            index += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = (data[index + 5] << 8) | data[index + 6]
+            width = (data[index + 7] << 8) | data[index + 8]
+            return width, height
+        segment_length = (data[index + 2] << 8) | data[index + 3]
+        index += 2 + segment_length
+    return None
+
+
+def reduction_factor(width: int, height: int, target_size: int) -> int:
+    """Plus grand facteur de réduction qui garde l'image au moins aussi grande que l'entrée du modèle"""
+    longest = max(width, height)
+    for factor in JPEG_REDUCTION_FACTORS:
+        if longest // factor >= target_size:
+            return factor
+    return 1
+
+
+class FrameDecoder:
+    """
+    Décodage rapide des frames vers des tableaux NumPy BGR
+
+    Les JPEG plus grands que l'entrée du modèle sont décodés à résolution
+    réduite (réduction DCT de libjpeg), directement dans un buffer réutilisable
+    quand PyTurboJPEG est disponible. Les frames brutes (BGR, I420, NV12)
+    ne sont pas décodées.
+    """
+
+    def __init__(self, target_size: int = 640, buffer_pool: Optional[BufferPool] = None):
+        self.target_size = target_size
+        self.buffer_pool = buffer_pool or BufferPool()
+
+    def decode(self, data: bytes, frame_format: str = "encoded",
+               frame_shape: Optional[Sequence[int]] = None, frame_dtype: str = "uint8") -> DecodedFrame:
+        """
+        Décode une frame reçue par l'API
+
+        Args:
+            data: Contenu de la frame
+            frame_format: "encoded" (JPEG, PNG...), "bgr", "i420" ou "nv12"
+            frame_shape: Forme déclarée des frames brutes: (hauteur, largeur[, 3])
+            frame_dtype: Type déclaré des frames brutes
+
+        Returns:
+            Frame décodée en BGR
+        """
+        if frame_format == "encoded":
+            if is_jpeg(data):
+                return self.decode_jpeg(data)
+            return self.decode_other(data)
+        if frame_format in _YUV_CONVERSIONS or frame_format == "bgr":
+            return self.decode_raw(data, frame_format, frame_shape, frame_dtype)
+        raise FrameFormatError(f"Format de frame inconnu: {frame_format} (attendu: {', '.join(FRAME_FORMATS)})")
+
+    def decode_jpeg(self, data: bytes) -> DecodedFrame:
+        """Décode un JPEG, à résolution réduite s'il dépasse l'entrée du modèle"""
+        dimensions = jpeg_dimensions(data)
+        if dimensions is None:
+            return self.decode_other(data)
+        width, height = dimensions
+        factor = reduction_factor(width, height, self.target_size)
+
+        if _turbojpeg is not None:
+            # Taille de sortie de libjpeg-turbo: arrondi supérieur
+            out_width = (width + factor - 1) // factor
+            out_height = (height + factor - 1) // factor
+            buffer = self.buffer_pool.acquire((out_height, out_width, 3))
+            try:
+                image = _turbojpeg.decode(
+                    data,
+                    scaling_factor=(1, factor) if factor > 1 else None,
+                    dst=buffer
+                )
+            except Exception as e:
+                self.buffer_pool.release(buffer)
+                raise FrameFormatError(f"JPEG invalide: {e}")
+            return DecodedFrame(image, width / out_width, height / out_height, pooled=True)
+
+        flags = _CV2_REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR)
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        if image is None:
+            raise FrameFormatError("JPEG invalide")
+        return DecodedFrame(image, width / image.shape[1], height / image.shape[0])
+
+    def decode_other(self, data: bytes) -> DecodedFrame:
+        """Décode un format d'image quelconque supporté par OpenCV (PNG, BMP...)"""
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise FrameFormatError("Image invalide ou format non supporté")
+        return DecodedFrame(image)
+
+    def decode_raw(self, data: bytes, frame_format: str,
+                   frame_shape: Optional[Sequence[int]], frame_dtype: str) -> DecodedFrame:
+        """Interprète une frame brute (sans décodage) selon sa forme et son type déclarés"""
+        if frame_dtype not in RAW_DTYPES:
+            raise FrameFormatError(f"Type de frame non supporté: {frame_dtype} (attendu: {', '.join(RAW_DTYPES)})")
+        if not frame_shape or len(frame_shape) < 2:
+            raise FrameFormatError("frame_shape (hauteur, largeur) est requis pour une frame brute")
+        height, width = int(frame_shape[0]), int(frame_shape[1])
+
+        if frame_format == "bgr":
+            expected = height * width * 3
+            if len(data) != expected:
+                raise FrameFormatError(f"Taille de frame BGR invalide: {len(data)} octets, {expected} attendus")
+            # Vue sans copie sur les octets reçus
+            return DecodedFrame(np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+
+        if height % 2 or width % 2:
+            raise FrameFormatError("Les frames YUV 4:2:0 doivent avoir des dimensions paires")
+        expected = height * width * 3 // 2
+        if len(data) != expected:
+            raise FrameFormatError(f"Taille de frame YUV invalide: {len(data)} octets, {expected} attendus")
+        yuv = np.frombuffer(data, dtype=np.uint8).reshape(height * 3 // 2, width)
+        buffer = self.buffer_pool.acquire((height, width, 3))
+        cv2.cvtColor(yuv, _YUV_CONVERSIONS[frame_format], dst=buffer)
+        return DecodedFrame(buffer, pooled=True)
+
+    def release(self, frame: DecodedFrame):
+        """Rend le buffer d'une frame au pool une fois l'inférence terminée"""
+        if frame.pooled:
+            self.buffer_pool.release(frame.image)
+            frame.pooled = False
@@ -1,15 +1,26 @@
 import cv2
 import requests
-import json
 from pathlib import Path
 import time
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from detection_client import AsyncDetectionClient, fetch_config
+from rate_control import AdaptiveRateScheduler, FrameQualityController
+
 # Configuration
-API_URL = "http://localhost:8000/detect_ball"
+SESSIONS_URL = "http://localhost:8000/sessions"
+CONFIG_URL = "http://localhost:8000/config"
+
+# Taille et qualité JPEG des frames ajustées selon l'aller-retour et la confiance des détections
+ADAPTIVE_QUALITY = True
 
-# Définition des deux bbox cibles
+# Client asynchrone: les requêtes partent en arrière-plan, l'affichage ne bloque jamais
+ASYNC_CLIENT = True
+MAX_IN_FLIGHT = 2
+ASYNC_TIMEOUT = 1.0
+
+# Définition des deux bbox cibles (session Touch & Dash tenue par le serveur)
 target_bbox_left = {"x1": 50, "y1": 300, "x2": 150, "y2": 400}
 target_bbox_right = {"x1": 490, "y1": 300, "x2": 590, "y2": 400}
 
@@ -40,6 +51,45 @@ def compress_frame(frame, quality=70, max_width=640):
     _, img_encoded = cv2.imencode('.jpg', frame, encode_param)
     return img_encoded.tobytes()
 
+def prepare_frame(frame, quality_control=None):
+    """
+    Frame encodée et son facteur d'échelle
+    
+    Le facteur est envoyé avec la frame (`scale`): le serveur ramène la
+    détection dans le repère des cibles, celui de la caméra.
+    
+    Returns:
+        Tuple (JPEG, facteur d'échelle de la frame envoyée)
+    """
+    if quality_control is None:
+        width = frame.shape[1]
+        return compress_frame(frame, quality=70, max_width=640), min(640 / width, 1.0)
+    return quality_control.encode(frame)
+
+def create_session():
+    """Crée la session d'exercice côté serveur, cibles dans le repère de la caméra"""
+    response = session.post(SESSIONS_URL, json={"targets": [target_bbox_left, target_bbox_right]}, timeout=2.0)
+    response.raise_for_status()
+    return response.json()
+
+def report_events(events):
+    """
+    Affiche les événements de la session (touche, nouvelle cible, fin)
+    
+    Returns:
+        True si l'exercice est terminé
+    """
+    finished = False
+    for event in events:
+        if event["type"] == "touch":
+            print(f"🎯 Cible atteinte ! Touches: {event['touches']} | Score: {event['score']}")
+        elif event["type"] == "target":
+            print(f"🔄 Nouvelle cible: {event['side']}")
+        elif event["type"] == "finished":
+            print(f"🏁 Exercice terminé: {event['touches']} touches, score {event['score']}/100")
+            finished = True
+    return finished
+
 def main():
     # Initialisation
     cap = cv2.VideoCapture(0)
@@ -53,13 +103,34 @@ def main():
     cap.set(cv2.CAP_PROP_FPS, 30)
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Buffer minimal
 
+    try:
+        state = create_session()
+    except requests.RequestException as e:
+        print(f"❌ Impossible de créer la session: {e}")
+        cap.release()
+        return
+    session_id = state["session_id"]
+    frame_url = f"{SESSIONS_URL}/{session_id}/frame"
+    print(f"🏃 Session {session_id}: {state['exercise']}, {state['remaining_s']:.0f}s")
+
     frame_count = 0
-    current_target = target_bbox_left  # Commencer avec la cible gauche
+    # Cible courante: celle de l'état renvoyé par le serveur, qui gère l'alternance
+    current_target = state["current_target"]
+    finished = False
     last_ball_position = None
     last_detection_time = 0
-    detection_interval = 0.1  # 100ms entre les détections
+    # Fréquence de détection adaptée à la vitesse du ballon, à la cible et à la latence de l'API
+    rate = AdaptiveRateScheduler()
+    # Sans retry: une frame renvoyée en retard n'a plus d'intérêt
+    client = AsyncDetectionClient(frame_url, max_in_flight=MAX_IN_FLIGHT, timeout=ASYNC_TIMEOUT) if ASYNC_CLIENT else None
+    # Réglage des frames d'après la taille d'entrée du modèle et la latence visée par l'API
+    quality = FrameQualityController.from_config(fetch_config(CONFIG_URL)) if ADAPTIVE_QUALITY else None
 
     print("📷 Appuyez sur 'q' pour quitter")
+    if client is not None:
+        print(f"📡 Client asynchrone: {MAX_IN_FLIGHT} requête(s) en cours au maximum")
+    if quality is not None:
+        print(f"🎚️ Frames adaptatives: {quality.stats()}")
 
     while True:
         ret, frame = cap.read()
@@ -73,6 +144,39 @@ def main():
         h, w, c = frame.shape
         print(f"📐 Frame size: {w}x{h}")
         
+        if client is not None:
+            # Appliquer les résultats arrivés (dans l'ordre de capture, les plus anciens sont abandonnés)
+            for detection in client.poll():
+                if detection.error is not None:
+                    print(f"❌ API Error: {detection.error}")
+                    if quality is not None:
+                        quality.observe(detection.latency, None)
+                    continue
+                rate.record_latency(detection.latency)
+                result = detection.response
+                sent = detection.context
+                if quality is not None:
+                    quality.observe(detection.latency, result.get("confidence"))
+                print(f"🔍 API Result: {result} | Délai capture → résultat: {detection.delay * 1000:.1f}ms"
+                      f" | Frame: {sent['settings']}")
+                # Bbox déjà dans le repère de la caméra (celui des cibles)
+                last_ball_position = result["ball_bbox"] if result.get("ball_detected", False) else None
+                # Une réponse plus ancienne peut avoir été abandonnée: l'état fait foi, pas les seuls événements
+                finished = report_events(result["events"]) or result["state"]["finished"]
+                rate.observe(last_ball_position, sent["target"], detection.captured_at)
+                current_target = result["state"]["current_target"]
+            
+            # Envoyer la frame (avant dessin) sans attendre la réponse
+            if not finished and client.has_capacity() and rate.should_detect(current_time):
+                compressed_image, scale = prepare_frame(frame, quality)
+                files = {'file': ("frame.jpg", compressed_image, 'image/jpeg')}
+                data = {'scale': scale}
+                context = {
+                    "target": current_target,
+                    "settings": quality.settings() if quality is not None else None
+                }
+                client.submit(files, data, captured_at=current_time, context=context)
+        
         # Dessiner la bbox cible actuelle avec couleur rouge vif
         print(f"🎯 Drawing target bbox: {current_target}")
         cv2.rectangle(frame,
@@ -84,50 +188,58 @@ def main():
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
         
         # Dessiner un petit cercle au centre de la cible pour vérifier
-        center_x = (current_target["x1"] + current_target["x2"]) // 2
-        center_y = (current_target["y1"] + current_target["y2"]) // 2
+        center_x = int(current_target["x1"] + current_target["x2"]) // 2
+        center_y = int(current_target["y1"] + current_target["y2"]) // 2
         cv2.circle(frame, (center_x, center_y), 5, (0, 255, 255), -1)  # Jaune
         
         # Test simple : dessiner une ligne diagonale pour vérifier que le dessin fonctionne
         cv2.line(frame, (0, 0), (100, 100), (255, 255, 255), 2)  # Ligne blanche
 
-        # Détection avec intervalle de temps au lieu de frame count
-        if current_time - last_detection_time >= detection_interval:
-            # Compresser l'image
-            compressed_image = compress_frame(frame, quality=70, max_width=640)
+        # Détection synchrone à intervalle adaptatif, jusqu'à la fin de l'exercice
+        if client is None and not finished and rate.should_detect(current_time):
+            # Compresser l'image (taille et qualité courantes)
+            compressed_image, scale = prepare_frame(frame, quality)
             
             files = {'file': ("frame.jpg", compressed_image, 'image/jpeg')}
-            data = {'target_bbox': json.dumps(current_target)}
+            data = {'scale': scale}
+            request_target = current_target
 
             try:
                 start_time = time.time()
-                response = session.post(API_URL, files=files, data=data, timeout=0.5)
+                response = session.post(frame_url, files=files, data=data, timeout=0.5)
                 latency = (time.time() - start_time) * 1000
-                print(f"📡 API Response status: {response.status_code} | Latence: {latency:.1f}ms")
+                print(f"📡 API Response status: {response.status_code} | Latence: {latency:.1f}ms"
+                      f" | Frame: {quality.settings() if quality is not None else None}")
+                rate.record_latency(latency / 1000)
                 
                 if response.ok:
                     result = response.json()
+                    if quality is not None:
+                        quality.observe(latency / 1000, result.get("confidence"))
                     print(f"🔍 API Result: {result}")
-                    if result.get("ball_detected", False) and "ball_bbox" in result:
+                    if result.get("ball_detected", False):
                         last_ball_position = result["ball_bbox"]
                         print(f"⚽ Ball detected at: {last_ball_position}")
-                        # Vérifier si le ballon atteint la cible
-                        if result.get("reaches_target", False):
-                            print("🎯 Cible atteinte ! Changement de côté...")
-                            # Alterner la cible
-                            current_target = target_bbox_right if current_target == target_bbox_left else target_bbox_left
                     else:
                         last_ball_position = None
                         print("❌ No ball detected or invalid response")
+                    # Touche, changement de côté et fin décidés par le serveur
+                    finished = report_events(result["events"]) or result["state"]["finished"]
+                    current_target = result["state"]["current_target"]
                 else:
                     print(f"❌ API Error: {response.status_code} - {response.text}")
+                    if quality is not None:
+                        quality.observe(latency / 1000, None)
             except requests.exceptions.Timeout:
                 print("⏰ Timeout - API trop lente")
+                if quality is not None:
+                    quality.observe(time.time() - start_time, None)
             except requests.exceptions.ConnectionError:
                 print("🔌 Erreur de connexion")
             except Exception as e:
                 print(f"⚠️ Erreur API: {str(e)}")
             
+            rate.observe(last_ball_position, request_target, current_time)
             last_detection_time = current_time
 
         # Afficher la bbox du ballon si disponible
@@ -149,7 +261,22 @@ def main():
 
     cap.release()
     cv2.destroyAllWindows()
+    try:
+        response = session.delete(f"{SESSIONS_URL}/{session_id}", timeout=2.0)
+        if response.ok:
+            final = response.json()
+            print(f"📊 Score final: {final['touches']} touches, {final['score']}/100")
+        else:
+            print(f"⚠️ Session non close: {response.status_code} - {response.text}")
+    except requests.RequestException as e:
+        print(f"⚠️ Impossible de clore la session: {e}")
     session.close()
+    print(f"📊 Détection adaptative: {rate.stats()}")
+    if client is not None:
+        client.close()
+        print(f"📊 Client asynchrone: {client.stats()}")
+    if quality is not None:
+        print(f"📊 Frames adaptatives: {quality.stats()}")
 
 if __name__ == "__main__":
     main()
@@ -5,128 +5,28 @@ from pathlib import Path
 import time
 from ultralytics import YOLO
 
+from backends import detections_array, select_detections
+from geometry import from_dicts, overlap_matrix
+from motion_gate import MotionGate
+from pipeline import DetectionPipeline
+from rate_control import AdaptiveRateScheduler
+from roi import RoiTracker, crop_frame, to_frame_coordinates
+from tracking import BallTracker
+
 # Configuration
 MODEL_PATH = "models/best.pt"
 
+# Inférence ROI: YOLO sur un recadrage autour de la position prédite du ballon
+USE_ROI_INFERENCE = True
+ROI_INPUT_SIZE = 320
+
+# Porte de mouvement: pas de YOLO si rien n'a bougé près du ballon ou des cibles
+USE_MOTION_GATE = True
+
 # Définition des deux bbox cibles (ajustées pour l'effet miroir)
 target_bbox_left = {"x1": 490, "y1": 300, "x2": 590, "y2": 400}  # Cible "gauche" (en fait à droite à l'écran)
 target_bbox_right = {"x1": 50, "y1": 300, "x2": 150, "y2": 400}  # Cible "droite" (en fait à gauche à l'écran)
 
-class BallTracker:
-    """Classe pour le suivi du ballon avec filtre de Kalman"""
-    
-    def __init__(self):
-        # Initialiser le filtre de Kalman
-        # État: [x, y, vx, vy] (position et vitesse)
-        self.kalman = cv2.KalmanFilter(4, 2, 0)
-        
-        # Matrice de transition (modèle de mouvement)
-        self.kalman.transitionMatrix = np.array([
-            [1, 0, 1, 0],  # x = x + vx
-            [0, 1, 0, 1],  # y = y + vy
-            [0, 0, 1, 0],  # vx = vx
-            [0, 0, 0, 1]   # vy = vy
-        ], np.float32)
-        
-        # Matrice de mesure (on observe seulement x et y)
-        self.kalman.measurementMatrix = np.array([
-            [1, 0, 0, 0],
-            [0, 1, 0, 0]
-        ], np.float32)
-        
-        # Matrice de covariance du processus (bruit du modèle)
-        self.kalman.processNoiseCov = np.array([
-            [1, 0, 0, 0],
-            [0, 1, 0, 0],
-            [0, 0, 10, 0],
-            [0, 0, 0, 10]
-        ], np.float32) * 0.1
-        
-        # Matrice de covariance de la mesure (bruit de l'observation)
-        self.kalman.measurementNoiseCov = np.array([
-            [10, 0],
-            [0, 10]
-        ], np.float32)
-        
-        # État initial
-        self.kalman.statePre = np.array([[0], [0], [0], [0]], np.float32)
-        self.kalman.statePost = np.array([[0], [0], [0], [0]], np.float32)
-        
-        self.last_measurement = None
-        self.is_initialized = False
-        
-    def update(self, ball_bbox):
-        """Met à jour le filtre avec une nouvelle détection"""
-        if ball_bbox is None:
-            # Pas de détection, prédire seulement
-            prediction = self.kalman.predict()
-            return {
-                "x": int(prediction[0]),
-                "y": int(prediction[1]),
-                "vx": prediction[2],
-                "vy": prediction[3],
-                "is_prediction": True
-            }
-        
-        # Calculer le centre du ballon
-        center_x = (ball_bbox["x1"] + ball_bbox["x2"]) / 2
-        center_y = (ball_bbox["y1"] + ball_bbox["y2"]) / 2
-        
-        # Mesure actuelle
-        measurement = np.array([[center_x], [center_y]], np.float32)
-        
-        if not self.is_initialized:
-            # Première détection, initialiser le filtre
-            self.kalman.statePre = np.array([[center_x], [center_y], [0], [0]], np.float32)
-            self.kalman.statePost = np.array([[center_x], [center_y], [0], [0]], np.float32)
-            self.is_initialized = True
-            self.last_measurement = measurement
-            return {
-                "x": int(center_x),
-                "y": int(center_y),
-                "vx": 0,
-                "vy": 0,
-                "is_prediction": False
-            }
-        
-        # Prédire l'état suivant
-        prediction = self.kalman.predict()
-        
-        # Corriger avec la mesure
-        correction = self.kalman.correct(measurement)
-        
-        # Calculer la vitesse (différence avec la mesure précédente)
-        if self.last_measurement is not None:
-            vx = measurement[0] - self.last_measurement[0]
-            vy = measurement[1] - self.last_measurement[1]
-        else:
-            vx = vy = 0
-        
-        self.last_measurement = measurement
-        
-        return {
-            "x": int(correction[0]),
-            "y": int(correction[1]),
-            "vx": vx[0],
-            "vy": vy[0],
-            "is_prediction": False
-        }
-    
-    def get_predicted_bbox(self, ball_size=50):
-        """Retourne la bbox prédite basée sur l'état du filtre"""
-        if not self.is_initialized:
-            return None
-        
-        prediction = self.kalman.predict()
-        x, y = int(prediction[0]), int(prediction[1])
-        
-        return {
-            "x1": x - ball_size // 2,
-            "y1": y - ball_size // 2,
-            "x2": x + ball_size // 2,
-            "y2": y + ball_size // 2
-        }
-
 def load_model():
     """Charge le modèle YOLO"""
     try:
@@ -150,41 +50,27 @@ def adjust_bbox_for_mirror(bbox, frame_width):
         "y2": bbox["y2"]
     }
 
-def detect_ball(model, frame):
-    """Détecte le ballon dans l'image avec le modèle YOLO"""
+def detect_ball(model, frame, imgsz=None):
+    """Détecte le ballon dans l'image avec le modèle YOLO (taille d'entrée optionnelle)"""
     try:
         # Inférence avec le modèle
-        results = model(frame)
+        results = model(frame, imgsz=imgsz) if imgsz else model(frame)
         
-        # Extraire les détections (nouvelle API ultralytics)
         if len(results) > 0:
-            result = results[0]  # Premier résultat
-            boxes = result.boxes
-            
-            if boxes is not None and len(boxes) > 0:
-                # Chercher la détection avec la plus haute confiance
-                best_detection = None
-                best_confidence = 0
-                
-                for box in boxes:
-                    # Extraire les coordonnées et la confiance
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = box.cls[0].cpu().numpy()
-                    
-                    # Vérifier que c'est bien un ballon (classe 0) et confiance suffisante
-                    if int(class_id) == 0 and confidence > 0.5:
-                        if confidence > best_confidence:
-                            best_confidence = confidence
-                            best_detection = {
-                                "x1": int(x1),
-                                "y1": int(y1),
-                                "x2": int(x2),
-                                "y2": int(y2),
-                                "confidence": float(confidence)
-                            }
-                
-                return best_detection, best_confidence
+            # Toutes les boîtes en un seul transfert, puis ballon (classe 0)
+            # le plus confiant au-dessus du seuil
+            best = select_detections(detections_array(results[0]), classes=[0],
+                                     min_confidence=0.5, top_k=1)
+            if len(best) > 0:
+                x1, y1, x2, y2, confidence, _ = best[0].tolist()
+                best_detection = {
+                    "x1": int(x1),
+                    "y1": int(y1),
+                    "x2": int(x2),
+                    "y2": int(y2),
+                    "confidence": confidence
+                }
+                return best_detection, confidence
         
         return None, 0
         
@@ -192,26 +78,35 @@ def detect_ball(model, frame):
         print(f"⚠️ Erreur lors de la détection: {e}")
         return None, 0
 
+def detect_ball_roi(model, frame, roi):
+    """
+    Détecte le ballon en analysant d'abord un recadrage autour de la position prédite
+    
+    Repli sur la frame entière si le recadrage ne donne pas de détection
+    assez confiante ou si le suivi est perdu.
+    """
+    h, w = frame.shape[:2]
+    window = roi.window(w, h)
+    if window is not None:
+        ball_bbox, confidence = detect_ball(model, crop_frame(frame, window), imgsz=roi.input_size)
+        box = (ball_bbox["x1"], ball_bbox["y1"], ball_bbox["x2"], ball_bbox["y2"]) if ball_bbox else None
+        if roi.accept(box, confidence):
+            x1, y1, x2, y2 = to_frame_coordinates(box, window)
+            roi.observe((x1, y1, x2, y2))
+            return {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "confidence": float(confidence)}, confidence
+    
+    ball_bbox, confidence = detect_ball(model, frame)
+    box = (ball_bbox["x1"], ball_bbox["y1"], ball_bbox["x2"], ball_bbox["y2"]) if ball_bbox else None
+    roi.observe(box, full_frame=True)
+    return ball_bbox, confidence
+
 def check_target_reached(ball_bbox, target_bbox, threshold=0.7):
     """Vérifie si le ballon atteint la cible (dès qu'il touche à peine)"""
     if ball_bbox is None:
         return False
     
-    # Vérifier si les bbox se chevauchent (même légèrement)
-    # Le ballon touche la cible si :
-    # - Le bord gauche du ballon est à gauche du bord droit de la cible ET
-    # - Le bord droit du ballon est à droite du bord gauche de la cible ET
-    # - Le bord haut du ballon est au-dessus du bord bas de la cible ET
-    # - Le bord bas du ballon est en-dessous du bord haut de la cible
-    
-    overlap_x = (ball_bbox["x1"] < target_bbox["x2"] and 
-                ball_bbox["x2"] > target_bbox["x1"])
-    
-    overlap_y = (ball_bbox["y1"] < target_bbox["y2"] and 
-                ball_bbox["y2"] > target_bbox["y1"])
-    
-    # Retourner true dès qu'il y a un chevauchement (même minime)
-    return overlap_x and overlap_y
+    # Chevauchement (même minime) du ballon avec la cible
+    return bool(overlap_matrix(from_dicts([ball_bbox]), from_dicts([target_bbox]))[0, 0])
 
 def draw_target_bbox(frame, target_bbox, color=(0, 0, 255), thickness=3):
     """Dessine la bbox cible sur l'image d'affichage"""
@@ -275,8 +170,10 @@ def main():
         print("❌ Impossible de charger le modèle")
         return
 
-    # Initialiser le tracker
+    # Initialiser le tracker (affichage) et le suivi de l'inférence ROI (détection, sans miroir)
     tracker = BallTracker()
+    roi = RoiTracker(input_size=ROI_INPUT_SIZE) if USE_ROI_INFERENCE else None
+    gate = MotionGate() if USE_MOTION_GATE else None
 
     # Initialisation de la caméra
     cap = cv2.VideoCapture(0)
@@ -290,98 +187,142 @@ def main():
     cap.set(cv2.CAP_PROP_FPS, 30)
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Buffer minimal
 
-    frame_count = 0
-    current_target = target_bbox_left  # Commencer avec la cible gauche
-    last_ball_position = None
-    last_detection_time = 0
-    detection_interval = 0.1  # 100ms entre les détections YOLO
-    tracker_state = None
+    current_target = target_bbox_left  # Commencer avec la cible gauche (état de l'étage d'inférence)
+    # Fréquence de détection adaptée à la vitesse du ballon, à la cible et à la latence
+    rate = AdaptiveRateScheduler()
 
     print("📷 Appuyez sur 'q' pour quitter")
     print("🪞 Effet miroir corrigé - Les cibles sont ajustées")
-    print("⚡ Détection YOLO toutes les 100ms avec filtre de Kalman")
+    print("⚡ Fréquence de détection YOLO adaptative avec filtre de Kalman")
     print("🎯 Filtre de Kalman pour le suivi fluide du ballon")
+    print("🧵 Capture, inférence et affichage dans des étages séparés")
+    if roi is not None:
+        print(f"🔍 Inférence ROI activée (entrée {ROI_INPUT_SIZE}px, repli sur l'image entière)")
+    if gate is not None:
+        print("⏸️ Porte de mouvement activée (YOLO sauté sans mouvement près du ballon ou des cibles)")
 
-    while True:
+    def read_frame():
+        """Étage de capture"""
         ret, frame = cap.read()
         if not ret:
             print("❌ Échec de la capture")
-            break
+            return None
+        return frame
 
-        current_time = time.time()
-        
-        # Afficher les infos de l'image
-        h, w, c = frame.shape
-        print(f"📐 Frame size: {w}x{h}")
-        
-        # Corriger l'effet miroir pour l'affichage
-        display_frame = flip_frame_horizontal(frame)
-        
-        # Créer une copie propre de l'image pour la détection (sans bbox, sans miroir)
-        detection_frame = frame.copy()  # Image originale pour la détection
+    def run_detection(frame, captured_at):
+        """Étage d'inférence: détection YOLO et changement de cible (repère sans miroir)"""
+        nonlocal current_target
+        if not rate.should_detect(captured_at):
+            return None
         
+        h, w = frame.shape[:2]
         # Ajuster les coordonnées de la cible pour la détection (sans miroir)
         detection_target_bbox = adjust_bbox_for_mirror(current_target, w)
         
-        # Détection YOLO avec intervalle de temps (100ms)
-        if current_time - last_detection_time >= detection_interval:
+        gate_targets = [
+            (b["x1"], b["y1"], b["x2"], b["y2"])
+            for b in (adjust_bbox_for_mirror(target_bbox_left, w), adjust_bbox_for_mirror(target_bbox_right, w))
+        ]
+        if gate is not None and not gate.should_infer(frame, gate_targets, captured_at):
+            # Rien n'a bougé près du ballon ni des cibles: dernière détection, affichée telle quelle
+            observed = False
+            box = gate.bridge()
+            ball_bbox = dict(zip(("x1", "y1", "x2", "y2"), box)) if box is not None else None
+            print("⏸️ Pas de mouvement utile: YOLO sauté")
+        else:
+            observed = True
             start_time = time.time()
-            
-            # Détection directe avec le modèle
-            ball_bbox, confidence = detect_ball(model, detection_frame)
+            # Détection sur un recadrage autour du ballon suivi, ou sur toute l'image
+            # (la frame n'est jamais modifiée par l'affichage: pas de copie)
+            if roi is not None:
+                ball_bbox, confidence = detect_ball_roi(model, frame, roi)
+            else:
+                ball_bbox, confidence = detect_ball(model, frame)
             
             detection_time = (time.time() - start_time) * 1000
             print(f"⚡ YOLO Detection: {detection_time:.1f}ms | Confiance: {confidence:.2f}")
-            
-            if ball_bbox is not None:
-                # Ajuster les coordonnées du ballon pour l'affichage (avec miroir)
-                display_ball_bbox = adjust_bbox_for_mirror(ball_bbox, w)
-                last_ball_position = display_ball_bbox
-                print(f"⚽ Ball detected at: {ball_bbox} -> Display: {display_ball_bbox}")
-                
-                # Vérifier si le ballon atteint la cible
-                if check_target_reached(ball_bbox, detection_target_bbox):
-                    print("🎯 Cible atteinte ! Changement de côté...")
-                    # Alterner la cible
-                    current_target = target_bbox_right if current_target == target_bbox_left else target_bbox_left
-            else:
-                print("❌ No ball detected by YOLO")
-            
-            last_detection_time = current_time
+            rate.record_latency(detection_time / 1000)
+            if gate is not None:
+                gate.observe((ball_bbox["x1"], ball_bbox["y1"], ball_bbox["x2"], ball_bbox["y2"]) if ball_bbox else None)
+        rate.observe(ball_bbox, detection_target_bbox, captured_at)
         
-        # Mettre à jour le tracker de Kalman à chaque frame
-        tracker_state = tracker.update(last_ball_position)
-        
-        # Dessiner les éléments visuels sur l'image d'affichage (avec miroir)
-        print(f"🎯 Drawing target bbox: {current_target}")
-        draw_target_bbox(display_frame, current_target)
+        display_ball_bbox = None
+        if ball_bbox is not None:
+            # Ajuster les coordonnées du ballon pour l'affichage (avec miroir)
+            display_ball_bbox = adjust_bbox_for_mirror(ball_bbox, w)
+            print(f"⚽ Ball detected at: {ball_bbox} -> Display: {display_ball_bbox}")
+            
+            # Vérifier si le ballon atteint la cible (seulement sur une détection YOLO, pas reprise)
+            if observed and check_target_reached(ball_bbox, detection_target_bbox):
+                print("🎯 Cible atteinte ! Changement de côté...")
+                # Alterner la cible
+                current_target = target_bbox_right if current_target == target_bbox_left else target_bbox_left
+        else:
+            print("❌ No ball detected by YOLO")
         
-        # Dessiner la prédiction du filtre de Kalman
-        if tracker_state:
-            print(f"🎯 Kalman state: x={tracker_state['x']}, y={tracker_state['y']}, vx={float(tracker_state['vx']):.1f}, vy={float(tracker_state['vy']):.1f}")
-            draw_kalman_prediction(display_frame, tracker_state)
+        return {"ball_bbox": display_ball_bbox, "target": current_target, "captured_at": captured_at}
 
-        # Afficher la bbox du ballon si disponible (détection YOLO)
-        if last_ball_position:
-            print(f"🎨 Drawing ball bbox: {last_ball_position}")
-            draw_ball_bbox(display_frame, last_ball_position)
+    pipeline = DetectionPipeline(capture=read_frame, infer=run_detection)
+    pipeline.start()
 
-        # Afficher les statistiques en temps réel
-        fps_text = f"FPS: {1.0 / (current_time - last_detection_time + 0.001):.1f}"
-        cv2.putText(display_frame, fps_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # Afficher l'intervalle de détection
-        interval_text = f"YOLO: {detection_interval*1000:.0f}ms"
-        cv2.putText(display_frame, interval_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    # Étage d'affichage (thread principal), à la cadence de la caméra
+    last_ball_position = None
+    last_render_time = None
+    fps = 0.0
+    try:
+        for frame, captured_at, result in pipeline.render_frames():
+            current_time = time.time()
+            
+            # Corriger l'effet miroir pour l'affichage (copie: la frame de détection reste intacte)
+            display_frame = flip_frame_horizontal(frame)
+            
+            display_target = target_bbox_left
+            if result is not None:
+                display_target = result["target"]
+                if result["ball_bbox"] is not None:
+                    last_ball_position = result["ball_bbox"]
+            
+            # Mettre à jour le tracker de Kalman à chaque frame
+            tracker_state = tracker.update(last_ball_position)
+            
+            # Dessiner les éléments visuels sur l'image d'affichage (avec miroir)
+            draw_target_bbox(display_frame, display_target)
+            
+            # Dessiner la prédiction du filtre de Kalman
+            if tracker_state:
+                draw_kalman_prediction(display_frame, tracker_state)
+
+            # Afficher la bbox du ballon si disponible (détection YOLO)
+            if last_ball_position:
+                draw_ball_bbox(display_frame, last_ball_position)
+
+            # Afficher les statistiques en temps réel (cadence d'affichage, âge de la détection)
+            if last_render_time is not None and current_time > last_render_time:
+                fps = 0.9 * fps + 0.1 / (current_time - last_render_time)
+            last_render_time = current_time
+            fps_text = f"FPS: {fps:.1f}"
+            if result is not None:
+                fps_text += f" | Détection: {(current_time - result['captured_at']) * 1000:.0f}ms"
+            cv2.putText(display_frame, fps_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            
+            # Afficher l'intervalle et la fréquence effective de détection
+            rate_stats = rate.stats()
+            interval_text = f"YOLO: {rate_stats['interval_ms']:.0f}ms ({rate_stats['mode']}, {rate_stats['effective_rate_hz']:.1f} Hz)"
+            cv2.putText(display_frame, interval_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
-        cv2.imshow("Ball Detection (YOLO + Kalman)", display_frame)
-        frame_count += 1
+            cv2.imshow("Ball Detection (YOLO + Kalman)", display_frame)
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        pipeline.stop()
 
     cap.release()
     cv2.destroyAllWindows()
+    print(f"📊 Détection adaptative: {rate.stats()}")
+    print(f"📊 Pipeline: {pipeline.stats()}")
+    if gate is not None:
+        print(f"📊 Porte de mouvement: {gate.stats()}")
     print("👋 Détection terminée")
 
 if __name__ == "__main__":
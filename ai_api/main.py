@@ -1,21 +1,330 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, UploadFile, File, Header, HTTPException, Form, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import MutableHeaders
 from pydantic import BaseModel
-from typing import List, Tuple
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
 import numpy as np
-from PIL import Image
-import io
-from ultralytics import YOLO
+import cv2
+import asyncio
+import gc
+import hmac
+import json
+import math
+import os
+import tempfile
+import threading
+import time
 import logging
 
+from backends import create_backend, detections_array, extract_top_detection, select_detections
+from batching import BatchScheduler
+from geometry import as_boxes, iou_matrix, paired_iou
+from detection_log import KIND_SESSION, DetectionLogWriter
+from exercise import DEFAULT_DURATION_S, DEFAULT_TARGETS, SessionStore, TouchAndDashSession
+from frame_cache import FrameResultCache
+from motion_gate import DECISIONS, MotionGate
+from inference_pool import PoolSaturatedError, create_pool
+from metrics import CONTENT_TYPE, COUNT_BUCKETS, MetricsMiddleware, Registry, mark
+from profiling import SamplingProfiler
+from quantization import compare_detections, list_images
+from roi import RoiTracker, crop_frame, to_frame_coordinates
+import ingest
+from ingest import DecodedFrame, FrameDecoder, FrameFormatError
+from streaming import LatestFrameSlot
+from timing import FrameTimer, StageTimings
+from tracking import BatchedBallTracker, SharedTrack
+import video_processing
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Ball Detection API", version="1.0.0")
+async def mark_handler_start():
+    """Repère de début du handler: l'upload est lu et analysé (métrique `parse`)"""
+    mark("handler_start")
+
+app = FastAPI(title="Ball Detection API", version="1.0.0", dependencies=[Depends(mark_handler_start)])
+
+# Configuration du batching (fenêtre de collecte et taille maximale)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))
+
+# Configuration du pool d'inférence (hors de la boucle asyncio)
+INFERENCE_POOL_MODE = os.getenv("INFERENCE_POOL_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "4"))
+
+# Configuration des sessions d'exercice gérées par le serveur
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", "600"))
+
+# Taille d'entrée du modèle: les frames plus grandes sont décodées à résolution réduite
+MODEL_INPUT_SIZE = int(os.getenv("MODEL_INPUT_SIZE", "640"))
+
+# Paramètres annoncés aux clients (GET /config) pour régler taille et qualité des frames
+LATENCY_TARGET_MS = float(os.getenv("LATENCY_TARGET_MS", "150"))
+JPEG_QUALITY_RANGE = (50, 90)
+
+# Configuration du modèle et du backend d'inférence (torch, onnx, openvino)
+# Variantes quantifiées (onnx-int8, openvino-fp16): construites et contrôlées par quantization.py
+MODEL_PATH = os.getenv("MODEL_PATH", "./models/best.pt")
+# Version annoncée dans les réponses (nom des poids et empreinte par défaut)
+MODEL_VERSION = os.getenv("MODEL_VERSION") or None
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR") or None
+
+# Chauffe du modèle au démarrage, à la taille des frames de production (hauteur,largeur)
+WARMUP_RUNS = int(os.getenv("WARMUP_RUNS", "3"))
+WARMUP_FRAME_SHAPE = tuple(int(v) for v in os.getenv("WARMUP_FRAME_SHAPE", "480,640").split(","))
+
+# Inférence ROI: recadrage autour de la position prédite du ballon (sessions d'exercice)
+ROI_INFERENCE = os.getenv("ROI_INFERENCE", "false").lower() in ("1", "true", "yes")
+ROI_INPUT_SIZE = int(os.getenv("ROI_INPUT_SIZE", "320"))
+ROI_MIN_CONFIDENCE = float(os.getenv("ROI_MIN_CONFIDENCE", "0.5"))
+ROI_MAX_MISSES = int(os.getenv("ROI_MAX_MISSES", "3"))
+
+# Cache des résultats pour les frames presque identiques (scène immobile, caméra fixe)
+FRAME_CACHE = os.getenv("FRAME_CACHE", "false").lower() in ("1", "true", "yes")
+FRAME_CACHE_TTL_S = float(os.getenv("FRAME_CACHE_TTL_S", "1.0"))
+# Distance de Hamming maximale entre empreintes (sur 256 bits) pour réutiliser un résultat
+FRAME_CACHE_TOLERANCE = int(os.getenv("FRAME_CACHE_TOLERANCE", "4"))
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "16"))
+
+# Porte de mouvement des sessions: pas d'inférence si rien n'a bougé près du ballon ou des cibles
+MOTION_GATE = os.getenv("MOTION_GATE", "false").lower() in ("1", "true", "yes")
+# Part des pixels d'une zone qui doivent changer pour relancer le modèle
+MOTION_GATE_MIN_CHANGED = float(os.getenv("MOTION_GATE_MIN_CHANGED", "0.02"))
+# Durée maximale sans inférence sur une session (s)
+MOTION_GATE_MAX_SKIP_S = float(os.getenv("MOTION_GATE_MAX_SKIP_S", "0.5"))
+
+# Nombre maximal de ballons renvoyés par frame (paramètre top_k des requêtes)
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", "20"))
+
+# Traitement hors ligne des vidéos de session (frames par batch, traitements simultanés)
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "8"))
+VIDEO_MAX_JOBS = int(os.getenv("VIDEO_MAX_JOBS", "1"))
+# Attente avant de resoumettre un batch vidéo quand le pool est saturé (priorité au temps réel)
+VIDEO_RETRY_S = 0.05
+
+# Journal binaire des détections par session (désactivé sans DETECTION_LOG_DIR)
+DETECTION_LOG_DIR = os.getenv("DETECTION_LOG_DIR") or None
+DETECTION_LOG_FLUSH_S = float(os.getenv("DETECTION_LOG_FLUSH_S", "1.0"))
+
+# Endpoints d'administration (profilage, bascule du modèle), désactivés sans ADMIN_TOKEN
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+# Durée maximale d'une session de profilage (s)
+PROFILE_MAX_S = float(os.getenv("PROFILE_MAX_S", "120"))
+# Routes comptées par le profilage « N prochaines requêtes »
+PROFILED_PATHS = ("/detect_ball", "/detect_ball/batch", "/sessions/{session_id}/frame")
+
+# Bascule à chaud du modèle (POST /admin/model): frames de contrôle du nouveau modèle
+MODEL_CHECK_DIR = os.getenv("MODEL_CHECK_DIR") or None
+MODEL_CHECK_FRAMES = int(os.getenv("MODEL_CHECK_FRAMES", "32"))
+# Accord minimal avec le modèle actif (ballon détecté, ballon sur une cible) sur les frames de contrôle
+MODEL_SWAP_MIN_AGREEMENT = float(os.getenv("MODEL_SWAP_MIN_AGREEMENT", "0.8"))
+# Attente maximale de la fin des requêtes en cours sur l'ancien modèle (s)
+MODEL_SWAP_DRAIN_S = float(os.getenv("MODEL_SWAP_DRAIN_S", "30"))
+
+# Backend d'inférence chargé dans chaque worker du pool d'inférence
+_worker_state = threading.local()
+# Mode shm: backend chargé une fois dans le processus principal, hérité par les workers
+_preloaded_backend = None
+_preload_timings = {}
+inference_pool = None
+batch_scheduler = None
+roi_scheduler = None
+model_loading_task = None
+# Session de profilage en cours (une seule à la fois)
+profiler = None
+# Écriture des journaux de détections (DETECTION_LOG_DIR)
+detection_logs = None
+# Modèle servi par le pool d'inférence, et dernière bascule à chaud (une seule à la fois)
+active_model = {"version": None, "path": MODEL_PATH, "backend": INFERENCE_BACKEND, "loaded_at": None}
+model_swap = {"state": "idle"}
+model_swap_task = None
+
+# État de démarrage: l'API n'est prête qu'après la chauffe du modèle
+readiness = {"ready": False, "error": None}
+# Contrôle de précision de la variante quantifiée chargée (manifeste de quantization.py)
+model_gate = None
+startup_timings = {}
+frame_decoder = FrameDecoder(target_size=MODEL_INPUT_SIZE)
+frame_cache = FrameResultCache(
+    max_entries=FRAME_CACHE_SIZE,
+    max_scopes=SESSION_MAX,
+    ttl_s=FRAME_CACHE_TTL_S,
+    tolerance=FRAME_CACHE_TOLERANCE
+)
+# Suivi de Kalman de toutes les sessions (ROI et porte de mouvement): une piste par filtre
+session_tracks = BatchedBallTracker(capacity=64)
+
+def release_session(session: TouchAndDashSession):
+    """Libère les pistes de suivi et le cache d'une session terminée ou expirée"""
+    if session.tracker is not None:
+        session.tracker.close()
+    if session.motion_gate is not None:
+        session.motion_gate.close()
+    if session.cache_scope is not None:
+        frame_cache.drop(session.cache_scope)
+
+exercise_sessions = SessionStore(max_sessions=SESSION_MAX, idle_ttl_s=SESSION_IDLE_TTL_S, on_remove=release_session)
+
+# Métriques Prometheus exposées sur /metrics
+metrics_registry = Registry()
+stage_histogram = metrics_registry.histogram(
+    "ball_api_stage_duration_seconds",
+    "Durée des étapes de traitement d'une frame (parse, read, decode, inference, postprocess, serialize)",
+    ["stage"]
+)
+queue_wait_histogram = metrics_registry.histogram(
+    "ball_api_queue_wait_seconds", "Attente des frames avant inférence (fenêtre de batching, file du pool)", ["queue"]
+)
+model_run_histogram = metrics_registry.histogram(
+    "ball_api_model_run_seconds", "Durée d'un job d'inférence dans un worker"
+)
+batch_size_histogram = metrics_registry.histogram(
+    "ball_api_batch_size", "Nombre de frames par appel au modèle", ["scheduler"], buckets=COUNT_BUCKETS
+)
+detections_histogram = metrics_registry.histogram(
+    "ball_api_detections_per_frame", "Nombre de détections du modèle par frame", buckets=COUNT_BUCKETS
+)
+
+# Temps par étape (lecture, décodage, inférence, post-traitement)
+stage_timings = StageTimings(histogram=stage_histogram)
+
+# Compteurs de l'inférence ROI (frames recadrées, frames entières, replis)
+roi_stats = {"roi_frames": 0, "full_frames": 0, "fallbacks": 0}
+# Décisions des portes de mouvement, toutes sessions confondues
+motion_stats = {decision: 0 for decision in DECISIONS}
+
+# Compteurs du traitement des vidéos
+video_stats = {"running": 0, "jobs": 0, "failed": 0, "frames": 0, "saturated_retries": 0}
+
+# Compteurs des sessions WebSocket
+ws_stats = {"active_sessions": 0, "frames_received": 0, "frames_processed": 0, "frames_dropped": 0}
+
+def batch_observer(scheduler: str) -> Callable[[int, List[float]], None]:
+    """Taille de chaque batch lancé et attente de ses frames dans la fenêtre de batching"""
+    def observe(size: int, waits: List[float]):
+        batch_size_histogram.observe(size, scheduler)
+        for wait in waits:
+            queue_wait_histogram.observe(wait, "batch")
+    return observe
+
+def observe_inference_job(wait_s: float, run_s: float):
+    """Attente dans la file du pool d'inférence et durée du job"""
+    queue_wait_histogram.observe(wait_s, "pool")
+    model_run_histogram.observe(run_s)
+
+def startup_metrics() -> dict:
+    phases = {("export",): startup_timings.get("export_ms"), ("total",): startup_timings.get("total_ms")}
+    for phase, value in startup_timings.get("preload", {}).items():
+        phases[(f"preload_{phase[:-3]}",)] = value
+    return {phase: value / 1000 for phase, value in phases.items() if value is not None}
+
+def worker_startup_metrics() -> dict:
+    return {
+        (report["worker"], phase[:-3]): report[phase] / 1000
+        for report in startup_timings.get("workers", [])
+        for phase in ("imports_ms", "weights_ms", "warmup_ms")
+        if phase in report
+    }
+
+metrics_registry.gauge("ball_api_ready", "1 quand le modèle est chargé et chauffé", function=lambda: readiness["ready"])
+metrics_registry.gauge(
+    "ball_api_startup_seconds", "Durées de démarrage (export, préchargement, total)", ["phase"],
+    function=startup_metrics
+)
+metrics_registry.gauge(
+    "ball_api_worker_startup_seconds", "Durées de démarrage par worker (imports, poids, chauffe)",
+    ["worker", "phase"], function=worker_startup_metrics
+)
+metrics_registry.gauge(
+    "ball_api_inference_in_flight", "Jobs d'inférence en cours ou en attente d'un worker",
+    function=lambda: inference_pool.in_flight if inference_pool is not None else None
+)
+metrics_registry.gauge(
+    "ball_api_inference_queued", "Jobs d'inférence en attente d'un worker",
+    function=lambda: inference_pool.queued if inference_pool is not None else None
+)
+metrics_registry.counter(
+    "ball_api_inference_rejected_total", "Jobs refusés car le pool d'inférence était saturé",
+    function=lambda: inference_pool.rejected if inference_pool is not None else None
+)
+metrics_registry.gauge(
+    "ball_api_batch_pending", "Frames en attente du prochain batch", ["scheduler"],
+    function=lambda: {
+        (name,): scheduler.pending
+        for name, scheduler in (("full", batch_scheduler), ("roi", roi_scheduler))
+        if scheduler is not None
+    }
+)
+metrics_registry.gauge(
+    "ball_api_sessions_active", "Sessions d'exercice actives", function=lambda: len(exercise_sessions)
+)
+metrics_registry.gauge(
+    "ball_api_websocket_sessions_active", "Sessions WebSocket ouvertes",
+    function=lambda: ws_stats["active_sessions"]
+)
+
+metrics_registry.counter(
+    "ball_api_frame_cache_hits_total", "Frames servies par le cache des frames presque identiques",
+    function=lambda: frame_cache.hits
+)
+metrics_registry.counter(
+    "ball_api_frame_cache_misses_total", "Frames cherchées sans succès dans le cache",
+    function=lambda: frame_cache.misses
+)
+metrics_registry.counter(
+    "ball_api_frame_cache_saved_seconds_total", "Temps d'inférence évité par le cache",
+    function=lambda: frame_cache.saved_ms / 1000
+)
+
+metrics_registry.counter(
+    "ball_api_motion_gate_decisions_total", "Décisions de la porte de mouvement des sessions", ["decision"],
+    function=lambda: {(decision,): count for decision, count in motion_stats.items()}
+)
+
+metrics_registry.gauge(
+    "ball_api_model_info", "Version du modèle actif (valeur 1)", ["version"],
+    function=lambda: {(active_model["version"],): 1} if active_model["version"] is not None else {}
+)
+
+http_requests = metrics_registry.counter(
+    "ball_api_http_requests_total", "Requêtes HTTP par route et statut", ["path", "status"]
+)
+
+app.add_middleware(
+    MetricsMiddleware,
+    routes=app.routes,
+    requests=http_requests,
+    durations=metrics_registry.histogram(
+        "ball_api_http_request_duration_seconds", "Durée des requêtes HTTP par route", ["path"]
+    ),
+    in_flight=metrics_registry.gauge("ball_api_http_requests_in_flight", "Requêtes HTTP en cours"),
+    stages=stage_histogram
+)
+
+class ModelVersionMiddleware:
+    """Middleware ASGI: version du modèle actif dans l'en-tête X-Model-Version de chaque réponse"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and active_model["version"] is not None:
+                MutableHeaders(scope=message).append("X-Model-Version", active_model["version"])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
-# Modèle YOLO chargé au démarrage
-model = None
+app.add_middleware(ModelVersionMiddleware)
 
 class BoundingBox(BaseModel):
     x1: float
@@ -26,24 +335,209 @@ class BoundingBox(BaseModel):
 class DetectionRequest(BaseModel):
     target_bbox: BoundingBox
 
+class DetectedBall(BaseModel):
+    bbox: BoundingBox
+    confidence: float
+    class_id: int
+    intersection_percentage: float = 0.0
+    reaches_target: bool = False
+
 class DetectionResponse(BaseModel):
+    # Champ model_version: pas de conflit avec l'espace de noms réservé de pydantic
+    model_config = {"protected_namespaces": ()}
+    
     ball_detected: bool
     ball_bbox: BoundingBox = None
     intersection_percentage: float = 0.0
     reaches_target: bool = False
+    balls: List[DetectedBall] = []
+    model_version: Optional[str] = None
 
-@app.on_event("startup")
-async def startup_event():
-    """Charger le modèle YOLO au démarrage de l'API"""
-    global model
+class BatchDetectionResponse(BaseModel):
+    results: List[DetectionResponse]
+
+class SessionCreateRequest(BaseModel):
+    duration_s: float = DEFAULT_DURATION_S
+    targets: Optional[List[BoundingBox]] = None
+    roi: Optional[bool] = None
+    cache: Optional[bool] = None
+    motion_gate: Optional[bool] = None
+
+class SessionState(BaseModel):
+    session_id: str
+    exercise: str
+    current_target: BoundingBox
+    target_side: str
+    touches: int
+    score: int
+    elapsed_s: float
+    remaining_s: float
+    started: bool
+    finished: bool
+
+class SessionFrameResponse(BaseModel):
+    model_config = {"protected_namespaces": ()}
+    
+    ball_detected: bool
+    ball_bbox: BoundingBox = None
+    confidence: Optional[float] = None
+    events: List[dict] = []
+    state: SessionState
+    model_version: Optional[str] = None
+
+class ModelSwapRequest(BaseModel):
+    weights_path: str
+    version: Optional[str] = None
+    min_agreement: Optional[float] = None
+    skip_check: bool = False
+
+def init_inference_worker(backend_name: str, model_path: str, imgsz: int, cache_dir: Optional[str],
+                          warmup_runs: int, warmup_shape: Tuple[int, int], warmup_batch: int):
+    """Charger et chauffer le modèle YOLO dans un worker du pool d'inférence"""
     try:
-        # Charger le modèle entraîné
-        model = YOLO("./models/best.pt")
-        logger.info("Modèle YOLO chargé avec succès")
+        if _preloaded_backend is not None:
+            # Modèle hérité du processus principal (fork), pages partagées
+            backend = _preloaded_backend
+            timings = {"imports_ms": 0.0, "weights_ms": 0.0, "preloaded": True}
+        else:
+            # Charger le modèle entraîné (une instance par worker)
+            backend = create_backend(backend_name, model_path, imgsz=imgsz, cache_dir=cache_dir)
+            timings = backend.load()
+        timings["warmup_ms"] = round(backend.warmup(warmup_runs, warmup_shape, warmup_batch), 1)
+        _worker_state.backend = backend
+        _worker_state.startup = {
+            "worker": f"{os.getpid()}/{threading.current_thread().name}",
+            **timings
+        }
+        logger.info(f"Modèle YOLO chargé avec succès (worker {threading.current_thread().name}): {timings}")
     except Exception as e:
         logger.error(f"Erreur lors du chargement du modèle: {e}")
         raise
 
+def preload_model(model_path: str):
+    """
+    Mode shm: charger le modèle dans le processus principal avant de créer les workers
+    
+    Les workers, créés par fork, héritent des modules et des poids déjà
+    chargés au lieu d'en garder chacun une copie.
+    """
+    global _preloaded_backend
+    backend = create_backend(INFERENCE_BACKEND, model_path, imgsz=MODEL_INPUT_SIZE, cache_dir=MODEL_CACHE_DIR)
+    _preload_timings.update(backend.load())
+    _preloaded_backend = backend
+
+def create_inference_pool(model_path: str):
+    """Pool d'inférence dont les workers chargent et chauffent le modèle `model_path`"""
+    pool = create_pool(
+        mode=INFERENCE_POOL_MODE,
+        workers=INFERENCE_WORKERS,
+        max_queue=INFERENCE_MAX_QUEUE,
+        initializer=init_inference_worker,
+        initargs=(INFERENCE_BACKEND, model_path, MODEL_INPUT_SIZE, MODEL_CACHE_DIR,
+                  WARMUP_RUNS, WARMUP_FRAME_SHAPE, BATCH_MAX_SIZE)
+    )
+    pool.observer = observe_inference_job
+    return pool
+
+def gate_summary(manifest: Optional[dict]) -> Optional[dict]:
+    """Résumé du contrôle de précision d'une variante quantifiée (manifeste de quantization.py)"""
+    if manifest is None:
+        return None
+    summary = {key: manifest[key] for key in ("variant", "created_at", "holdout_images", "accuracy", "thresholds")}
+    summary["latency_gain"] = manifest["performance"]["latency_gain"]
+    summary["memory_saved_mb"] = manifest["performance"]["memory_saved_mb"]
+    logger.info(f"Variante {summary['variant']} validée le {summary['created_at']}: "
+                f"gain x{summary['latency_gain']}, accord cible {summary['accuracy']['hit_agreement']:.2%}")
+    return summary
+
+def worker_startup_report() -> dict:
+    """Durées de démarrage mesurées dans un worker (imports, poids, chauffe)"""
+    return _worker_state.startup
+
+async def load_model():
+    """
+    Séquence de démarrage: export, chargement et chauffe du modèle dans les workers
+    
+    Tourne en tâche de fond: `/health` répond pendant le chargement et
+    `/ready` ne passe au vert qu'une fois la chauffe terminée.
+    """
+    global inference_pool, batch_scheduler, roi_scheduler, model_gate
+    start_time = time.perf_counter()
+    try:
+        # Exporter le modèle une seule fois (mis en cache) avant de démarrer les workers
+        backend = create_backend(INFERENCE_BACKEND, MODEL_PATH, imgsz=MODEL_INPUT_SIZE, cache_dir=MODEL_CACHE_DIR)
+        await asyncio.to_thread(backend.prepare)
+        startup_timings["export_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        model_gate = gate_summary(backend.manifest)
+        version = MODEL_VERSION or f"{backend.weights_path.stem}-{await asyncio.to_thread(backend.weights_digest)}"
+        
+        if INFERENCE_POOL_MODE == "shm":
+            await asyncio.to_thread(preload_model, MODEL_PATH)
+            startup_timings["preload"] = dict(_preload_timings)
+        
+        pool = create_inference_pool(MODEL_PATH)
+        inference_pool = pool
+        # Démarre les workers: chargement et chauffe du modèle avant la première requête
+        reports = await pool.prime(worker_startup_report)
+        # En mode process, un même worker peut répondre à plusieurs appels
+        startup_timings["workers"] = list({report["worker"]: report for report in reports}.values())
+        active_model.update(version=version, loaded_at=time.time())
+        
+        scheduler = BatchScheduler(
+            run_batch=run_detection_batch,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_WINDOW_MS,
+            observer=batch_observer("full")
+        )
+        await scheduler.start()
+        batch_scheduler = scheduler
+        
+        # Batches séparés pour les recadrages (taille d'entrée réduite)
+        scheduler = BatchScheduler(
+            run_batch=run_roi_batch,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_WINDOW_MS,
+            observer=batch_observer("roi")
+        )
+        await scheduler.start()
+        roi_scheduler = scheduler
+        
+        startup_timings["total_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        readiness["ready"] = True
+        logger.info(f"API prête en {startup_timings['total_ms']:.0f}ms")
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.error(f"Erreur lors du chargement du modèle: {e}")
+
+@app.on_event("startup")
+async def startup_event():
+    """Lancer le chargement du modèle YOLO en tâche de fond"""
+    global model_loading_task, detection_logs
+    if DETECTION_LOG_DIR is not None:
+        detection_logs = DetectionLogWriter(DETECTION_LOG_DIR, flush_interval=DETECTION_LOG_FLUSH_S)
+        detection_logs.start()
+    model_loading_task = asyncio.create_task(load_model())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Arrêter proprement le scheduler de batching et le pool d'inférence"""
+    if model_loading_task is not None and not model_loading_task.done():
+        model_loading_task.cancel()
+    if model_swap_task is not None and not model_swap_task.done():
+        model_swap_task.cancel()
+    if batch_scheduler is not None:
+        await batch_scheduler.stop()
+    if roi_scheduler is not None:
+        await roi_scheduler.stop()
+    if inference_pool is not None:
+        inference_pool.shutdown()
+    if detection_logs is not None:
+        await asyncio.to_thread(detection_logs.stop)
+
+def bbox_to_box(bbox: BoundingBox) -> Tuple[float, float, float, float]:
+    """Convertir une BoundingBox en tuple (x1, y1, x2, y2)"""
+    return bbox.x1, bbox.y1, bbox.x2, bbox.y2
+
 def calculate_intersection_percentage(bbox1: BoundingBox, bbox2: BoundingBox) -> float:
     """
     Calcule le pourcentage d'intersection entre deux bounding boxes
@@ -53,132 +547,1236 @@ def calculate_intersection_percentage(bbox1: BoundingBox, bbox2: BoundingBox) ->
         bbox2: Deuxième bounding box
         
     Returns:
-        Pourcentage d'intersection (0-100)
+        Pourcentage d'intersection par rapport à l'union (IoU * 100)
     """
-    # Calculer l'intersection
-    x1 = max(bbox1.x1, bbox2.x1)
-    y1 = max(bbox1.y1, bbox2.y1)
-    x2 = min(bbox1.x2, bbox2.x2)
-    y2 = min(bbox1.y2, bbox2.y2)
+    return float(iou_matrix(bbox_to_box(bbox1), bbox_to_box(bbox2))[0, 0] * 100)
+
+def detect_balls(images: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Détecter les ballons dans plusieurs images en un seul appel au modèle
     
-    # Vérifier s'il y a intersection
-    if x2 <= x1 or y2 <= y1:
-        return 0.0
+    Args:
+        images: Liste d'images BGR (tableaux NumPy)
+        
+    Returns:
+        Détections de chaque image, dans l'ordre des images: tableaux (N, 6)
+        x1, y1, x2, y2, confiance, classe (un seul transfert par image)
+    """
+    try:
+        # Prédiction avec YOLO sur tout le batch (backend propre au worker)
+        results = _worker_state.backend.predict(images)
+        return [detections_array(result) for result in results]
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la détection: {e}")
+        return [np.empty((0, 6), dtype=np.float32) for _ in images]
+
+def detect_ball(image: np.ndarray) -> np.ndarray:
+    """
+    Détecter les ballons dans l'image
     
-    # Calculer les aires
-    intersection_area = (x2 - x1) * (y2 - y1)
-    bbox1_area = (bbox1.x2 - bbox1.x1) * (bbox1.y2 - bbox1.y1)
-    bbox2_area = (bbox2.x2 - bbox2.x1) * (bbox2.y2 - bbox2.y1)
+    Args:
+        image: Image BGR (tableau NumPy)
+        
+    Returns:
+        Tableau (N, 6) des détections
+    """
+    return detect_balls([image])[0]
+
+def top_ball(detections: np.ndarray) -> Tuple[bool, Optional[BoundingBox], float]:
+    """Détection la plus confiante, toutes classes confondues: (ball_detected, ball_bbox, confidence)"""
+    top = select_detections(detections, top_k=1)
+    if len(top) == 0:
+        return False, None, 0.0
+    x1, y1, x2, y2, confidence = top[0, :5].tolist()
+    return True, BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2), confidence
+
+def detect_ball_candidates(images: List[np.ndarray], imgsz: int) -> List[Optional[Tuple[Tuple[float, float, float, float], float]]]:
+    """
+    Détection la plus confiante (bbox, confiance) sur chaque image, à une taille d'entrée donnée
+    
+    Utilisé pour les recadrages de l'inférence ROI: la confiance décide du
+    repli sur la frame entière.
+    """
+    try:
+        results = _worker_state.backend.predict(images, imgsz=imgsz)
+        return [extract_top_detection(result) for result in results]
+    except Exception as e:
+        logger.error(f"Erreur lors de la détection: {e}")
+        return [None] * len(images)
+
+async def run_detection_batch(images: List[np.ndarray]) -> List[np.ndarray]:
+    """Traitement d'un batch de frames collecté par le scheduler, dans le pool d'inférence"""
+    return await inference_pool.run(detect_balls, images)
+
+async def run_roi_batch(images: List[np.ndarray]) -> List[Optional[Tuple[Tuple[float, float, float, float], float]]]:
+    """Traitement d'un batch de recadrages ROI, à la taille d'entrée réduite"""
+    return await inference_pool.run(detect_ball_candidates, images, ROI_INPUT_SIZE)
+
+def parse_frame_shape(frame_shape: Optional[str]) -> Optional[List[int]]:
+    """Lire la forme déclarée d'une frame brute ("480,640" ou "[480, 640, 3]")"""
+    if not frame_shape:
+        return None
+    try:
+        return [int(v) for v in frame_shape.strip("[]() ").split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Format frame_shape invalide: {frame_shape}")
+
+async def decode_frame(data: bytes, frame_format: str = "encoded",
+                       frame_shape: Optional[List[int]] = None, frame_dtype: str = "uint8") -> DecodedFrame:
+    """Décoder une frame hors de la boucle asyncio (400 si la frame est invalide)"""
+    try:
+        return await asyncio.to_thread(frame_decoder.decode, data, frame_format, frame_shape, frame_dtype)
+    except FrameFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def detect_frames(frames: List[DecodedFrame]) -> List[np.ndarray]:
+    """
+    Détecter les ballons sur des frames décodées, via le scheduler de batching
     
-    # Calculer l'union
-    union_area = bbox1_area + bbox2_area - intersection_area
+    Les coordonnées sont ramenées à la résolution de la frame d'origine
+    et les buffers des frames sont rendus au pool.
     
-    # Retourner le pourcentage d'intersection par rapport à l'union (IoU * 100)
-    if union_area == 0:
-        return 0.0
+    Returns:
+        Tableaux (N, 6) des détections, dans l'ordre des frames
+    """
+    if not readiness["ready"]:
+        for frame in frames:
+            frame_decoder.release(frame)
+        raise not_ready_error()
+    # Buffers rendus au pool une fois tous les batches terminés (succès ou erreur)
+    settled = True
+    try:
+        detections = await batch_scheduler.submit_many([frame.image for frame in frames])
+    except asyncio.CancelledError:
+        # Requête abandonnée: un batch déjà lancé peut encore lire les frames, leurs buffers ne sont pas réutilisés
+        settled = False
+        raise
+    finally:
+        if settled:
+            for frame in frames:
+                frame_decoder.release(frame)
     
-    return (intersection_area / union_area) * 100
+    results = []
+    for frame, frame_detections in zip(frames, detections):
+        detections_histogram.observe(len(frame_detections))
+        if len(frame_detections) and (frame.scale_x != 1.0 or frame.scale_y != 1.0):
+            frame_detections = frame_detections.copy()
+            frame_detections[:, [0, 2]] *= frame.scale_x
+            frame_detections[:, [1, 3]] *= frame.scale_y
+        results.append(frame_detections)
+    return results
 
-def detect_ball(image: Image.Image) -> Tuple[bool, BoundingBox]:
+async def detect_frame(frame: DecodedFrame) -> np.ndarray:
+    return (await detect_frames([frame]))[0]
+
+async def detect_frame_cached(frame: DecodedFrame, scope: Optional[str]) -> np.ndarray:
     """
-    Détecter un ballon dans l'image
+    Détecter les ballons sur une frame, en réutilisant le résultat d'une frame
+    presque identique de la même portée (session, caméra)
+    
+    Seule la détection est mise en cache: le recouvrement avec la cible est
+    recalculé par l'appelant, la cible pouvant avoir changé entre-temps. La
+    clé inclut la version du modèle: un résultat de l'ancien modèle, rendu
+    pendant une bascule, n'est jamais resservi après.
     
     Args:
-        image: Image PIL
+        frame: Frame décodée
+        scope: Portée du cache (None: pas de cache)
+    """
+    if scope is None:
+        return await detect_frame(frame)
+    key = frame_cache.key(frame.image, frame.scale_x, frame.scale_y, active_model["version"])
+    detections = frame_cache.get(scope, key)
+    if detections is not None:
+        frame_decoder.release(frame)
+        return detections
+    
+    started_at = time.perf_counter()
+    detections = await detect_frame(frame)
+    frame_cache.put(scope, key, detections, (time.perf_counter() - started_at) * 1000)
+    return detections
+
+async def detect_tracked_frame(frame: DecodedFrame, roi: RoiTracker) -> Tuple[bool, BoundingBox, float]:
+    """
+    Détecter le ballon avec l'inférence ROI d'une session
+    
+    Tant que le ballon est suivi, seul un recadrage autour de la position
+    prédite est analysé (taille d'entrée réduite); la frame entière est
+    analysée si le recadrage ne donne pas de détection assez confiante
+    ou si le suivi est perdu.
+    """
+    if not readiness["ready"]:
+        frame_decoder.release(frame)
+        raise not_ready_error()
+    try:
+        height, width = frame.image.shape[:2]
+        window = roi.window(width, height)
+        box = None
+        if window is not None:
+            roi_stats["roi_frames"] += 1
+            detection = await roi_scheduler.submit(crop_frame(frame.image, window))
+            crop_box, confidence = detection if detection is not None else (None, 0.0)
+            if roi.accept(crop_box, confidence):
+                box = to_frame_coordinates(crop_box, window)
+                roi.observe(box)
+            else:
+                roi_stats["fallbacks"] += 1
+        
+        if box is None:
+            roi_stats["full_frames"] += 1
+            ball_detected, ball_bbox, confidence = top_ball(await batch_scheduler.submit(frame.image))
+            if ball_detected:
+                box = bbox_to_box(ball_bbox)
+            roi.observe(box, full_frame=True)
+    finally:
+        frame_decoder.release(frame)
+    
+    if box is None:
+        return False, None, 0.0
+    # Suivi dans les coordonnées de l'image décodée, réponse dans celles de la frame d'origine
+    return True, BoundingBox(
+        x1=box[0] * frame.scale_x,
+        y1=box[1] * frame.scale_y,
+        x2=box[2] * frame.scale_x,
+        y2=box[3] * frame.scale_y
+    ), confidence
+
+def not_ready_error() -> HTTPException:
+    """Réponse 503 tant que le modèle n'est pas chargé et chauffé"""
+    return HTTPException(
+        status_code=503,
+        detail="Modèle en cours de chargement",
+        headers={"Retry-After": "5"}
+    )
+
+def check_inference_available():
+    """Refuser tout de suite si le modèle n'est pas prêt ou si la file d'inférence est pleine"""
+    if not readiness["ready"]:
+        raise not_ready_error()
+    if inference_pool.is_saturated():
+        raise overloaded_error(PoolSaturatedError(inference_pool.retry_after()))
+
+def overloaded_error(e: PoolSaturatedError) -> HTTPException:
+    """Réponse 503 avec Retry-After quand le pool d'inférence est saturé"""
+    return HTTPException(
+        status_code=503,
+        detail="Serveur d'inférence saturé, réessayer plus tard",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def parse_target_bbox(bbox_data) -> BoundingBox:
+    """
+    Valider une bounding box cible reçue par l'API
+    
+    Args:
+        bbox_data: Dictionnaire ou JSON string de la bounding box
         
     Returns:
-        Tuple (ball_detected, ball_bbox)
-    """
-    try:
-        # Prédiction avec YOLO
-        results = model(image)
-        
-        # Parcourir les résultats
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None and len(boxes) > 0:
-                # Prendre la détection avec la plus haute confiance
-                best_box = boxes[0]  # YOLO trie par confiance
-                
-                # Extraire les coordonnées
-                x1, y1, x2, y2 = best_box.xyxy[0].cpu().numpy()
-                
-                ball_bbox = BoundingBox(
-                    x1=float(x1),
-                    y1=float(y1),
-                    x2=float(x2),
-                    y2=float(y2)
-                )
-                
-                return True, ball_bbox
+        BoundingBox validée
+    """
+    try:
+        if isinstance(bbox_data, str):
+            bbox_data = json.loads(bbox_data)
+        return BoundingBox(**bbox_data)
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Format target_bbox invalide: {str(e)}")
+
+def parse_detection_filter(classes: Optional[str], min_confidence: float,
+                           top_k: int) -> Tuple[Optional[List[int]], float, int]:
+    """Lire les paramètres de sélection des ballons: classes ("0,2" ou "[0, 2]"), confiance, top-k"""
+    class_ids = None
+    if classes:
+        try:
+            class_ids = [int(v) for v in classes.strip("[]() ").split(",") if v.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Format classes invalide: {classes}")
+    if not 0.0 <= min_confidence <= 1.0:
+        raise HTTPException(status_code=400, detail="min_confidence doit être entre 0 et 1")
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k doit être entre 1 et {MAX_TOP_K}")
+    return class_ids, min_confidence, top_k
+
+def build_detection_responses(selections: List[np.ndarray],
+                              targets: List[BoundingBox]) -> List[DetectionResponse]:
+    """
+    Réponses de détection de plusieurs frames à partir des ballons retenus
+    
+    L'IoU de tous les ballons avec la cible de leur frame est calculé en un
+    seul appel. Le ballon le plus confiant renseigne `ball_bbox`; la cible
+    est atteinte dès qu'un des ballons retenus la touche.
+    
+    Args:
+        selections: Ballons retenus par frame, tableaux (K, 6) triés par confiance
+        targets: Cible de chaque frame
+    """
+    counts = [len(selection) for selection in selections]
+    boxes = np.concatenate([selection[:, :4] for selection in selections]) if sum(counts) else np.empty((0, 4))
+    target_boxes = np.repeat(as_boxes([bbox_to_box(target) for target in targets]), counts, axis=0)
+    percentages = (paired_iou(boxes, target_boxes) * 100).tolist()
+    
+    responses = []
+    offset = 0
+    for selection, count in zip(selections, counts):
+        if count == 0:
+            responses.append(DetectionResponse(
+                ball_detected=False, reaches_target=False, model_version=active_model["version"]
+            ))
+            continue
         
-        return False, None
+        balls = []
+        for (x1, y1, x2, y2, confidence, class_id), percentage in zip(
+            selection.tolist(), percentages[offset:offset + count]
+        ):
+            balls.append(DetectedBall(
+                bbox=BoundingBox(x1=x1, y1=y1, x2=x2, y2=y2),
+                confidence=confidence,
+                class_id=int(class_id),
+                intersection_percentage=percentage,
+                # Le ballon atteint la cible dès qu'il la touche à peine
+                reaches_target=percentage > 0.0
+            ))
+        offset += count
         
-    except Exception as e:
-        logger.error(f"Erreur lors de la détection: {e}")
-        return False, None
+        responses.append(DetectionResponse(
+            ball_detected=True,
+            ball_bbox=balls[0].bbox,
+            intersection_percentage=balls[0].intersection_percentage,
+            reaches_target=any(ball.reaches_target for ball in balls),
+            balls=balls,
+            model_version=active_model["version"]
+        ))
+    return responses
+
+def build_detection_response(selection: np.ndarray, target_bbox: BoundingBox) -> DetectionResponse:
+    """Construire la réponse de détection à partir des ballons retenus pour une frame"""
+    return build_detection_responses([selection], [target_bbox])[0]
 
 @app.post("/detect_ball", response_model=DetectionResponse)
 async def detect_ball_endpoint(
+    response: Response,
     file: UploadFile = File(...),
-    target_bbox: str = Form(...)
+    target_bbox: str = Form(...),
+    frame_format: str = Form("encoded"),
+    frame_shape: Optional[str] = Form(None),
+    frame_dtype: str = Form("uint8"),
+    classes: Optional[str] = Form(None),
+    min_confidence: float = Form(0.0),
+    top_k: int = Form(1),
+    camera_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None)
 ):
     """
     Endpoint pour détecter un ballon et vérifier s'il atteint la bounding box cible
     
     Args:
-        file: Image uploadée
+        file: Image uploadée (JPEG, PNG...) ou frame brute
         target_bbox: Bounding box cible à vérifier
+        frame_format: "encoded" (défaut), ou frame brute "bgr", "i420", "nv12"
+        frame_shape: Forme d'une frame brute, "hauteur,largeur"
+        frame_dtype: Type d'une frame brute ("uint8")
+        classes: Classes retenues, "0" ou "0,2" (toutes par défaut)
+        min_confidence: Confiance minimale des ballons retenus
+        top_k: Nombre maximal de ballons renvoyés (`balls`)
+        camera_id: Identifiant de la caméra, portée du cache des frames
+            presque identiques (FRAME_CACHE; pas de cache sans identifiant)
+        session_id: Identifiant de la session du client: le résultat est ajouté
+            à son journal de détections (DETECTION_LOG_DIR)
         
     Returns:
         Résultat de la détection et de la vérification
     """
-    if not file.content_type.startswith("image/"):
+    if frame_format == "encoded" and not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Le fichier doit être une image")
     
     # Parser le JSON string en BoundingBox
-    try:
-        import json
-        bbox_data = json.loads(target_bbox)
-        target_bbox_obj = BoundingBox(**bbox_data)
-    except (json.JSONDecodeError, TypeError, ValueError) as e:
-        raise HTTPException(status_code=400, detail=f"Format target_bbox invalide: {str(e)}")
+    target_bbox_obj = parse_target_bbox(target_bbox)
+    shape = parse_frame_shape(frame_shape)
+    class_ids, min_confidence, top_k = parse_detection_filter(classes, min_confidence, top_k)
+    
+    # Refuser tout de suite si le modèle n'est pas prêt ou si la file d'inférence est pleine
+    check_inference_available()
     
+    timer = FrameTimer()
     try:
-        # Lire l'image
-        image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
+        # Lire et décoder l'image
+        with timer.stage("read"):
+            image_data = await file.read()
+        with timer.stage("decode"):
+            frame = await decode_frame(image_data, frame_format, shape, frame_dtype)
         
-        # Détecter le ballon
-        ball_detected, ball_bbox = detect_ball(image)
+        # Détecter le ballon (regroupé avec les frames des autres requêtes)
+        with timer.stage("inference"):
+            cache_scope = f"camera:{camera_id}" if FRAME_CACHE and camera_id else None
+            detections = await detect_frame_cached(frame, cache_scope)
         
-        if not ball_detected:
-            return DetectionResponse(
-                ball_detected=False,
-                reaches_target=False
-            )
+        with timer.stage("postprocess"):
+            selection = select_detections(detections, class_ids, min_confidence, top_k)
+            result = build_detection_response(selection, target_bbox_obj)
         
-        # Calculer l'intersection
-        intersection_percentage = calculate_intersection_percentage(ball_bbox, target_bbox_obj)
+        if detection_logs is not None and session_id:
+            top = result.balls[0] if result.balls else None
+            detection_logs.append(
+                f"detect-{session_id}", time.time(),
+                bbox_to_box(top.bbox) if top else None, top.confidence if top else math.nan,
+                bbox_to_box(target_bbox_obj), top.reaches_target if top else False
+            )
+        timer.report_to(stage_timings)
+        response.headers["Server-Timing"] = timer.server_timing()
+        mark("handler_end")
+        return result
         
-        # Vérifier si le ballon atteint la cible (dès qu'il touche à peine)
-        reaches_target = intersection_percentage > 0.0
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
+
+@app.post("/detect_ball/batch", response_model=BatchDetectionResponse)
+async def detect_ball_batch_endpoint(
+    response: Response,
+    files: List[UploadFile] = File(...),
+    target_bboxes: str = Form(...),
+    frame_format: str = Form("encoded"),
+    frame_shape: Optional[str] = Form(None),
+    frame_dtype: str = Form("uint8"),
+    classes: Optional[str] = Form(None),
+    min_confidence: float = Form(0.0),
+    top_k: int = Form(1)
+):
+    """
+    Endpoint pour détecter un ballon sur plusieurs frames en un seul appel
+    
+    Args:
+        files: Images uploadées
+        target_bboxes: Liste JSON de bounding boxes cibles (une par image),
+            ou une seule bounding box appliquée à toutes les images
+        frame_format, frame_shape, frame_dtype: Format des frames, comme pour /detect_ball
+        classes, min_confidence, top_k: Sélection des ballons, comme pour /detect_ball
         
-        return DetectionResponse(
-            ball_detected=True,
-            ball_bbox=ball_bbox,
-            intersection_percentage=intersection_percentage,
-            reaches_target=reaches_target
+    Returns:
+        Résultats de détection, dans l'ordre des images
+    """
+    for file in files:
+        if frame_format == "encoded" and not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="Tous les fichiers doivent être des images")
+    shape = parse_frame_shape(frame_shape)
+    class_ids, min_confidence, top_k = parse_detection_filter(classes, min_confidence, top_k)
+    
+    try:
+        bbox_data = json.loads(target_bboxes)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Format target_bboxes invalide: {str(e)}")
+    
+    if isinstance(bbox_data, dict):
+        bbox_data = [bbox_data] * len(files)
+    if not isinstance(bbox_data, list) or len(bbox_data) != len(files):
+        raise HTTPException(
+            status_code=400,
+            detail="target_bboxes doit contenir une bounding box par image"
         )
+    targets = [parse_target_bbox(data) for data in bbox_data]
+    
+    check_inference_available()
+    
+    timer = FrameTimer()
+    try:
+        with timer.stage("read"):
+            contents = [await file.read() for file in files]
+        with timer.stage("decode"):
+            frames = list(await asyncio.gather(*(
+                decode_frame(data, frame_format, shape, frame_dtype) for data in contents
+            )))
+        
+        # Les frames rejoignent le même scheduler que /detect_ball
+        with timer.stage("inference"):
+            detections = await detect_frames(frames)
+        
+        with timer.stage("postprocess"):
+            selections = [
+                select_detections(frame_detections, class_ids, min_confidence, top_k)
+                for frame_detections in detections
+            ]
+            result = BatchDetectionResponse(results=build_detection_responses(selections, targets))
         
+        timer.report_to(stage_timings)
+        response.headers["Server-Timing"] = timer.server_timing()
+        mark("handler_end")
+        return result
+        
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement du batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
+
+async def receive_stream_messages(
+    websocket: WebSocket,
+    slot: LatestFrameSlot,
+    send_lock: asyncio.Lock,
+    handle_text: Callable[[dict], Any]
+):
+    """
+    Lire les messages d'une session WebSocket
+    
+    Les messages binaires sont des frames déposées dans l'emplacement de la
+    session avec leur numéro de séquence et leur heure de réception. Les
+    messages texte (JSON) sont passés à `handle_text`, dont le résultat est
+    associé aux frames suivantes (par exemple la cible courante).
+    """
+    context = None
+    seq = 0
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            if message.get("bytes") is not None:
+                slot.put((seq, message["bytes"], context, time.time()))
+                ws_stats["frames_received"] += 1
+                seq += 1
+                continue
+            
+            try:
+                data = json.loads(message.get("text") or "")
+                if not isinstance(data, dict):
+                    raise ValueError("objet JSON attendu")
+                context = handle_text(data)
+            except HTTPException as e:
+                async with send_lock:
+                    await websocket.send_json({"type": "error", "detail": e.detail})
+            except (json.JSONDecodeError, ValueError) as e:
+                async with send_lock:
+                    await websocket.send_json({"type": "error", "detail": f"Message invalide: {str(e)}"})
+    finally:
+        slot.close()
+
+async def serve_frame_stream(
+    websocket: WebSocket,
+    handle_text: Callable[[dict], Any],
+    process_frame: Callable[..., Awaitable[dict]]
+):
+    """
+    Boucle commune des sessions WebSocket de streaming
+    
+    Si le client envoie plus vite que l'inférence, seule la frame la plus
+    récente est traitée; le nombre de frames abandonnées est renvoyé.
+    
+    Args:
+        websocket: Connexion acceptée
+        handle_text: Traitement des messages texte
+        process_frame: Coroutine (seq, image_data, context, received_at) -> message à renvoyer
+    """
+    slot = LatestFrameSlot()
+    send_lock = asyncio.Lock()
+    receiver = asyncio.create_task(receive_stream_messages(websocket, slot, send_lock, handle_text))
+    ws_stats["active_sessions"] += 1
+    
+    try:
+        while True:
+            frame = await slot.get()
+            if frame is None:
+                break
+            seq = frame[0]
+            
+            try:
+                message = await process_frame(*frame)
+                message.setdefault("seq", seq)
+                message["dropped"] = slot.dropped
+                ws_stats["frames_processed"] += 1
+            except HTTPException as e:
+                message = {"type": "error", "seq": seq, "detail": e.detail}
+            except PoolSaturatedError as e:
+                message = {"type": "overloaded", "seq": seq, "retry_after": e.retry_after}
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement de la frame {seq}: {e}")
+                message = {"type": "error", "seq": seq, "detail": f"Erreur interne: {str(e)}"}
+            
+            async with send_lock:
+                await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        ws_stats["active_sessions"] -= 1
+        ws_stats["frames_dropped"] += slot.dropped
+
+def handle_target_message(data: dict) -> BoundingBox:
+    """Message texte de /ws/detect: définition ou changement de cible"""
+    if data.get("type") != "target":
+        raise ValueError(f"Type de message inconnu: {data.get('type')}")
+    return parse_target_bbox(data.get("target_bbox"))
+
+@app.websocket("/ws/detect")
+async def detect_ball_ws(websocket: WebSocket):
+    """
+    Session de streaming pour la détection continue
+    
+    Protocole:
+        - message texte `{"type": "target", "target_bbox": {...}}` pour définir
+          ou changer la cible (uniquement quand elle change)
+        - message binaire: une frame encodée (JPEG/PNG)
+        - le serveur renvoie `{"type": "detection", "seq": n, ...}` pour chaque
+          frame traitée, `seq` étant le numéro de la frame dans la session
+    
+    Avec FRAME_CACHE, les frames presque identiques de la connexion
+    réutilisent le dernier résultat de détection.
+    """
+    cache_scope = f"ws:{id(websocket)}" if FRAME_CACHE else None
+    
+    async def process_frame(seq, image_data, target_bbox, received_at):
+        if target_bbox is None:
+            raise HTTPException(status_code=400, detail="target_bbox non défini")
+        timer = FrameTimer()
+        with timer.stage("decode"):
+            frame = await decode_frame(image_data)
+        with timer.stage("inference"):
+            detections = await detect_frame_cached(frame, cache_scope)
+        with timer.stage("postprocess"):
+            response = build_detection_response(select_detections(detections, top_k=1), target_bbox)
+        timer.report_to(stage_timings)
+        return {"type": "detection", "seq": seq, **response.model_dump()}
+    
+    await websocket.accept()
+    try:
+        await serve_frame_stream(websocket, handle_target_message, process_frame)
+    finally:
+        if cache_scope is not None:
+            frame_cache.drop(cache_scope)
+
+def session_log_key(session_id: str) -> str:
+    """Clé du journal de détections d'une session d'exercice"""
+    return f"session-{session_id}"
+
+def get_exercise_session(session_id: str) -> TouchAndDashSession:
+    """Récupérer une session d'exercice ou lever une 404"""
+    session = exercise_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée")
+    return session
+
+async def process_session_frame(session: TouchAndDashSession, image_data: bytes, received_at: float,
+                                scale: float = 1.0) -> SessionFrameResponse:
+    """
+    Détecter le ballon sur une frame et faire avancer la session d'exercice
+    
+    Args:
+        session: Session d'exercice
+        image_data: Frame encodée
+        received_at: Heure de réception de la frame (chronomètre de la session)
+        scale: Réduction de la frame par le client (frame envoyée / repère des cibles)
+        
+    Returns:
+        Détection, événements produits et état de la session
+    """
+    timer = FrameTimer()
+    with timer.stage("decode"):
+        frame = await decode_frame(image_data)
+        # Tout le suivi (porte, ROI, touches) se fait dans le repère des cibles
+        frame.scale_x /= scale
+        frame.scale_y /= scale
+    
+    gate = session.motion_gate
+    # Détection vue par le modèle sur cette frame (et non reprise par la porte de mouvement)
+    observed = True
+    if gate is not None:
+        with timer.stage("gate"):
+            infer = gate.should_infer(frame.image, session.targets, received_at, (frame.scale_x, frame.scale_y))
+            motion_stats[gate.decision] += 1
+        if not infer:
+            frame_decoder.release(frame)
+            observed = False
+            box = gate.bridge()
+            ball_detected = box is not None
+            ball_bbox = BoundingBox(x1=box[0], y1=box[1], x2=box[2], y2=box[3]) if ball_detected else None
+    
+    if gate is None or infer:
+        with timer.stage("inference"):
+            if session.tracker is not None:
+                ball_detected, ball_bbox, confidence = await detect_tracked_frame(frame, session.tracker)
+            else:
+                ball_detected, ball_bbox, confidence = top_ball(
+                    await detect_frame_cached(frame, session.cache_scope)
+                )
+        if gate is not None:
+            gate.observe(bbox_to_box(ball_bbox) if ball_detected else None)
+    
+    with timer.stage("postprocess"):
+        ball_box = bbox_to_box(ball_bbox) if ball_detected and observed else None
+        target = session.current_target
+        # Une bbox reprise (frame sautée) est renvoyée au client mais ne compte pas de touche
+        events = session.process_detection(ball_box, now=received_at)
+        if detection_logs is not None and observed:
+            detection_logs.append(
+                session_log_key(session.session_id), received_at, ball_box, confidence, target,
+                any(event["type"] == "touch" for event in events)
+            )
+    timer.report_to(stage_timings)
+    
+    return SessionFrameResponse(
+        ball_detected=ball_detected,
+        ball_bbox=ball_bbox,
+        confidence=confidence if ball_detected and observed else None,
+        events=events,
+        state=SessionState(**session.snapshot()),
+        model_version=active_model["version"]
+    )
+
+@app.post("/sessions", response_model=SessionState)
+async def create_session(request: SessionCreateRequest = None):
+    """
+    Créer une session Touch & Dash gérée par le serveur
+    
+    Le serveur garde la cible courante, détecte les touches, alterne les côtés
+    et calcule le score: le client n'a plus qu'à envoyer les frames.
+    """
+    request = request or SessionCreateRequest()
+    targets = DEFAULT_TARGETS
+    if request.targets is not None:
+        if len(request.targets) != 2:
+            raise HTTPException(status_code=400, detail="Le Touch & Dash nécessite exactement deux cibles")
+        targets = [(t.x1, t.y1, t.x2, t.y2) for t in request.targets]
+    
+    try:
+        session = exercise_sessions.create(targets=targets, duration=request.duration_s)
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if request.roi if request.roi is not None else ROI_INFERENCE:
+        session.tracker = RoiTracker(
+            input_size=ROI_INPUT_SIZE,
+            min_confidence=ROI_MIN_CONFIDENCE,
+            max_misses=ROI_MAX_MISSES,
+            tracker=SharedTrack(session_tracks)
+        )
+    elif request.cache if request.cache is not None else FRAME_CACHE:
+        # Le suivi ROI a besoin de chaque frame: le cache ne sert qu'aux sessions sans ROI
+        session.cache_scope = f"session:{session.session_id}"
+    if request.motion_gate if request.motion_gate is not None else MOTION_GATE:
+        session.motion_gate = MotionGate(
+            min_changed=MOTION_GATE_MIN_CHANGED,
+            max_skip_s=MOTION_GATE_MAX_SKIP_S,
+            tracker=SharedTrack(session_tracks)
+        )
+    if detection_logs is not None:
+        detection_logs.open(session_log_key(session.session_id), KIND_SESSION, session.targets, session.duration)
+    return SessionState(**session.snapshot())
+
+@app.get("/sessions/{session_id}", response_model=SessionState)
+async def get_session(session_id: str):
+    """État courant d'une session d'exercice"""
+    return SessionState(**get_exercise_session(session_id).snapshot())
+
+@app.post("/sessions/{session_id}/frame", response_model=SessionFrameResponse)
+async def session_frame_endpoint(session_id: str, file: UploadFile = File(...), scale: float = Form(1.0)):
+    """
+    Envoyer une frame à une session d'exercice
+    
+    Args:
+        scale: Facteur de réduction de la frame envoyée par rapport au repère
+            des cibles (client qui adapte la taille des frames): la détection
+            est ramenée dans le repère des cibles
+    
+    Returns:
+        Détection, événements (touch, target, finished) et état de la session
+    """
+    received_at = time.time()
+    session = get_exercise_session(session_id)
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Le fichier doit être une image")
+    if not 0 < scale <= 1:
+        raise HTTPException(status_code=400, detail="scale doit être entre 0 et 1")
+    
+    check_inference_available()
+    
+    try:
+        return await process_session_frame(session, await file.read(), received_at, scale)
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Erreur lors du traitement: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
+@app.delete("/sessions/{session_id}", response_model=SessionState)
+async def finish_session(session_id: str):
+    """Terminer une session et renvoyer son score final"""
+    session = get_exercise_session(session_id)
+    session.finish()
+    exercise_sessions.remove(session_id)
+    return SessionState(**session.snapshot())
+
+@app.websocket("/ws/sessions/{session_id}")
+async def session_ws(websocket: WebSocket, session_id: str):
+    """
+    Streaming des frames d'une session d'exercice
+    
+    Le client n'envoie que des frames (messages binaires); le serveur renvoie
+    pour chaque frame traitée `{"type": "frame", "seq": n, "events": [...], ...}`.
+    """
+    session = exercise_sessions.get(session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+    
+    def handle_text(data: dict):
+        raise ValueError("Cette session n'accepte que des frames binaires")
+    
+    async def process_frame(seq, image_data, context, received_at):
+        response = await process_session_frame(session, image_data, received_at)
+        return {"type": "frame", "seq": seq, **response.model_dump()}
+    
+    await websocket.accept()
+    await serve_frame_stream(websocket, handle_text, process_frame)
+
+def detect_video_batch(loop: asyncio.AbstractEventLoop, images: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Détection d'un batch de frames vidéo depuis le thread de traitement
+    
+    Le batch passe par le même pool d'inférence que /detect_ball; quand le
+    pool est saturé, le batch est resoumis après une courte attente pour
+    laisser passer les requêtes temps réel.
+    """
+    while True:
+        future = asyncio.run_coroutine_threadsafe(inference_pool.run(detect_balls, images), loop)
+        try:
+            return future.result()
+        except PoolSaturatedError:
+            video_stats["saturated_retries"] += 1
+            time.sleep(VIDEO_RETRY_S)
+
+def remove_files(*paths: str):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+@app.post("/videos/process")
+async def process_video_endpoint(
+    file: UploadFile = File(...),
+    targets: Optional[str] = Form(None),
+    duration_s: float = Form(DEFAULT_DURATION_S),
+    stride: int = Form(1),
+    classes: Optional[str] = Form(None),
+    min_confidence: float = Form(0.0),
+    output: str = Form("summary")
+):
+    """
+    Rejouer une session Touch & Dash enregistrée (vérification avant émission du SBT)
+    
+    La vidéo est copiée sur disque par morceaux puis décodée en flux: la
+    mémoire reste bornée quelle que soit sa durée.
+    
+    Args:
+        file: Vidéo de la session (MP4...)
+        targets: Liste JSON des deux cibles, dans les coordonnées de la vidéo
+        duration_s: Durée de la session (horloge de la vidéo)
+        stride: Analyser une frame sur `stride`
+        classes, min_confidence: Sélection du ballon, comme pour /detect_ball
+        output: "summary" (résumé et événements en JSON), ou journal complet
+            "jsonl" / "parquet" (résumé dans l'en-tête X-Video-Summary)
+    """
+    check_inference_available()
+    if output not in ("summary",) + video_processing.EVENT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format de sortie inconnu: {output}")
+    if stride < 1:
+        raise HTTPException(status_code=400, detail="stride doit être >= 1")
+    class_ids, min_confidence, _ = parse_detection_filter(classes, min_confidence, 1)
+    try:
+        target_boxes = video_processing.parse_targets(targets)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Cibles invalides: {e}")
+    if video_stats["running"] >= VIDEO_MAX_JOBS:
+        raise HTTPException(
+            status_code=503,
+            detail="Traitement vidéo déjà en cours, réessayer plus tard",
+            headers={"Retry-After": "5"}
+        )
+    
+    video_stats["running"] += 1
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    video_fd, video_path = tempfile.mkstemp(suffix=suffix)
+    log_fd, log_path = tempfile.mkstemp(suffix=f".events.{'parquet' if output == 'parquet' else 'jsonl'}")
+    os.close(log_fd)
+    try:
+        with os.fdopen(video_fd, "wb") as video_file:
+            while chunk := await file.read(1 << 20):
+                video_file.write(chunk)
+        
+        loop = asyncio.get_running_loop()
+        summary = await asyncio.to_thread(
+            video_processing.process_video,
+            video_path,
+            lambda images: detect_video_batch(loop, images),
+            video_processing.open_event_log(log_path, None if output == "summary" else output),
+            targets=target_boxes,
+            duration=duration_s,
+            batch_size=VIDEO_BATCH_SIZE,
+            stride=stride,
+            classes=class_ids,
+            min_confidence=min_confidence
+        )
+    except ValueError as e:
+        video_stats["failed"] += 1
+        remove_files(video_path, log_path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        video_stats["failed"] += 1
+        remove_files(video_path, log_path)
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        video_stats["failed"] += 1
+        remove_files(video_path, log_path)
+        logger.error(f"Erreur lors du traitement de la vidéo: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors du traitement: {str(e)}")
+    finally:
+        video_stats["running"] -= 1
+    
+    summary["video"] = file.filename
+    video_stats["jobs"] += 1
+    video_stats["frames"] += summary["frames_processed"]
+    logger.info(
+        f"Vidéo traitée: {summary['frames_processed']} frames, score {summary['score']}, "
+        f"{summary['realtime_factor']}x temps réel"
+    )
+    
+    if output == "summary":
+        remove_files(video_path, log_path)
+        return summary
+    
+    remove_files(video_path)
+    media_type = "application/x-ndjson" if output == "jsonl" else "application/vnd.apache.parquet"
+    header = {key: value for key, value in summary.items() if key != "events"}
+    return FileResponse(
+        log_path,
+        media_type=media_type,
+        filename=f"{os.path.splitext(file.filename or 'session')[0]}.events.{output}",
+        headers={"X-Video-Summary": json.dumps(header)},
+        background=BackgroundTask(remove_files, log_path)
+    )
+
 @app.get("/health")
 async def health_check():
-    """Endpoint de santé pour vérifier que l'API fonctionne"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    """Endpoint de santé (liveness): le processus répond, modèle chargé ou non"""
+    return {
+        "status": "healthy",
+        "model_loaded": readiness["ready"],
+        "backend": INFERENCE_BACKEND,
+        "model_version": active_model["version"]
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Endpoint de disponibilité (readiness): vert uniquement après la chauffe du modèle"""
+    content = {
+        "ready": readiness["ready"],
+        "error": readiness["error"],
+        "startup": startup_timings,
+        "quantization": model_gate
+    }
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=content)
+
+@app.get("/config")
+async def client_config():
+    """
+    Paramètres utiles aux clients pour préparer les frames
+    
+    Une frame plus grande que la taille d'entrée du modèle est réduite par le
+    serveur: l'envoyer coûte de la bande passante et du décodage pour rien.
+    Les clients règlent taille et qualité JPEG pour tenir la latence visée.
+    """
+    return {
+        "model_input_size": MODEL_INPUT_SIZE,
+        "latency_target_ms": LATENCY_TARGET_MS,
+        "jpeg_quality": {"min": JPEG_QUALITY_RANGE[0], "max": JPEG_QUALITY_RANGE[1]},
+        "frame_formats": list(ingest.FRAME_FORMATS),
+        "max_top_k": MAX_TOP_K
+    }
+
+@app.get("/stats")
+async def stats():
+    """Statistiques de fonctionnement (remplissage des batches, file d'inférence)"""
+    return {
+        "batching": batch_scheduler.stats() if batch_scheduler is not None else None,
+        "inference_pool": inference_pool.stats() if inference_pool is not None else None,
+        "websocket": ws_stats,
+        "sessions": exercise_sessions.stats(),
+        "tracking": session_tracks.stats(),
+        "roi": {
+            **roi_stats,
+            "batching": roi_scheduler.stats() if roi_scheduler is not None else None
+        },
+        "ingest": {
+            "jpeg_decoder": "turbojpeg" if ingest.turbojpeg_available() else "opencv",
+            "model_input_size": MODEL_INPUT_SIZE,
+            "buffers": frame_decoder.buffer_pool.stats()
+        },
+        "stages": stage_timings.stats(),
+        "frame_cache": frame_cache.stats(),
+        "motion_gate": motion_stats,
+        "detection_log": detection_logs.stats() if detection_logs is not None else None,
+        "videos": video_stats,
+        "startup": startup_timings,
+        "model": {**active_model, "swap": model_swap["state"]}
+    }
+
+def check_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Authentification des endpoints d'administration (en-tête X-Admin-Token)"""
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Endpoints d'administration désactivés (ADMIN_TOKEN non défini)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Jeton d'administration invalide")
+
+def profiled_requests() -> float:
+    """Nombre de requêtes de détection terminées (tous statuts confondus)"""
+    return sum(count for (path, _), count in http_requests.samples().items() if path in PROFILED_PATHS)
+
+@app.post("/admin/profile", dependencies=[Depends(check_admin_token)])
+async def profile_endpoint(
+    seconds: Optional[float] = None,
+    requests: Optional[int] = None,
+    interval_ms: float = 5.0,
+    include_idle: bool = False,
+    format: str = "collapsed"
+):
+    """
+    Profiler le serveur en cours d'exécution par échantillonnage des piles
+    
+    Le profileur ne tourne que pendant la session: aucun coût le reste du temps.
+    Seul le processus de l'API est échantillonné. En mode `thread`, les piles
+    des workers d'inférence (appel au modèle) sont incluses; en modes
+    `process` et `shm`, les workers sont d'autres processus: l'appel au
+    modèle n'apparaît pas, seule l'attente de son résultat est visible. Le
+    résumé l'indique (`pool_mode`, `model_sampled`).
+    
+    Args:
+        seconds: Durée de la session
+        requests: Ou arrêt après N requêtes de détection (au plus PROFILE_MAX_S)
+        interval_ms: Intervalle d'échantillonnage
+        include_idle: Garder les piles des threads en attente
+        format: "collapsed" (piles pour flamegraph, texte) ou "json"
+        
+    Returns:
+        Piles échantillonnées, résumé dans l'en-tête X-Profile-Summary
+    """
+    global profiler
+    if (seconds is None) == (requests is None):
+        raise HTTPException(status_code=400, detail="Préciser seconds ou requests")
+    if seconds is not None and not 0 < seconds <= PROFILE_MAX_S:
+        raise HTTPException(status_code=400, detail=f"seconds doit être entre 0 et {PROFILE_MAX_S:g}")
+    if requests is not None and requests < 1:
+        raise HTTPException(status_code=400, detail="requests doit être >= 1")
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {format}")
+    if profiler is not None and profiler.running:
+        raise HTTPException(status_code=409, detail="Un profilage est déjà en cours")
+    
+    until = None
+    if requests is not None:
+        target = profiled_requests() + requests
+        until = lambda: profiled_requests() >= target
+    
+    session = SamplingProfiler(interval_ms=interval_ms, include_idle=include_idle)
+    profiler = session
+    logger.info(f"Profilage démarré ({f'{seconds:g}s' if seconds is not None else f'{requests} requêtes'})")
+    session.start(seconds if seconds is not None else PROFILE_MAX_S, until)
+    try:
+        await asyncio.to_thread(session.wait)
+    finally:
+        session.stop()
+    
+    summary = session.summary()
+    summary["pool_mode"] = INFERENCE_POOL_MODE
+    summary["model_sampled"] = INFERENCE_POOL_MODE == "thread"
+    if requests is not None:
+        summary["requests"] = int(profiled_requests() - target + requests)
+    logger.info(f"Profilage terminé: {summary['samples']} relevés en {summary['duration_s']:.1f}s")
+    
+    if format == "json":
+        return {
+            "summary": summary,
+            "top_functions": [{"function": name, "samples": count} for name, count in session.top_functions()],
+            "collapsed": session.collapsed()
+        }
+    return Response(
+        content=session.collapsed(),
+        media_type="text/plain",
+        headers={"X-Profile-Summary": json.dumps(summary)}
+    )
+
+def load_check_frames() -> List[np.ndarray]:
+    """Frames de contrôle d'une bascule de modèle (MODEL_CHECK_DIR), réparties sur le répertoire"""
+    if MODEL_CHECK_DIR is None:
+        return []
+    frames = [cv2.imread(str(path)) for path in list_images(MODEL_CHECK_DIR, MODEL_CHECK_FRAMES)]
+    return [frame for frame in frames if frame is not None]
+
+async def detect_on_pool(pool, images: List[np.ndarray]) -> list:
+    """
+    Détection la plus confiante (bbox, confiance) de chaque frame sur un pool donné
+    
+    Utilisé pour le contrôle d'une bascule: si le pool actif est saturé, les
+    frames attendent (priorité au trafic en direct).
+    """
+    detections = []
+    for start in range(0, len(images), BATCH_MAX_SIZE):
+        batch = images[start:start + BATCH_MAX_SIZE]
+        while True:
+            try:
+                detections.extend(await pool.run(detect_ball_candidates, batch, MODEL_INPUT_SIZE))
+                break
+            except PoolSaturatedError:
+                await asyncio.sleep(VIDEO_RETRY_S)
+    return detections
+
+async def swap_model(model_path: str, version: Optional[str], min_agreement: float, skip_check: bool = False):
+    """
+    Bascule à chaud: nouveau pool chargé, chauffé et contrôlé, puis échangé
+    
+    Le pool actif continue de servir pendant le chargement. L'échange ne
+    remplace que la référence `inference_pool`, dans la boucle asyncio: les
+    batches suivants partent vers le nouveau modèle, les jobs déjà soumis
+    finissent sur l'ancien pool, arrêté une fois vide pour libérer ses poids.
+    
+    Args:
+        model_path: Poids du nouveau modèle
+        version: Version annoncée (nom et empreinte des poids par défaut)
+        min_agreement: Accord minimal avec le modèle actif sur les frames de contrôle
+        skip_check: Basculer sans contrôle (sinon, refus sans frame de contrôle lisible)
+    """
+    global inference_pool, model_gate, _preloaded_backend
+    start_time = time.perf_counter()
+    previous_preloaded = _preloaded_backend
+    pool = None
+    try:
+        # Export (ou vérification du manifeste d'une variante quantifiée)
+        backend = create_backend(INFERENCE_BACKEND, model_path, imgsz=MODEL_INPUT_SIZE, cache_dir=MODEL_CACHE_DIR)
+        await asyncio.to_thread(backend.prepare)
+        version = version or f"{backend.weights_path.stem}-{await asyncio.to_thread(backend.weights_digest)}"
+        model_swap["version"] = version
+        
+        if INFERENCE_POOL_MODE == "shm":
+            # Les workers du nouveau pool sont créés par fork après ce préchargement
+            await asyncio.to_thread(preload_model, model_path)
+        pool = create_inference_pool(model_path)
+        reports = await pool.prime(worker_startup_report)
+        model_swap["workers"] = list({report["worker"]: report for report in reports}.values())
+        model_swap["load_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        
+        model_swap["state"] = "checking"
+        frames = [] if skip_check else await asyncio.to_thread(load_check_frames)
+        if not frames and not skip_check:
+            # Répertoire absent, vide ou mal orthographié: ne pas désactiver le contrôle en silence
+            raise RuntimeError(
+                f"aucune frame de contrôle lisible (MODEL_CHECK_DIR={MODEL_CHECK_DIR}); "
+                f"skip_check pour basculer sans contrôle"
+            )
+        if frames:
+            check = compare_detections(
+                await detect_on_pool(inference_pool, frames), await detect_on_pool(pool, frames), DEFAULT_TARGETS
+            )
+            model_swap["check"] = check
+            if min(check["decision_agreement"], check["hit_agreement"]) < min_agreement:
+                raise RuntimeError(
+                    f"accord avec le modèle actif insuffisant sur {len(frames)} frames de contrôle "
+                    f"(détection {check['decision_agreement']:.2%}, cible {check['hit_agreement']:.2%}, "
+                    f"minimum {min_agreement:.2%})"
+                )
+        else:
+            model_swap["check"] = None
+            logger.warning("Bascule sans contrôle demandée (skip_check): nouveau modèle seulement chauffé")
+    except asyncio.CancelledError:
+        if pool is not None:
+            pool.shutdown(wait=False)
+        raise
+    except Exception as e:
+        model_swap.update(state="failed", error=str(e))
+        logger.error(f"Bascule vers {model_path} refusée: {e}")
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown)
+        _preloaded_backend = previous_preloaded
+        return
+    
+    old_pool = inference_pool
+    inference_pool = pool
+    previous_version = active_model["version"]
+    active_model.update(version=version, path=model_path, loaded_at=time.time())
+    model_gate = gate_summary(backend.manifest)
+    # Les résultats en cache viennent de l'ancien modèle
+    frame_cache.clear()
+    model_swap.update(state="draining", previous_version=previous_version)
+    logger.info(f"Modèle {version} actif (remplace {previous_version})")
+    
+    # Fin des jobs déjà soumis à l'ancien modèle, puis libération de ses poids
+    drain_start = time.perf_counter()
+    while old_pool.in_flight and time.perf_counter() - drain_start < MODEL_SWAP_DRAIN_S:
+        await asyncio.sleep(0.05)
+    if old_pool.in_flight:
+        logger.warning(f"{old_pool.in_flight} job(s) encore en cours sur l'ancien modèle après "
+                       f"{MODEL_SWAP_DRAIN_S:g}s: arrêt du pool")
+    model_swap["drain_ms"] = round((time.perf_counter() - drain_start) * 1000, 1)
+    await asyncio.to_thread(old_pool.shutdown)
+    del old_pool, previous_preloaded
+    gc.collect()
+    model_swap.update(state="done", total_ms=round((time.perf_counter() - start_time) * 1000, 1))
+
+@app.post("/admin/model", status_code=202, dependencies=[Depends(check_admin_token)])
+async def swap_model_endpoint(request: ModelSwapRequest):
+    """
+    Basculer à chaud vers une nouvelle version du modèle, sans redémarrage
+    
+    Le nouveau modèle est chargé, chauffé et contrôlé en tâche de fond
+    pendant que le modèle actif continue de servir: suivre l'avancement
+    avec `GET /admin/model`.
+    
+    Args:
+        request: Chemin des poids sur le serveur, version annoncée (nom et
+            empreinte des poids par défaut), accord minimal avec le modèle
+            actif sur les frames de contrôle (MODEL_SWAP_MIN_AGREEMENT par défaut),
+            `skip_check` pour basculer sans frames de contrôle
+    """
+    global model_swap_task
+    if not readiness["ready"]:
+        raise HTTPException(status_code=503, detail="Modèle initial en cours de chargement")
+    if model_swap_task is not None and not model_swap_task.done():
+        raise HTTPException(status_code=409, detail="Une bascule de modèle est déjà en cours")
+    if not os.path.isfile(request.weights_path):
+        raise HTTPException(status_code=400, detail=f"Poids introuvables: {request.weights_path}")
+    min_agreement = MODEL_SWAP_MIN_AGREEMENT if request.min_agreement is None else request.min_agreement
+    if not 0.0 <= min_agreement <= 1.0:
+        raise HTTPException(status_code=400, detail="min_agreement doit être entre 0 et 1")
+    
+    model_swap.clear()
+    model_swap.update(
+        state="loading",
+        model_path=request.weights_path,
+        version=request.version,
+        min_agreement=min_agreement,
+        skip_check=request.skip_check,
+        requested_at=time.time(),
+        error=None
+    )
+    logger.info(f"Bascule de modèle demandée: {request.weights_path}")
+    model_swap_task = asyncio.create_task(
+        swap_model(request.weights_path, request.version, min_agreement, request.skip_check)
+    )
+    return {"active": active_model, "swap": model_swap}
+
+@app.get("/admin/model", dependencies=[Depends(check_admin_token)])
+async def model_status():
+    """Modèle actif et état de la dernière bascule à chaud"""
+    return {"active": active_model, "swap": model_swap, "quantization": model_gate}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métriques au format Prometheus (étapes, files d'attente, requêtes, démarrage)"""
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
 
 @app.get("/")
 async def root():
@@ -188,7 +1786,18 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/detect_ball": "POST - Détecter un ballon et vérifier l'intersection",
-            "/health": "GET - Vérifier la santé de l'API",
+            "/detect_ball/batch": "POST - Détecter un ballon sur plusieurs frames en un appel",
+            "/ws/detect": "WebSocket - Session de streaming de frames",
+            "/sessions": "POST - Créer une session Touch & Dash gérée par le serveur",
+            "/sessions/{id}/frame": "POST - Envoyer une frame à une session",
+            "/ws/sessions/{id}": "WebSocket - Streaming des frames d'une session",
+            "/videos/process": "POST - Rejouer une session enregistrée (vidéo)",
+            "/admin/model": "POST - Basculer à chaud vers une nouvelle version du modèle (jeton d'administration)",
+            "/config": "GET - Taille d'entrée du modèle et latence visée (réglage des clients)",
+            "/stats": "GET - Statistiques de fonctionnement",
+            "/metrics": "GET - Métriques Prometheus",
+            "/health": "GET - Vérifier la santé de l'API (liveness)",
+            "/ready": "GET - Vérifier que le modèle est chargé et chauffé (readiness)",
             "/docs": "GET - Documentation interactive"
         }
     }
\ No newline at end of file
@@ -0,0 +1,252 @@
+import bisect
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Format d'exposition texte de Prometheus (le charset est ajouté par la réponse)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seuils des histogrammes de durée (secondes)
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Seuils des histogrammes de comptage (détections par frame, frames par batch)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 10, 20, 50)
+
+# Repères de la requête HTTP en cours (début du handler, fin du handler), posés
+# par l'application et lus par le middleware
+_request_marks: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_marks", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """
+    Métrique nommée, avec étiquettes optionnelles
+
+    Avec `function`, la valeur est lue au moment de l'export: un nombre, ou
+    un dict {tuple de valeurs d'étiquettes: nombre}. Utile pour exposer des
+    compteurs déjà tenus ailleurs sans coût sur le chemin des requêtes.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def samples(self) -> Dict[LabelValues, float]:
+        """Valeurs courantes par jeu d'étiquettes"""
+        if self.function is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.function()
+        if value is None:
+            return {}
+        if isinstance(value, dict):
+            return {tuple(str(v) for v in key): float(sample) for key, sample in value.items()}
+        return {(): float(value)}
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """
+    Histogramme cumulatif à seuils fixes
+
+    Une observation coûte une recherche dichotomique et trois incréments
+    sous verrou: assez peu pour rester actif en production.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par jeu d'étiquettes: [compte par seuil (+Inf en dernier), somme, nombre]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exportées par `/metrics`"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                function: Optional[Callable[[], object]] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], object]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Toutes les métriques au format texte de Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+def mark(name: str):
+    """Pose un repère temporel sur la requête HTTP en cours (sans effet hors requête)"""
+    marks = _request_marks.get()
+    if marks is not None:
+        marks[name] = time.perf_counter()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: requêtes en cours, durée et statut par route
+
+    Si l'application pose les repères `handler_start` et `handler_end`
+    (`mark`), le temps avant le handler (lecture et analyse de l'upload) et
+    le temps entre la fin du handler et l'envoi de la réponse (sérialisation)
+    sont enregistrés comme étapes `parse` et `serialize`.
+    """
+
+    def __init__(self, app, routes: Sequence, requests: Counter, durations: Histogram,
+                 in_flight: Gauge, stages: Optional[Histogram] = None):
+        """
+        Args:
+            app: Application ASGI
+            routes: Routes de l'application (étiquette `path` = modèle de la route)
+            requests: Compteur de requêtes, étiquettes (path, status)
+            durations: Histogramme des durées, étiquette (path)
+            in_flight: Jauge des requêtes en cours
+            stages: Histogramme des étapes, étiquette (stage)
+        """
+        self.app = app
+        self.routes = routes
+        self.requests = requests
+        self.durations = durations
+        self.in_flight = in_flight
+        self.stages = stages
+        self._paths: Dict[Callable, str] = {}
+
+    def _route_path(self, endpoint: Optional[Callable]) -> str:
+        if endpoint is None:
+            return "other"
+        path = self._paths.get(endpoint)
+        if path is None:
+            self._paths = {route.endpoint: route.path for route in self.routes if hasattr(route, "endpoint")}
+            path = self._paths.get(endpoint, "other")
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        received_at = time.perf_counter()
+        marks: Dict[str, float] = {}
+        token = _request_marks.set(marks)
+        status = [500]
+        response_started_at = [None]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                response_started_at[0] = time.perf_counter()
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            _request_marks.reset(token)
+            finished_at = time.perf_counter()
+            path = self._route_path(scope.get("endpoint"))
+            self.requests.inc(path, str(status[0]))
+            self.durations.observe(finished_at - received_at, path)
+            if self.stages is not None and "handler_start" in marks and "handler_end" in marks:
+                self.stages.observe(marks["handler_start"] - received_at, "parse")
+                self.stages.observe((response_started_at[0] or finished_at) - marks["handler_end"], "serialize")
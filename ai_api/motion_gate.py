@@ -0,0 +1,192 @@
+import time
+from collections import Counter
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from tracking import BallTracker
+
+Box = Tuple[float, float, float, float]
+
+# Décisions de la porte: inférence (première frame, mouvement, rafraîchissement) ou saut
+DECISIONS = ("initial", "motion", "refresh", "skip")
+
+
+class MotionGate:
+    """
+    Porte de mouvement: n'appelle le modèle que si une zone utile a bougé
+
+    La frame est réduite (`width` pixels de large, niveaux de gris) et
+    comparée à la dernière frame analysée par le modèle. Seules comptent les
+    zones où un changement modifie le résultat de l'exercice: autour de la
+    dernière position du ballon (et de sa position prédite), et les cibles.
+    Tant qu'aucun ballon n'est connu, toute la frame compte (le ballon peut
+    entrer n'importe où).
+
+    Une frame sautée reprend la dernière détection telle quelle (`bridge`):
+    rien n'a bougé près du ballon, il n'y a donc rien à extrapoler. Une
+    détection reprise ne sert qu'à l'affichage, jamais à compter une
+    touche. Le modèle est
+    rappelé au moins toutes les `max_skipped` frames ou `max_skip_s`
+    secondes, pour ne jamais rester sur un résultat périmé.
+
+    La comparaison se fait toujours avec la dernière frame analysée: un
+    mouvement lent finit par dépasser le seuil au lieu de passer inaperçu
+    d'une frame à l'autre.
+    """
+
+    def __init__(self, width: int = 160, pixel_threshold: int = 25, min_changed: float = 0.02,
+                 ball_margin: float = 1.0, max_skipped: int = 15, max_skip_s: float = 0.5,
+                 tracker=None):
+        """
+        Args:
+            width: Largeur de la frame réduite utilisée pour la différence
+            pixel_threshold: Écart de niveau de gris à partir duquel un pixel a changé
+            min_changed: Part des pixels d'une zone qui doivent changer pour relancer le modèle
+            ball_margin: Marge autour du ballon, en tailles de ballon
+            max_skipped: Nombre maximal de frames sautées d'affilée
+            max_skip_s: Durée maximale sans inférence (s)
+            tracker: Filtre de suivi (`BallTracker` ou `SharedTrack`), un
+                `BallTracker` propre par défaut
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.ball_margin = ball_margin
+        self.max_skipped = max_skipped
+        self.max_skip_s = max_skip_s
+
+        self.tracker = tracker if tracker is not None else BallTracker()
+        self.last_box: Optional[Box] = None
+        self.reference: Optional[np.ndarray] = None
+        self.reference_at: Optional[float] = None
+        self.skipped_in_row = 0
+        self.decision: Optional[str] = None
+
+        # Compteurs
+        self.decisions: Counter = Counter()
+
+    def _downscale(self, image: np.ndarray) -> np.ndarray:
+        height, width = image.shape[:2]
+        size = (self.width, max(int(round(height * self.width / width)), 1))
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Lisser le bruit du capteur et de la compression
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def regions(self, targets: Sequence[Box] = ()) -> Optional[list]:
+        """
+        Zones surveillées, dans les coordonnées de la frame
+
+        Returns:
+            Liste de bbox, ou None si toute la frame est surveillée (aucun ballon connu)
+        """
+        if self.last_box is None:
+            return None
+        x1, y1, x2, y2 = self.last_box
+        half_width = (x2 - x1) * (0.5 + self.ball_margin)
+        half_height = (y2 - y1) * (0.5 + self.ball_margin)
+        centers = [((x1 + x2) / 2, (y1 + y2) / 2)]
+        state = self.tracker.predict_state()
+        if state is not None:
+            centers.append(state[:2])
+        regions = [(x - half_width, y - half_height, x + half_width, y + half_height) for x, y in centers]
+        return regions + [tuple(target) for target in targets]
+
+    def _moved(self, mask: np.ndarray, regions: Optional[list], scale_x: float, scale_y: float) -> bool:
+        """Un changement suffisant dans une des zones (scale_*: frame -> frame réduite)"""
+        if regions is None:
+            return np.count_nonzero(mask) >= self.min_changed * mask.size
+        height, width = mask.shape
+        for x1, y1, x2, y2 in regions:
+            # Coordonnées de la frame -> coordonnées de la frame réduite
+            left = min(max(int(x1 * scale_x), 0), width)
+            top = min(max(int(y1 * scale_y), 0), height)
+            right = min(max(int(np.ceil(x2 * scale_x)), 0), width)
+            bottom = min(max(int(np.ceil(y2 * scale_y)), 0), height)
+            area = (right - left) * (bottom - top)
+            if area > 0 and np.count_nonzero(mask[top:bottom, left:right]) >= self.min_changed * area:
+                return True
+        return False
+
+    def should_infer(self, image: np.ndarray, targets: Sequence[Box] = (), now: Optional[float] = None,
+                     scale: Tuple[float, float] = (1.0, 1.0)) -> bool:
+        """
+        Indique si la frame doit passer par le modèle
+
+        Une frame retenue devient la référence des comparaisons suivantes;
+        l'appelant rapporte ensuite sa détection avec `observe`. Pour une
+        frame sautée, `bridge` donne la détection à reprendre.
+
+        Args:
+            image: Frame (BGR ou niveaux de gris)
+            targets: Cibles de l'exercice, dans les coordonnées de la frame
+            now: Heure de la frame
+            scale: Rapport (largeur, hauteur) entre les coordonnées de la frame
+                et `image` (image décodée à résolution réduite)
+        """
+        now = time.monotonic() if now is None else now
+        small = self._downscale(image)
+
+        if self.reference is None or self.reference.shape != small.shape:
+            decision = "initial"
+        elif self.skipped_in_row >= self.max_skipped or now - self.reference_at >= self.max_skip_s:
+            decision = "refresh"
+        else:
+            mask = cv2.absdiff(small, self.reference) > self.pixel_threshold
+            moved = self._moved(
+                mask, self.regions(targets),
+                small.shape[1] / (image.shape[1] * scale[0]),
+                small.shape[0] / (image.shape[0] * scale[1])
+            )
+            decision = "motion" if moved else "skip"
+
+        self.decision = decision
+        self.decisions[decision] += 1
+        if decision == "skip":
+            self.skipped_in_row += 1
+            return False
+        self.reference = small
+        self.reference_at = now
+        self.skipped_in_row = 0
+        return True
+
+    def observe(self, box: Optional[Box]):
+        """Rapporte la détection d'une frame analysée par le modèle (None: aucun ballon)"""
+        if box is None:
+            # Ballon perdu: toute la frame redevient utile
+            self.last_box = None
+            self.tracker.reset()
+            return
+        self.last_box = tuple(float(v) for v in box)
+        self.tracker.update({"x1": box[0], "y1": box[1], "x2": box[2], "y2": box[3]})
+
+    def bridge(self) -> Optional[Box]:
+        """
+        Détection à reprendre pour une frame sautée
+
+        La dernière bbox observée par le modèle, sans extrapolation: la frame
+        n'est sautée que si rien n'a bougé autour du ballon. À réserver à
+        l'affichage: une bbox reprise ne doit ni compter une touche ni être
+        journalisée comme détection.
+
+        Returns:
+            Bbox dans les coordonnées de la frame, ou None si aucun ballon
+        """
+        return self.last_box
+
+    def close(self):
+        """Libère le filtre de suivi (piste du suivi partagé)"""
+        self.tracker.retire()
+
+    def stats(self) -> dict:
+        frames = sum(self.decisions.values())
+        return {
+            "frames": frames,
+            "inferred": frames - self.decisions["skip"],
+            "skipped": self.decisions["skip"],
+            "skip_rate": round(self.decisions["skip"] / frames, 4) if frames else 0.0,
+            "decisions": {decision: self.decisions[decision] for decision in DECISIONS}
+        }
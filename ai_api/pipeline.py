@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from timing import StageTimings
+
+logger = logging.getLogger(__name__)
+
+
+class LatestValue:
+    """
+    Emplacement « dernière valeur gagnante » partagé entre threads
+
+    Chaque dépôt écrase le précédent et reçoit un numéro de séquence. Plusieurs
+    lecteurs peuvent suivre le même emplacement: chacun attend une valeur plus
+    récente que la dernière lue et déduit des numéros sautés combien de
+    valeurs il a manquées (au lieu de les mettre en file).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._value: Any = None
+        self._closed = False
+
+    def put(self, value: Any) -> int:
+        """Dépose une valeur et renvoie son numéro de séquence"""
+        with self._condition:
+            self._seq += 1
+            self._value = value
+            self._condition.notify_all()
+            return self._seq
+
+    def get(self, after: int = 0, timeout: Optional[float] = None) -> Optional[Tuple[int, Any]]:
+        """
+        Attend une valeur plus récente que `after`
+
+        Returns:
+            (séquence, valeur), ou None si l'emplacement est fermé ou le délai écoulé
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq > after or self._closed, timeout):
+                return None
+            if self._seq <= after:
+                return None
+            return self._seq, self._value
+
+    def latest(self) -> Tuple[int, Any]:
+        """Dernière valeur déposée, sans attendre (séquence 0 si aucune)"""
+        with self._condition:
+            return self._seq, self._value
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class DetectionPipeline:
+    """
+    Boucle locale découpée en trois étages: capture, inférence et affichage
+
+    La capture et l'inférence tournent chacune dans leur thread, reliées par
+    des emplacements « dernière frame gagnante »: l'inférence prend toujours
+    la frame la plus récente et l'affichage suit la cadence de la caméra
+    sans attendre le modèle. L'affichage reste dans le thread appelant
+    (`cv2.imshow` doit tourner dans le thread principal).
+    """
+
+    def __init__(self, capture: Callable[[], Any], infer: Callable[[Any, float], Any]):
+        """
+        Args:
+            capture: Lit une frame (None en fin de flux ou sur erreur de capture)
+            infer: Traite une frame et son heure de capture; renvoie le
+                résultat à afficher, ou None si la frame est ignorée
+                (fréquence de détection)
+        """
+        self.capture = capture
+        self.infer = infer
+        self.frames = LatestValue()
+        self.results = LatestValue()
+        self.timings = StageTimings()
+
+        self._stop = threading.Event()
+        self._threads = []
+
+        # Compteurs par étage
+        self.captured = 0
+        self.inferred = 0
+        self.skipped = 0
+        self.rendered = 0
+        self.dropped = {"inference": 0, "render": 0, "results": 0}
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            start_time = time.perf_counter()
+            frame = self.capture()
+            if frame is None:
+                break
+            captured_at = time.time()
+            self.timings.record("capture", (time.perf_counter() - start_time) * 1000)
+            self.frames.put((frame, captured_at))
+            self.captured += 1
+        self.frames.close()
+
+    def _inference_loop(self):
+        last_seq = 0
+        while not self._stop.is_set():
+            item = self.frames.get(after=last_seq, timeout=0.5)
+            if item is None:
+                if self.frames.closed:
+                    break
+                continue
+            seq, (frame, captured_at) = item
+            # Frames écrasées pendant l'inférence précédente
+            self.dropped["inference"] += seq - last_seq - 1
+            last_seq = seq
+
+            start_time = time.perf_counter()
+            try:
+                result = self.infer(frame, captured_at)
+            except Exception as e:
+                logger.error(f"Erreur dans l'étage d'inférence: {e}")
+                continue
+            if result is None:
+                self.skipped += 1
+                continue
+            self.timings.record("inference", (time.perf_counter() - start_time) * 1000)
+            self.results.put(result)
+            self.inferred += 1
+        self.results.close()
+
+    def render_frames(self) -> Iterator[Tuple[Any, float, Any]]:
+        """
+        Frames à afficher, au rythme de la caméra
+
+        Returns:
+            Itérateur de (frame, heure de capture, dernier résultat d'inférence
+            ou None); le temps passé par l'appelant entre deux frames est
+            compté comme durée d'affichage
+        """
+        last_seq = 0
+        last_result_seq = 0
+        while not self._stop.is_set():
+            item = self.frames.get(after=last_seq, timeout=0.5)
+            if item is None:
+                if self.frames.closed:
+                    return
+                continue
+            seq, (frame, captured_at) = item
+            self.dropped["render"] += seq - last_seq - 1
+            last_seq = seq
+
+            result_seq, result = self.results.latest()
+            if result_seq > last_result_seq:
+                # Résultats arrivés plus vite que l'affichage
+                self.dropped["results"] += result_seq - last_result_seq - 1
+                last_result_seq = result_seq
+
+            start_time = time.perf_counter()
+            yield frame, captured_at, result
+            self.timings.record("render", (time.perf_counter() - start_time) * 1000)
+            self.rendered += 1
+
+    def stats(self) -> dict:
+        """Temps par étage et frames abandonnées à chaque étage"""
+        return {
+            "stages": self.timings.stats(),
+            "captured": self.captured,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "rendered": self.rendered,
+            "dropped": dict(self.dropped)
+        }
@@ -0,0 +1,136 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+# Fonctions feuilles d'un thread inactif (boucle asyncio, workers en attente de travail)
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def _frame_label(code, cache: Dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        label = cache[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+class SamplingProfiler:
+    """
+    Profileur par échantillonnage des piles de tous les threads du processus
+
+    Un thread dédié relève périodiquement la pile Python de chaque thread
+    (`sys._current_frames`) et compte les piles identiques. Rien n'est
+    installé dans l'interpréteur (ni `sys.setprofile`, ni trace): hors
+    session de profilage, aucun coût; pendant la session, le coût est celui
+    du thread d'échantillonnage.
+
+    Le résultat est au format « collapsed stacks » (une pile par ligne,
+    cadres séparés par `;`, suivie du nombre d'échantillons), lisible par
+    flamegraph.pl, speedscope ou inferno.
+    """
+
+    def __init__(self, interval_ms: float = 5.0, include_idle: bool = False):
+        """
+        Args:
+            interval_ms: Intervalle entre deux relevés
+            include_idle: Garder les piles des threads inactifs (en attente)
+        """
+        self.interval = max(interval_ms, 0.5) / 1000
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at: Optional[float] = None
+        self.duration_s = 0.0
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._done.is_set()
+
+    def start(self, duration_s: float, until: Optional[Callable[[], bool]] = None):
+        """
+        Démarre l'échantillonnage en tâche de fond
+
+        Args:
+            duration_s: Durée maximale de la session
+            until: Arrête la session dès qu'il renvoie True (ex. N requêtes traitées)
+        """
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, args=(duration_s, until), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attend la fin de la session"""
+        return self._done.wait(timeout)
+
+    def _run(self, duration_s: float, until: Optional[Callable[[], bool]]):
+        own_id = threading.get_ident()
+        deadline = self.started_at + duration_s
+        names: Dict[int, str] = {}
+        try:
+            while not self._stop.is_set():
+                frames = sys._current_frames()
+                if frames.keys() - names.keys():
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    self._record(names.get(thread_id, str(thread_id)), frame)
+                self.samples += 1
+
+                if time.perf_counter() >= deadline or (until is not None and until()):
+                    break
+                self._stop.wait(self.interval)
+        finally:
+            self.duration_s = time.perf_counter() - self.started_at
+            self._done.set()
+
+    def _record(self, thread_name: str, frame):
+        leaf = frame.f_code
+        if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+            self.idle_samples += 1
+            return
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame.f_code, self._labels))
+            frame = frame.f_back
+        stack.append(thread_name)
+        stack.reverse()
+        self.stacks[tuple(stack)] += 1
+
+    def collapsed(self) -> str:
+        """Piles au format collapsed (flamegraph), de la plus fréquente à la moins fréquente"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> Tuple[Tuple[str, int], ...]:
+        """Fonctions les plus présentes en feuille de pile (temps propre)"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack[-1]] += count
+        return tuple(leaves.most_common(limit))
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "stacks": sum(self.stacks.values()),
+            "idle_stacks": self.idle_samples,
+            "interval_ms": round(self.interval * 1000, 2),
+            "duration_s": round(self.duration_s, 3)
+        }
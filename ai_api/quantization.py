@@ -0,0 +1,447 @@
+"""
+Variantes quantifiées du modèle (INT8, FP16) et contrôle de précision
+
+Sur les nœuds CPU, le modèle FP32 est le premier coût par frame. Ce module
+construit hors ligne une variante plus légère du modèle puis la compare au
+modèle FP32 (`best.pt`) sur un jeu d'images mis de côté:
+
+- `onnx-int8`: quantification statique ONNX Runtime (poids et activations
+  INT8), échelles calibrées sur nos propres frames;
+- `openvino-fp16`: export OpenVINO en FP16, seulement si le CPU calcule
+  nativement en FP16.
+
+Le contrôle compare, image par image, la détection la plus confiante des
+deux modèles: décision « ballon détecté », décision « ballon sur une cible »
+et IoU des bbox. Le résultat est écrit dans un manifeste à côté du modèle
+(`*.gate.json`), avec latence et mémoire des deux modèles: l'API refuse de
+charger une variante sans manifeste ou dont le contrôle a échoué.
+
+Usage:
+    python quantization.py build --variant onnx-int8 --calibration frames/calib --holdout frames/holdout
+    python quantization.py build --variant openvino-fp16 --holdout frames/holdout
+    python quantization.py check --variant onnx-int8 --holdout frames/holdout
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, OnnxBackend, create_backend, extract_top_detection, gate_manifest_path
+from exercise import DEFAULT_TARGETS
+from geometry import overlap_matrix, paired_iou
+
+logger = logging.getLogger(__name__)
+
+# Modèle de référence du contrôle de précision
+REFERENCE_BACKEND = "torch"
+VARIANTS = tuple(name for name, backend in BACKENDS.items() if backend.gated)
+
+# Seuils par défaut du contrôle de précision
+MIN_DECISION_AGREEMENT = 0.98
+MIN_HIT_AGREEMENT = 0.98
+MIN_MEAN_IOU = 0.90
+
+# Valeur de remplissage du letterbox d'ultralytics
+LETTERBOX_COLOR = 114
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def list_images(directory: str, limit: Optional[int] = None) -> List[Path]:
+    """Images d'un répertoire, triées; `limit` images réparties sur tout le jeu"""
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    if limit is not None and len(paths) > limit:
+        paths = [paths[i] for i in np.linspace(0, len(paths) - 1, limit).astype(int)]
+    return paths
+
+
+def letterbox(image: np.ndarray, size: int) -> np.ndarray:
+    """
+    Prétraitement d'ultralytics pour un modèle exporté
+
+    Réduction sans déformation, bandes grises jusqu'au carré `size`, RGB,
+    valeurs dans [0, 1].
+
+    Returns:
+        Tenseur (1, 3, size, size) float32
+    """
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    resized_width, resized_height = int(round(width * ratio)), int(round(height * ratio))
+    canvas = np.full((size, size, 3), LETTERBOX_COLOR, dtype=np.uint8)
+    top, left = (size - resized_height) // 2, (size - resized_width) // 2
+    canvas[top:top + resized_height, left:left + resized_width] = cv2.resize(
+        image, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR
+    )
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor)
+
+
+class CalibrationFrames:
+    """
+    Frames de calibration pour `quantize_static` (interface CalibrationDataReader)
+
+    Les images sont lues et prétraitées une à une: la calibration ne garde
+    pas tout le jeu en mémoire.
+    """
+
+    def __init__(self, paths: Sequence[Path], input_name: str, imgsz: int):
+        self.paths = list(paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._index = 0
+
+    def get_next(self) -> Optional[dict]:
+        while self._index < len(self.paths):
+            image = cv2.imread(str(self.paths[self._index]))
+            self._index += 1
+            if image is not None:
+                return {self.input_name: letterbox(image, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+def head_postprocess_nodes(model) -> List[str]:
+    """
+    Nœuds de décodage de la tête de détection (dernier module, hors convolutions)
+
+    Le décodage des boîtes (DFL, sigmoïde, concaténations, mise à l'échelle)
+    mélange des coordonnées en pixels et des scores dans [0, 1]: une seule
+    échelle INT8 pour ces tenseurs dégrade les bbox. Ces nœuds restent en
+    flottant; les convolutions de la tête sont quantifiées.
+    """
+    modules = []
+    for node in model.graph.node:
+        parts = node.name.split("/")
+        if len(parts) > 2 and parts[1].startswith("model.") and parts[1][6:].isdigit():
+            modules.append(int(parts[1][6:]))
+    if not modules:
+        return []
+    prefix = f"/model.{max(modules)}/"
+    return [node.name for node in model.graph.node if node.name.startswith(prefix) and node.op_type != "Conv"]
+
+
+def build_int8(weights: str, imgsz: int, cache_dir: Optional[str], calibration: Sequence[Path],
+               method: str = "minmax") -> Path:
+    """
+    Quantification statique INT8 du modèle ONNX
+
+    Activations en UINT8 et poids en INT8 par canal (format QDQ), échelles
+    des activations calibrées sur `calibration`. Les métadonnées de
+    l'export ultralytics (classes, stride, taille) sont recopiées.
+
+    Returns:
+        Chemin du modèle quantifié
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not calibration:
+        raise ValueError("Aucune frame de calibration")
+    source = OnnxBackend(weights, imgsz=imgsz, cache_dir=cache_dir).prepare()
+    artifact = create_backend("onnx-int8", weights, imgsz=imgsz, cache_dir=cache_dir).artifact_path()
+    methods = {
+        "minmax": CalibrationMethod.MinMax,
+        "entropy": CalibrationMethod.Entropy,
+        "percentile": CalibrationMethod.Percentile
+    }
+
+    model = onnx.load(str(source))
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = Path(tmp) / "prepared.onnx"
+        try:
+            # Inférence des formes et fusions: recommandé avant la quantification
+            quant_pre_process(str(source), str(prepared))
+        except Exception as e:
+            logger.warning(f"Prétraitement du modèle ONNX impossible, quantification du modèle brut: {e}")
+            shutil.copy(source, prepared)
+
+        output = Path(tmp) / artifact.name
+        logger.info(f"Calibration INT8 sur {len(calibration)} frames ({method})...")
+        quantize_static(
+            str(prepared), str(output),
+            CalibrationFrames(calibration, model.graph.input[0].name, imgsz),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            nodes_to_exclude=head_postprocess_nodes(model),
+            calibrate_method=methods[method]
+        )
+
+        quantized = onnx.load(str(output))
+        onnx.helper.set_model_props(quantized, {prop.key: prop.value for prop in model.metadata_props})
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        onnx.save(quantized, str(artifact))
+    return artifact
+
+
+def cpu_supports_fp16() -> bool:
+    """Le CPU calcule nativement en FP16 selon OpenVINO"""
+    import openvino as ov
+    return "FP16" in ov.Core().get_property("CPU", "OPTIMIZATION_CAPABILITIES")
+
+
+def build_fp16(weights: str, imgsz: int, cache_dir: Optional[str], force: bool = False) -> Path:
+    """
+    Export OpenVINO avec poids FP16
+
+    Raises:
+        RuntimeError: CPU sans calcul FP16 natif (sauf `force`)
+    """
+    if not force and not cpu_supports_fp16():
+        raise RuntimeError(
+            "Ce CPU ne calcule pas en FP16 (OpenVINO repasserait en FP32): variante openvino-fp16 inutile ici"
+        )
+    backend = create_backend("openvino-fp16", weights, imgsz=imgsz, cache_dir=cache_dir)
+    artifact = backend.artifact_path()
+    if artifact.exists():
+        shutil.rmtree(artifact)
+    return backend.export(artifact)
+
+
+def rss_mb() -> float:
+    """Mémoire résidente du processus (Linux)"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def artifact_mb(path: Path) -> float:
+    """Taille du modèle sur disque (fichier ou répertoire OpenVINO)"""
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 2 ** 20
+    return path.stat().st_size / 2 ** 20
+
+
+def profile_backend(name: str, weights: str, imgsz: int, cache_dir: Optional[str], paths: Sequence[str],
+                    warmup: int) -> dict:
+    """
+    Détections, latence et mémoire d'un backend sur le jeu de contrôle
+
+    Exécuté dans un processus dédié (spawn): la mémoire mesurée est celle
+    d'un seul modèle, sans les imports ni les poids de l'autre.
+    """
+    from ultralytics import YOLO  # noqa: F401  (imports comptés hors mémoire du modèle)
+
+    backend = create_backend(name, weights, imgsz=imgsz, cache_dir=cache_dir)
+    # Le contrôle porte sur la variante avant son activation
+    backend.gated = False
+    baseline_mb = rss_mb()
+    started_at = time.perf_counter()
+    backend.load()
+    load_ms = (time.perf_counter() - started_at) * 1000
+
+    images = [cv2.imread(path) for path in paths]
+    for _ in range(warmup):
+        backend.predict([images[0]])
+    model_mb = rss_mb() - baseline_mb
+
+    latencies, detections = [], []
+    for image in images:
+        started_at = time.perf_counter()
+        result = backend.predict([image])[0]
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        detections.append(extract_top_detection(result))
+
+    return {
+        "load_ms": round(load_ms, 1),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "model_mb": round(model_mb, 1),
+        # ru_maxrss en Ko sous Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "artifact_mb": round(artifact_mb(backend.artifact_path()), 1),
+        "detections": detections
+    }
+
+
+def compare_detections(reference: Sequence, candidate: Sequence, targets: Sequence) -> dict:
+    """
+    Écarts de détection de la variante par rapport au modèle FP32
+
+    Args:
+        reference: Détection la plus confiante par image (bbox, confiance) ou None, modèle FP32
+        candidate: Idem pour la variante
+        targets: Cibles pour la décision « ballon sur une cible »
+    """
+    detected_ref = np.array([d is not None for d in reference])
+    detected = np.array([d is not None for d in candidate])
+    hits_ref = np.array([d is not None and bool(overlap_matrix(d[0], targets).any()) for d in reference])
+    hits = np.array([d is not None and bool(overlap_matrix(d[0], targets).any()) for d in candidate])
+
+    both = np.flatnonzero(detected_ref & detected)
+    ious = paired_iou([reference[i][0] for i in both], [candidate[i][0] for i in both]) if len(both) else np.empty(0)
+    confidence_deltas = [candidate[i][1] - reference[i][1] for i in both]
+    return {
+        "images": len(reference),
+        "decision_agreement": round(float(np.mean(detected_ref == detected)), 4),
+        "missed": int((detected_ref & ~detected).sum()),
+        "spurious": int((~detected_ref & detected).sum()),
+        "hit_agreement": round(float(np.mean(hits_ref == hits)), 4),
+        "hit_flips": int((hits_ref != hits).sum()),
+        "mean_iou": round(float(ious.mean()), 4) if len(ious) else None,
+        "p5_iou": round(float(np.percentile(ious, 5)), 4) if len(ious) else None,
+        "mean_confidence_delta": round(float(np.mean(confidence_deltas)), 4) if confidence_deltas else None
+    }
+
+
+def gate_failures(accuracy: dict, thresholds: dict) -> List[str]:
+    """Seuils non respectés (liste vide: variante acceptée)"""
+    failures = []
+    if accuracy["decision_agreement"] < thresholds["min_decision_agreement"]:
+        failures.append(f"accord détection {accuracy['decision_agreement']:.2%} "
+                        f"< {thresholds['min_decision_agreement']:.2%}")
+    if accuracy["hit_agreement"] < thresholds["min_hit_agreement"]:
+        failures.append(f"accord cible {accuracy['hit_agreement']:.2%} < {thresholds['min_hit_agreement']:.2%}")
+    if accuracy["mean_iou"] is None:
+        failures.append("aucune image où les deux modèles détectent le ballon")
+    elif accuracy["mean_iou"] < thresholds["min_mean_iou"]:
+        failures.append(f"IoU moyen {accuracy['mean_iou']:.3f} < {thresholds['min_mean_iou']:.3f}")
+    return failures
+
+
+def run_gate(variant: str, weights: str, imgsz: int, cache_dir: Optional[str], holdout: Sequence[Path],
+             targets: Sequence, thresholds: dict, warmup: int = 3, build: Optional[dict] = None) -> dict:
+    """
+    Contrôle de précision d'une variante et écriture de son manifeste
+
+    Returns:
+        Manifeste (précision, seuils, échecs, latence et mémoire des deux modèles)
+    """
+    if not holdout:
+        raise ValueError("Aucune image de contrôle")
+    artifact = create_backend(variant, weights, imgsz=imgsz, cache_dir=cache_dir).artifact_path()
+    manifest_path = gate_manifest_path(artifact)
+    # Un ancien manifeste ne doit pas valider un modèle reconstruit
+    manifest_path.unlink(missing_ok=True)
+
+    paths = [str(p) for p in holdout]
+    context = multiprocessing.get_context("spawn")
+    profiles = {}
+    for name in (REFERENCE_BACKEND, variant):
+        logger.info(f"Jeu de contrôle: {len(paths)} images avec {name}...")
+        with context.Pool(1) as pool:
+            profiles[name] = pool.apply(profile_backend, (name, weights, imgsz, cache_dir, paths, warmup))
+
+    reference, candidate = profiles[REFERENCE_BACKEND], profiles[variant]
+    accuracy = compare_detections(reference.pop("detections"), candidate.pop("detections"), targets)
+    failures = gate_failures(accuracy, thresholds)
+    manifest = {
+        "variant": variant,
+        "reference": REFERENCE_BACKEND,
+        "weights": str(weights),
+        "artifact": artifact.name,
+        "imgsz": imgsz,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "build": build or {},
+        "holdout_images": len(paths),
+        "thresholds": thresholds,
+        "accuracy": accuracy,
+        "passed": not failures,
+        "failures": failures,
+        "performance": {
+            REFERENCE_BACKEND: reference,
+            variant: candidate,
+            "latency_gain": round(reference["mean_ms"] / max(candidate["mean_ms"], 1e-9), 2),
+            "memory_saved_mb": round(reference["model_mb"] - candidate["model_mb"], 1),
+            "disk_saved_mb": round(reference["artifact_mb"] - candidate["artifact_mb"], 1)
+        }
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def print_report(manifest: dict):
+    variant, reference = manifest["variant"], manifest["reference"]
+    performance, accuracy = manifest["performance"], manifest["accuracy"]
+    print(f"\n{'modèle':<14} {'moy.':>8} {'p50':>8} {'p95':>8} {'mémoire':>9} {'disque':>8}")
+    for name in (reference, variant):
+        entry = performance[name]
+        print(f"{name:<14} {entry['mean_ms']:>6.2f}ms {entry['p50_ms']:>6.2f}ms {entry['p95_ms']:>6.2f}ms "
+              f"{entry['model_mb']:>7.1f}Mo {entry['artifact_mb']:>6.1f}Mo")
+    print(f"gain x{performance['latency_gain']}, mémoire -{performance['memory_saved_mb']} Mo, "
+          f"disque -{performance['disk_saved_mb']} Mo")
+    mean_iou = accuracy["mean_iou"]
+    print(f"{accuracy['images']} images: accord détection {accuracy['decision_agreement']:.2%} "
+          f"({accuracy['missed']} manqués, {accuracy['spurious']} en trop), "
+          f"accord cible {accuracy['hit_agreement']:.2%}, IoU moyen {'-' if mean_iou is None else f'{mean_iou:.3f}'}")
+    if manifest["passed"]:
+        print(f"✅ Variante {variant} acceptée: INFERENCE_BACKEND={variant}")
+    else:
+        print(f"❌ Variante {variant} refusée: {'; '.join(manifest['failures'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variantes quantifiées du modèle et contrôle de précision")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Construit une variante puis la contrôle")
+    check_parser = commands.add_parser("check", help="Recontrôle une variante déjà construite")
+    for command in (build_parser, check_parser):
+        command.add_argument("--variant", required=True, choices=VARIANTS)
+        command.add_argument("--holdout", required=True, help="Répertoire d'images de contrôle (hors calibration)")
+        command.add_argument("--weights", default=os.getenv("MODEL_PATH", "./models/best.pt"))
+        command.add_argument("--imgsz", type=int, default=int(os.getenv("MODEL_INPUT_SIZE", "640")))
+        command.add_argument("--cache-dir", default=os.getenv("MODEL_CACHE_DIR") or None)
+        command.add_argument("--targets", help="Fichier JSON des cibles [[x1, y1, x2, y2], ...] (cibles par défaut)")
+        command.add_argument("--min-decision-agreement", type=float, default=MIN_DECISION_AGREEMENT)
+        command.add_argument("--min-hit-agreement", type=float, default=MIN_HIT_AGREEMENT)
+        command.add_argument("--min-mean-iou", type=float, default=MIN_MEAN_IOU)
+        command.add_argument("--warmup", type=int, default=3)
+    build_parser.add_argument("--calibration", help="Répertoire des frames de calibration (onnx-int8)")
+    build_parser.add_argument("--max-calibration", type=int, default=300,
+                              help="Nombre maximal de frames de calibration")
+    build_parser.add_argument("--calibration-method", default="minmax", choices=("minmax", "entropy", "percentile"))
+    build_parser.add_argument("--force", action="store_true", help="Construire la variante FP16 sans calcul FP16 natif")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    targets = json.loads(Path(args.targets).read_text()) if args.targets else DEFAULT_TARGETS
+    thresholds = {
+        "min_decision_agreement": args.min_decision_agreement,
+        "min_hit_agreement": args.min_hit_agreement,
+        "min_mean_iou": args.min_mean_iou
+    }
+
+    build = None
+    artifact = create_backend(args.variant, args.weights, imgsz=args.imgsz, cache_dir=args.cache_dir).artifact_path()
+    if args.command == "build":
+        started_at = time.perf_counter()
+        if args.variant == "onnx-int8":
+            if not args.calibration:
+                parser.error("--calibration est requis pour onnx-int8")
+            calibration = list_images(args.calibration, args.max_calibration)
+            build_int8(args.weights, args.imgsz, args.cache_dir, calibration, args.calibration_method)
+            build = {"calibration_images": len(calibration), "calibration_method": args.calibration_method}
+        else:
+            build_fp16(args.weights, args.imgsz, args.cache_dir, force=args.force)
+            build = {"cpu_fp16": cpu_supports_fp16()}
+        build["build_s"] = round(time.perf_counter() - started_at, 1)
+    elif not artifact.exists():
+        parser.error(f"Variante {args.variant} non construite (commande build)")
+    elif gate_manifest_path(artifact).exists():
+        # Garder les informations de construction du manifeste précédent
+        build = json.loads(gate_manifest_path(artifact).read_text()).get("build")
+
+    manifest = run_gate(args.variant, args.weights, args.imgsz, args.cache_dir, list_images(args.holdout),
+                        targets, thresholds, warmup=args.warmup, build=build)
+    print_report(manifest)
+    raise SystemExit(0 if manifest["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
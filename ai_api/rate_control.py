@@ -0,0 +1,314 @@
+import math
+import time
+from typing import Optional, Sequence, Tuple
+
+import cv2
+
+# Intervalle fixe utilisé auparavant par les scripts (100 ms), référence des économies
+BASELINE_INTERVAL_S = 0.1
+
+
+def _center(bbox: dict):
+    return (bbox["x1"] + bbox["x2"]) / 2, (bbox["y1"] + bbox["y2"]) / 2
+
+
+def distance_to_box(x: float, y: float, bbox: dict) -> float:
+    """Distance d'un point au bord d'une bbox (0 si le point est dedans)"""
+    dx = max(bbox["x1"] - x, 0, x - bbox["x2"])
+    dy = max(bbox["y1"] - y, 0, y - bbox["y2"])
+    return math.hypot(dx, dy)
+
+
+class AdaptiveRateScheduler:
+    """
+    Fréquence de détection adaptée à la scène et au coût de l'inférence
+
+    L'intervalle entre deux détections se réduit quand le ballon va vite ou
+    s'approche de la cible courante, et s'allonge quand la scène est calme
+    (ballon immobile ou absent). Il ne descend jamais sous le budget de
+    calcul du joueur: avec une latence d'inférence mesurée L et un budget B
+    (part du temps consacrée à l'inférence), l'intervalle est au moins L / B.
+    """
+
+    def __init__(self, min_interval: float = 0.033, active_interval: float = 0.15,
+                 idle_interval: float = 0.5, fast_speed: float = 600.0, idle_speed: float = 30.0,
+                 near_distance: float = 150.0, idle_after: float = 1.0, compute_budget: float = 0.5,
+                 baseline_interval: float = BASELINE_INTERVAL_S):
+        """
+        Args:
+            min_interval: Intervalle minimal entre deux détections (s)
+            active_interval: Intervalle quand le ballon est présent mais lent et loin de la cible (s)
+            idle_interval: Intervalle quand la scène est calme (s)
+            fast_speed: Vitesse à partir de laquelle la fréquence est maximale (pixels/s)
+            idle_speed: Vitesse sous laquelle le ballon est considéré immobile (pixels/s)
+            near_distance: Distance à la cible sous laquelle la fréquence augmente (pixels)
+            idle_after: Durée de calme avant de passer à `idle_interval` (s)
+            compute_budget: Part maximale du temps consacrée à l'inférence (0-1]
+            baseline_interval: Intervalle fixe de référence pour mesurer les économies (s)
+        """
+        self.min_interval = min_interval
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.fast_speed = fast_speed
+        self.idle_speed = idle_speed
+        self.near_distance = near_distance
+        self.idle_after = idle_after
+        self.compute_budget = compute_budget
+        self.baseline_interval = baseline_interval
+
+        self.interval = active_interval
+        self.mode = "active"
+        self.speed = 0.0
+        self.latency = 0.0
+        self.last_detection_at: Optional[float] = None
+        self.last_center = None
+        self.last_center_at: Optional[float] = None
+        self.calm_since: Optional[float] = None
+
+        # Compteurs
+        self.started_at: Optional[float] = None
+        self.frames = 0
+        self.detections = 0
+
+    def should_detect(self, now: Optional[float] = None) -> bool:
+        """Indique si la frame courante doit passer par la détection"""
+        now = time.time() if now is None else now
+        if self.started_at is None:
+            self.started_at = now
+        self.frames += 1
+        if self.last_detection_at is not None and now - self.last_detection_at < self.interval:
+            return False
+        self.last_detection_at = now
+        self.detections += 1
+        return True
+
+    def record_latency(self, latency: float):
+        """Enregistre la latence mesurée d'une détection (s), moyenne glissante"""
+        self.latency = latency if self.latency == 0 else 0.8 * self.latency + 0.2 * latency
+
+    def observe(self, ball_bbox: Optional[dict], target_bbox: Optional[dict] = None,
+                now: Optional[float] = None):
+        """
+        Met à jour l'intervalle après une détection
+
+        Args:
+            ball_bbox: Bbox du ballon détecté, ou None
+            target_bbox: Cible courante (dans le même repère que le ballon)
+            now: Heure de la détection
+        """
+        now = time.time() if now is None else now
+        urgency = 0.0
+
+        if ball_bbox is None:
+            self.last_center = None
+            self.speed = 0.0
+        else:
+            center = _center(ball_bbox)
+            if self.last_center is not None and now > self.last_center_at:
+                dx = center[0] - self.last_center[0]
+                dy = center[1] - self.last_center[1]
+                instant_speed = math.hypot(dx, dy) / (now - self.last_center_at)
+                self.speed = 0.5 * self.speed + 0.5 * instant_speed
+            self.last_center, self.last_center_at = center, now
+
+            urgency = min(self.speed / self.fast_speed, 1.0)
+            if target_bbox is not None:
+                distance = distance_to_box(center[0], center[1], target_bbox)
+                urgency = max(urgency, 1.0 - min(distance / self.near_distance, 1.0))
+
+        calm = ball_bbox is None or (self.speed < self.idle_speed and urgency == 0.0)
+        if not calm:
+            self.calm_since = None
+        elif self.calm_since is None:
+            self.calm_since = now
+
+        if self.calm_since is not None and now - self.calm_since >= self.idle_after:
+            self.mode = "idle"
+            interval = self.idle_interval
+        else:
+            self.mode = "fast" if urgency >= 0.5 else "active"
+            interval = self.active_interval - urgency * (self.active_interval - self.min_interval)
+
+        # Budget de calcul: pas plus d'une part `compute_budget` du temps en inférence
+        budget_interval = self.latency / self.compute_budget if self.compute_budget > 0 else 0.0
+        if budget_interval > interval:
+            self.mode = "budget"
+            interval = budget_interval
+        self.interval = max(interval, self.min_interval)
+
+    @property
+    def effective_rate(self) -> float:
+        """Fréquence de détection effective depuis le début (Hz)"""
+        if self.started_at is None or self.last_detection_at is None:
+            return 0.0
+        elapsed = self.last_detection_at - self.started_at
+        return (self.detections - 1) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        """Fréquence effective et économie par rapport à l'intervalle fixe de référence"""
+        baseline_rate = 1.0 / self.baseline_interval
+        rate = self.effective_rate
+        return {
+            "mode": self.mode,
+            "interval_ms": round(self.interval * 1000, 1),
+            "effective_rate_hz": round(rate, 2),
+            "baseline_rate_hz": round(baseline_rate, 2),
+            "saved": round(1.0 - rate / baseline_rate, 3) if rate else 0.0,
+            "speed_px_s": round(self.speed, 1),
+            "latency_ms": round(self.latency * 1000, 1),
+            "frames": self.frames,
+            "detections": self.detections
+        }
+
+
+class FrameQualityController:
+    """
+    Résolution et qualité JPEG des frames envoyées, ajustées en boucle fermée
+
+    Les réglages forment une échelle de niveaux, du moins coûteux au plus
+    coûteux: pour chaque taille (plus grand côté) croissante, les qualités
+    JPEG croissantes. Descendre d'un niveau baisse d'abord la qualité, puis
+    la taille. Au-delà de la taille d'entrée du modèle, une frame ne fait
+    que coûter en bande passante et en décodage (le serveur la réduit): elle
+    est la taille maximale.
+
+    Après chaque résultat, l'aller-retour et la confiance de la détection
+    (moyennes glissantes) sont comparés à la latence cible du serveur:
+    - aller-retour au-dessus de la cible: un niveau plus bas;
+    - détections peu confiantes et un peu de marge de latence: un niveau plus haut;
+    - large marge de latence et détections pas franchement confiantes (ou
+      pas de ballon): un niveau plus haut.
+    Des détections confiantes avec une latence correcte gardent le niveau
+    courant: pas de bande passante dépensée sans gain. Un niveau n'est
+    changé qu'après `cooldown` résultats au même niveau, pour mesurer son
+    effet avant de bouger à nouveau.
+    """
+
+    def __init__(self, max_side: int = 640, latency_target: float = 0.15,
+                 scales: Sequence[float] = (0.5, 0.75, 1.0), qualities: Sequence[int] = (50, 70, 85),
+                 low_confidence: float = 0.5, high_confidence: float = 0.8, headroom: float = 0.6,
+                 cooldown: int = 3):
+        """
+        Args:
+            max_side: Plus grand côté maximal des frames (taille d'entrée du modèle)
+            latency_target: Aller-retour visé (s)
+            scales: Tailles proposées, en fraction de `max_side`
+            qualities: Qualités JPEG proposées
+            low_confidence: Confiance sous laquelle les détections sont jugées fragiles
+            high_confidence: Confiance au-dessus de laquelle le niveau courant suffit
+            headroom: Part de la cible sous laquelle la latence laisse de la marge
+            cooldown: Nombre de résultats entre deux changements de niveau
+        """
+        self.latency_target = latency_target
+        self.low_confidence = low_confidence
+        self.high_confidence = high_confidence
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.levels = [
+            (int(round(max_side * scale)), quality)
+            for scale in sorted(scales) for quality in sorted(qualities)
+        ]
+        # Départ au niveau le plus haut: le premier aller-retour dira s'il est tenable
+        self.level = len(self.levels) - 1
+
+        self.latency = 0.0
+        self.confidence: Optional[float] = None
+        self.results_at_level = 0
+
+        # Compteurs
+        self.results = 0
+        self.upgrades = 0
+        self.downgrades = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], **kwargs) -> "FrameQualityController":
+        """Contrôleur réglé d'après `GET /config` du serveur (valeurs par défaut sans config)"""
+        if config:
+            kwargs.setdefault("max_side", config["model_input_size"])
+            kwargs.setdefault("latency_target", config["latency_target_ms"] / 1000)
+            quality = config.get("jpeg_quality")
+            if quality:
+                kwargs.setdefault("qualities", (quality["min"], (quality["min"] + quality["max"]) // 2, quality["max"]))
+        return cls(**kwargs)
+
+    @property
+    def max_side(self) -> int:
+        return self.levels[self.level][0]
+
+    @property
+    def quality(self) -> int:
+        return self.levels[self.level][1]
+
+    def settings(self) -> dict:
+        """Réglages courants (à joindre aux résultats)"""
+        return {"level": self.level, "max_side": self.max_side, "jpeg_quality": self.quality}
+
+    def encode(self, frame) -> Tuple[bytes, float]:
+        """
+        Réduit et encode une frame avec les réglages courants
+
+        Returns:
+            Tuple (JPEG, facteur d'échelle frame envoyée / frame d'origine):
+            les coordonnées envoyées (cible) sont multipliées par ce facteur,
+            celles reçues (ballon) divisées
+        """
+        height, width = frame.shape[:2]
+        scale = min(self.max_side / max(width, height), 1.0)
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(round(width * scale)), int(round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        _, encoded = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        return encoded.tobytes(), scale
+
+    def observe(self, latency: float, confidence: Optional[float]):
+        """
+        Rapporte le résultat d'une frame
+
+        Args:
+            latency: Aller-retour de la requête (s)
+            confidence: Confiance du ballon le plus confiant, None sans ballon
+        """
+        self.results += 1
+        self.results_at_level += 1
+        self.latency = latency if self.results == 1 else 0.7 * self.latency + 0.3 * latency
+        if confidence is not None:
+            self.confidence = confidence if self.confidence is None else 0.7 * self.confidence + 0.3 * confidence
+        elif self.confidence is not None:
+            # Pas de ballon: la confiance moyenne ne reflète plus la scène
+            self.confidence = None
+
+        if self.results_at_level < self.cooldown:
+            return
+        if self.latency > self.latency_target:
+            self._move(-1)
+        elif self.confidence is not None and self.confidence < self.low_confidence and (
+            # Marge plus étroite que pour une montée sans détection fragile
+            self.latency < (1 + self.headroom) / 2 * self.latency_target
+        ):
+            self._move(1)
+        elif self.latency < self.headroom * self.latency_target and (
+            self.confidence is None or self.confidence < self.high_confidence
+        ):
+            self._move(1)
+
+    def _move(self, step: int):
+        level = min(max(self.level + step, 0), len(self.levels) - 1)
+        if level == self.level:
+            return
+        self.level = level
+        self.results_at_level = 0
+        if step > 0:
+            self.upgrades += 1
+        else:
+            self.downgrades += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.settings(),
+            "latency_ms": round(self.latency * 1000, 1),
+            "latency_target_ms": round(self.latency_target * 1000, 1),
+            "confidence": round(self.confidence, 3) if self.confidence is not None else None,
+            "results": self.results,
+            "upgrades": self.upgrades,
+            "downgrades": self.downgrades
+        }
@@ -0,0 +1,176 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from tracking import BallTracker
+
+Box = Tuple[float, float, float, float]
+# Fenêtre de recadrage en pixels entiers (x1, y1, x2, y2), x2/y2 exclus
+Window = Tuple[int, int, int, int]
+
+# Taille du ballon supposée tant qu'aucune détection n'a été mesurée (pixels)
+DEFAULT_BALL_SIZE = 50
+
+
+def roi_window(center_x: float, center_y: float, vx: float, vy: float, ball_size: float,
+               frame_width: int, frame_height: int, min_size: int = 320,
+               margin: float = 1.5, velocity_gain: float = 2.0) -> Window:
+    """
+    Fenêtre de recherche autour de la position prédite du ballon
+
+    La demi-largeur vaut la taille du ballon élargie de `margin`, plus
+    `velocity_gain` frames de déplacement sur chaque axe: plus le ballon va
+    vite, plus la fenêtre est grande. Elle fait au moins `min_size` de côté
+    (l'entrée du modèle, pour ne pas agrandir le recadrage) et reste dans l'image.
+
+    Args:
+        center_x, center_y: Position prédite du centre du ballon
+        vx, vy: Vitesse estimée (pixels par frame)
+        ball_size: Taille du ballon (pixels)
+        frame_width, frame_height: Dimensions de la frame
+        min_size: Côté minimal de la fenêtre
+        margin: Marge autour du ballon, en tailles de ballon
+        velocity_gain: Nombre de frames de déplacement couvertes par la marge
+
+    Returns:
+        Fenêtre (x1, y1, x2, y2)
+    """
+    base = ball_size * (0.5 + margin)
+    half_width = max(base + velocity_gain * abs(vx), min_size / 2)
+    half_height = max(base + velocity_gain * abs(vy), min_size / 2)
+
+    width = min(int(round(2 * half_width)), frame_width)
+    height = min(int(round(2 * half_height)), frame_height)
+    # Décaler la fenêtre plutôt que la rogner quand elle dépasse du bord
+    x1 = min(max(int(round(center_x - width / 2)), 0), frame_width - width)
+    y1 = min(max(int(round(center_y - height / 2)), 0), frame_height - height)
+    return x1, y1, x1 + width, y1 + height
+
+
+def crop_frame(frame: np.ndarray, window: Window) -> np.ndarray:
+    """Recadrage de la frame sur la fenêtre (vue NumPy, sans copie)"""
+    x1, y1, x2, y2 = window
+    return frame[y1:y2, x1:x2]
+
+
+def to_frame_coordinates(box: Box, window: Window) -> Box:
+    """Ramène une bbox détectée dans le recadrage aux coordonnées de la frame"""
+    x1, y1 = window[0], window[1]
+    return box[0] + x1, box[1] + y1, box[2] + x1, box[3] + y1
+
+
+class RoiTracker:
+    """
+    Inférence guidée par le suivi du ballon (région d'intérêt)
+
+    Tant que le ballon est suivi, la détection tourne sur un recadrage autour
+    de la position prédite par le filtre de Kalman, à une taille d'entrée
+    réduite. Si la détection du recadrage manque ou est peu confiante, la
+    frame entière est analysée; après `max_misses` frames sans ballon, le
+    suivi est réinitialisé et seules des frames entières sont analysées
+    jusqu'à la prochaine détection.
+
+    Indépendant du modèle: l'appelant demande la fenêtre (`window`), lance
+    l'inférence, puis rapporte le résultat (`accept`, `observe`).
+    """
+
+    def __init__(self, input_size: int = 320, min_confidence: float = 0.5, max_misses: int = 3,
+                 margin: float = 1.5, velocity_gain: float = 2.0, tracker=None):
+        """
+        Args:
+            input_size: Taille d'entrée du modèle pour les recadrages
+            min_confidence: Confiance minimale d'une détection sur le recadrage
+            max_misses: Nombre de frames sans ballon avant de perdre le suivi
+            margin: Marge autour du ballon, en tailles de ballon
+            velocity_gain: Nombre de frames de déplacement couvertes par la marge
+            tracker: Filtre de suivi (`BallTracker` ou `SharedTrack`), un
+                `BallTracker` propre par défaut
+        """
+        self.input_size = input_size
+        self.min_confidence = min_confidence
+        self.max_misses = max_misses
+        self.margin = margin
+        self.velocity_gain = velocity_gain
+
+        self.tracker = tracker if tracker is not None else BallTracker()
+        self.ball_size = DEFAULT_BALL_SIZE
+        self.misses = 0
+
+        # Compteurs
+        self.roi_frames = 0
+        self.full_frames = 0
+        self.fallbacks = 0
+
+    @property
+    def tracking(self) -> bool:
+        return self.tracker.is_initialized and self.misses < self.max_misses
+
+    def window(self, frame_width: int, frame_height: int) -> Optional[Window]:
+        """
+        Fenêtre à analyser pour la prochaine frame
+
+        Returns:
+            Fenêtre (x1, y1, x2, y2), ou None pour analyser la frame entière
+        """
+        if not self.tracking:
+            return None
+        state = self.tracker.predict_state()
+        if state is None:
+            return None
+        x, y, vx, vy = state
+        window = roi_window(x, y, vx, vy, self.ball_size, frame_width, frame_height,
+                            self.input_size, self.margin, self.velocity_gain)
+        if window == (0, 0, frame_width, frame_height):
+            # Frame plus petite que l'entrée du recadrage: aucun gain
+            return None
+        return window
+
+    def accept(self, box: Optional[Box], confidence: float) -> bool:
+        """
+        Décide si la détection sur le recadrage est retenue
+
+        Une détection absente ou sous `min_confidence` déclenche l'analyse de
+        la frame entière.
+        """
+        self.roi_frames += 1
+        if box is not None and confidence >= self.min_confidence:
+            return True
+        self.fallbacks += 1
+        return False
+
+    def observe(self, box: Optional[Box], full_frame: bool = False):
+        """
+        Met à jour le suivi avec la détection retenue pour la frame
+
+        Args:
+            box: Bbox dans les coordonnées de la frame, ou None si aucun ballon
+            full_frame: La détection vient d'une analyse de la frame entière
+        """
+        if full_frame:
+            self.full_frames += 1
+
+        if box is None:
+            self.misses += 1
+            if self.tracker.is_initialized:
+                if self.misses >= self.max_misses:
+                    # Suivi perdu: repartir de zéro à la prochaine détection
+                    self.tracker.reset()
+                else:
+                    self.tracker.update(None)
+            return
+
+        self.misses = 0
+        self.ball_size = max(box[2] - box[0], box[3] - box[1])
+        self.tracker.update({"x1": box[0], "y1": box[1], "x2": box[2], "y2": box[3]})
+
+    def close(self):
+        """Libère le filtre de suivi (piste du suivi partagé)"""
+        self.tracker.retire()
+
+    def stats(self) -> dict:
+        return {
+            "tracking": self.tracking,
+            "roi_frames": self.roi_frames,
+            "full_frames": self.full_frames,
+            "fallbacks": self.fallbacks
+        }
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Optional
+
+
+class LatestFrameSlot:
+    """
+    Emplacement à une seule frame pour une session de streaming
+
+    Une nouvelle frame écrase celle qui n'a pas encore été traitée : le
+    serveur traite toujours la frame la plus récente au lieu d'accumuler
+    du retard quand le client envoie plus vite que l'inférence.
+    """
+
+    def __init__(self):
+        self._item: Optional[Any] = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item: Any):
+        """Dépose une frame (la frame précédente non traitée est abandonnée)"""
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self.received += 1
+        self._event.set()
+
+    def close(self):
+        """Ferme l'emplacement: `get` renvoie None une fois vidé"""
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> Optional[Any]:
+        """
+        Attend et retire la frame la plus récente
+
+        Returns:
+            La frame, ou None si l'emplacement est fermé
+        """
+        while self._item is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+
+        item = self._item
+        self._item = None
+        return item
@@ -8,15 +8,10 @@ current_dir = Path(__file__).parent
 IMAGE_PATH = current_dir / "WIN_20250712_14_23_15_Pro.jpg"
 API_URL = "http://localhost:8000/detect_ball"
 
-# Définition des deux bbox cibles
-target_bbox_left = {"x1": 50, "y1": 300, "x2": 150, "y2": 400}
-target_bbox_right = {"x1": 490, "y1": 300, "x2": 590, "y2": 400}
-
-# Commencer avec la cible gauche
-current_target = target_bbox_left
+# Cible testée (cible gauche du Touch & Dash)
+current_target = {"x1": 50, "y1": 300, "x2": 150, "y2": 400}
 
 def main():
-    global current_target
     # Lecture de l'image
     if not IMAGE_PATH.exists():
         print(f"❌ Image non trouvée: {IMAGE_PATH}")
@@ -61,10 +56,9 @@ def main():
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                 
                 # Vérifier si le ballon atteint la cible
-                if "reaches_target" in result and result["reaches_target"]:
-                    print("🎯 Cible atteinte ! Changement de côté...")
-                    # Alterner la cible
-                    current_target = target_bbox_right if current_target == target_bbox_left else target_bbox_left
+                # Image seule: pas d'alternance des cibles (gérée par les sessions du serveur)
+                if result.get("reaches_target"):
+                    print("🎯 Cible atteinte !")
                 
                 print("✅ Ballon détecté!")
             else:
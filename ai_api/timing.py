@@ -0,0 +1,68 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+class StageTimings:
+    """
+    Temps cumulés par étape de traitement (lecture, décodage, inférence, ...)
+
+    Avec `histogram` (metrics.Histogram étiqueté par étape), chaque durée
+    est aussi ajoutée à l'histogramme exporté sur `/metrics`.
+    """
+
+    def __init__(self, histogram=None):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, List[float]] = {}
+        self.histogram = histogram
+
+    def record(self, stage: str, duration_ms: float):
+        """Enregistre la durée d'une étape (ms)"""
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                # [nombre, total, max, dernière valeur]
+                entry = self._stages[stage] = [0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += duration_ms
+            entry[2] = max(entry[2], duration_ms)
+            entry[3] = duration_ms
+        if self.histogram is not None:
+            self.histogram.observe(duration_ms / 1000, stage)
+
+    def stats(self) -> dict:
+        """Retourne le nombre de mesures et les durées moyenne / max / dernière par étape"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "mean_ms": round(total / count, 3) if count else 0.0,
+                    "max_ms": round(max_ms, 3),
+                    "last_ms": round(last_ms, 3)
+                }
+                for stage, (count, total, max_ms, last_ms) in self._stages.items()
+            }
+
+
+class FrameTimer:
+    """Chronométrage des étapes d'une seule frame"""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - start_time) * 1000))
+
+    def report_to(self, timings: StageTimings):
+        for name, duration_ms in self.stages:
+            timings.record(name, duration_ms)
+
+    def server_timing(self) -> str:
+        """Valeur de l'en-tête HTTP Server-Timing"""
+        return ", ".join(f"{name};dur={duration_ms:.2f}" for name, duration_ms in self.stages)
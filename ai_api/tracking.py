@@ -0,0 +1,452 @@
+import struct
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[float, float, float, float]
+
+# Modèle à vitesse constante, partagé par BallTracker et BatchedBallTracker
+# État: [x, y, vx, vy] (position et vitesse)
+TRANSITION = np.array([
+    [1, 0, 1, 0],  # x = x + vx
+    [0, 1, 0, 1],  # y = y + vy
+    [0, 0, 1, 0],  # vx = vx
+    [0, 0, 0, 1]   # vy = vy
+], np.float32)
+
+# Matrice de covariance du processus (bruit du modèle)
+PROCESS_NOISE = np.array([
+    [1, 0, 0, 0],
+    [0, 1, 0, 0],
+    [0, 0, 10, 0],
+    [0, 0, 0, 10]
+], np.float32) * 0.1
+
+# Matrice de covariance de la mesure (bruit de l'observation)
+MEASUREMENT_NOISE = np.array([
+    [10, 0],
+    [0, 10]
+], np.float32)
+
+# Chemin scalaire de BatchedBallTracker.update_one: diagonales des bruits et
+# lignes des tableaux float32 (état, covariance, mesure) lues et écrites en place
+_PROCESS_NOISE_DIAGONAL = np.diag(PROCESS_NOISE).tolist()
+_MEASUREMENT_NOISE_DIAGONAL = np.diag(MEASUREMENT_NOISE).tolist()
+_STATE_ROW = struct.Struct("4f")
+_COVARIANCE_ROW = struct.Struct("16f")
+_POINT_ROW = struct.Struct("2f")
+
+
+class BallTracker:
+    """Classe pour le suivi du ballon avec filtre de Kalman"""
+    
+    def __init__(self):
+        # Initialiser le filtre de Kalman
+        # État: [x, y, vx, vy] (position et vitesse)
+        self.kalman = cv2.KalmanFilter(4, 2, 0)
+        
+        # Matrice de transition (modèle de mouvement)
+        self.kalman.transitionMatrix = TRANSITION.copy()
+        
+        # Matrice de mesure (on observe seulement x et y)
+        self.kalman.measurementMatrix = np.array([
+            [1, 0, 0, 0],
+            [0, 1, 0, 0]
+        ], np.float32)
+        
+        # Bruits du modèle et de l'observation
+        self.kalman.processNoiseCov = PROCESS_NOISE.copy()
+        self.kalman.measurementNoiseCov = MEASUREMENT_NOISE.copy()
+        
+        # État initial
+        self.kalman.statePre = np.array([[0], [0], [0], [0]], np.float32)
+        self.kalman.statePost = np.array([[0], [0], [0], [0]], np.float32)
+        
+        self.last_measurement = None
+        self.is_initialized = False
+        
+    def update(self, ball_bbox):
+        """Met à jour le filtre avec une nouvelle détection"""
+        if ball_bbox is None:
+            # Pas de détection, prédire seulement
+            prediction = self.kalman.predict()
+            return {
+                "x": int(prediction[0, 0]),
+                "y": int(prediction[1, 0]),
+                "vx": float(prediction[2, 0]),
+                "vy": float(prediction[3, 0]),
+                "is_prediction": True
+            }
+        
+        # Calculer le centre du ballon
+        center_x = (ball_bbox["x1"] + ball_bbox["x2"]) / 2
+        center_y = (ball_bbox["y1"] + ball_bbox["y2"]) / 2
+        
+        # Mesure actuelle
+        measurement = np.array([[center_x], [center_y]], np.float32)
+        
+        if not self.is_initialized:
+            # Première détection, initialiser le filtre
+            self.kalman.statePre = np.array([[center_x], [center_y], [0], [0]], np.float32)
+            self.kalman.statePost = np.array([[center_x], [center_y], [0], [0]], np.float32)
+            self.is_initialized = True
+            self.last_measurement = measurement
+            return {
+                "x": int(center_x),
+                "y": int(center_y),
+                "vx": 0,
+                "vy": 0,
+                "is_prediction": False
+            }
+        
+        # Prédire l'état suivant
+        prediction = self.kalman.predict()
+        
+        # Corriger avec la mesure
+        correction = self.kalman.correct(measurement)
+        
+        # Calculer la vitesse (différence avec la mesure précédente)
+        if self.last_measurement is not None:
+            vx = measurement[0] - self.last_measurement[0]
+            vy = measurement[1] - self.last_measurement[1]
+        else:
+            vx = vy = 0
+        
+        self.last_measurement = measurement
+        
+        return {
+            "x": int(correction[0, 0]),
+            "y": int(correction[1, 0]),
+            "vx": vx[0],
+            "vy": vy[0],
+            "is_prediction": False
+        }
+    
+    def predict_state(self):
+        """
+        Position et vitesse attendues à la prochaine mesure, sans modifier le filtre
+        
+        Returns:
+            Tuple (x, y, vx, vy) ou None si le filtre n'est pas initialisé
+        """
+        if not self.is_initialized:
+            return None
+        
+        state = self.kalman.transitionMatrix @ self.kalman.statePost
+        return float(state[0, 0]), float(state[1, 0]), float(state[2, 0]), float(state[3, 0])
+    
+    def reset(self):
+        """Repart d'un filtre non initialisé (suivi perdu)"""
+        self.__init__()
+    
+    def retire(self):
+        """Rien à libérer: le filtre appartient à ce seul objet"""
+    
+    def get_predicted_bbox(self, ball_size=50):
+        """Retourne la bbox prédite basée sur l'état du filtre"""
+        if not self.is_initialized:
+            return None
+        
+        prediction = self.kalman.predict()
+        x, y = int(prediction[0, 0]), int(prediction[1, 0])
+        
+        return {
+            "x1": x - ball_size // 2,
+            "y1": y - ball_size // 2,
+            "x2": x + ball_size // 2,
+            "y2": y + ball_size // 2
+        }
+
+
+class BatchedBallTracker:
+    """
+    Suivi de nombreux ballons (un par session), en une étape vectorisée
+
+    Même filtre que `BallTracker`, mais l'état de toutes les pistes est
+    rangé dans des tableaux NumPy contigus (état, covariance, dernière
+    mesure, heure de la dernière mesure): une seule étape prédiction /
+    correction traite toutes les pistes mises à jour, sans appel OpenCV ni
+    dict par piste. Une piste est un indice de ligne (`add`), réutilisé
+    après `retire`; les tableaux doublent de taille quand ils sont pleins.
+    Une piste seule (frame d'une session de l'API) passe par `update_one`,
+    chemin scalaire sur sa ligne des tableaux.
+
+    Les résultats sont ceux de `BallTracker` (float32, mêmes étapes), aux
+    arrondis près: `int(x)`, `int(y)` donnent les positions renvoyées par
+    `BallTracker.update`, à un pixel près quand la valeur tombe à quelques
+    ulp d'un entier.
+    """
+
+    def __init__(self, capacity: int = 64):
+        """
+        Args:
+            capacity: Nombre de pistes réservées au départ
+        """
+        self.state = np.zeros((capacity, 4), np.float32)
+        self.covariance = np.zeros((capacity, 4, 4), np.float32)
+        self.last_measurement = np.zeros((capacity, 2), np.float32)
+        self.last_seen = np.zeros(capacity)
+        self.initialized = np.zeros(capacity, bool)
+        self.active = np.zeros(capacity, bool)
+        self._free = list(range(capacity - 1, -1, -1))
+        self._map_rows()
+
+    @property
+    def capacity(self) -> int:
+        return len(self.state)
+
+    def __len__(self) -> int:
+        return self.capacity - len(self._free)
+
+    def _grow(self):
+        capacity = self.capacity
+        for name in ("state", "covariance", "last_measurement", "last_seen", "initialized", "active"):
+            array = getattr(self, name)
+            grown = np.zeros((2 * capacity,) + array.shape[1:], array.dtype)
+            grown[:capacity] = array
+            setattr(self, name, grown)
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+        self._map_rows()
+
+    def _map_rows(self):
+        """Vues mémoire des tableaux pour `update_one` (à refaire après `_grow`)"""
+        self._state_buffer = self.state.data.cast("B")
+        self._covariance_buffer = self.covariance.data.cast("B")
+        self._measurement_buffer = self.last_measurement.data.cast("B")
+
+    def add(self, now: Optional[float] = None) -> int:
+        """
+        Crée une piste (filtre non initialisé, comme un nouveau `BallTracker`)
+
+        Returns:
+            Indice de la piste
+        """
+        if not self._free:
+            self._grow()
+        track = self._free.pop()
+        self.state[track] = 0
+        self.covariance[track] = 0
+        self.last_measurement[track] = 0
+        self.last_seen[track] = time.monotonic() if now is None else now
+        self.initialized[track] = False
+        self.active[track] = True
+        return track
+
+    def retire(self, track: int):
+        """Libère une piste (son indice sera réutilisé)"""
+        if self.active[track]:
+            self.active[track] = False
+            self._free.append(track)
+
+    def update(self, tracks: Iterable[int], boxes: np.ndarray,
+               now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Met à jour plusieurs pistes en une étape (équivalent de `BallTracker.update`)
+
+        Args:
+            tracks: Indices des pistes, sans doublon
+            boxes: Tableau (K, 4) des bbox détectées (x1, y1, x2, y2), ligne
+                de NaN pour une piste sans détection (prédiction seule)
+            now: Heure des mesures
+
+        Returns:
+            Tuple (tableau (K, 4) [x, y, vx, vy], tableau (K,) booléen is_prediction)
+        """
+        now = time.monotonic() if now is None else now
+        tracks = np.asarray(tracks, np.intp)
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        centers = np.stack(
+            [(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1
+        ).astype(np.float32)
+        measured = ~np.isnan(centers).any(axis=1)
+        initialized = self.initialized[tracks]
+        result = np.empty((len(tracks), 4), np.float32)
+
+        # Prédiction: pistes sans mesure et pistes initialisées avec mesure
+        predicted = ~(measured & ~initialized)
+        rows = tracks[predicted]
+        state = self.state[rows] @ TRANSITION.T
+        covariance = TRANSITION @ self.covariance[rows] @ TRANSITION.T + PROCESS_NOISE
+
+        # Correction des pistes mesurées (mesure: x, y)
+        corrected = measured[predicted]
+        if corrected.any():
+            cov = covariance[corrected]
+            innovation_cov = cov[:, :2, :2] + MEASUREMENT_NOISE
+            a, b = innovation_cov[:, 0, 0], innovation_cov[:, 0, 1]
+            c, d = innovation_cov[:, 1, 0], innovation_cov[:, 1, 1]
+            inverse = np.stack([np.stack([d, -b], -1), np.stack([-c, a], -1)], 1) / (a * d - b * c)[:, None, None]
+            gain = cov[:, :, :2] @ inverse
+            measurement = centers[predicted][corrected]
+            innovation = measurement - state[corrected, :2]
+            state[corrected] += (gain @ innovation[:, :, None])[:, :, 0]
+            covariance[corrected] = cov - gain @ cov[:, :2, :]
+
+        self.state[rows] = state
+        self.covariance[rows] = covariance
+        result[predicted] = state
+
+        # Vitesse renvoyée après une mesure: écart avec la mesure précédente
+        measured_rows = measured & initialized
+        result[measured_rows, 2:] = centers[measured_rows] - self.last_measurement[tracks[measured_rows]]
+
+        # Première mesure: position mesurée, vitesse nulle, covariance inchangée
+        starting = measured & ~initialized
+        start_rows = tracks[starting]
+        self.state[start_rows, :2] = centers[starting]
+        self.state[start_rows, 2:] = 0
+        self.initialized[start_rows] = True
+        result[starting, :2] = centers[starting]
+        result[starting, 2:] = 0
+
+        self.last_measurement[tracks[measured]] = centers[measured]
+        self.last_seen[tracks[measured]] = now
+        return result, ~measured
+
+    def update_one(self, track: int, box: Optional[Box] = None,
+                   now: Optional[float] = None) -> Tuple[List[float], bool]:
+        """
+        Met à jour une seule piste (équivalent de `update` pour une piste)
+
+        Chemin rapide des sessions de l'API, dont les frames arrivent une par
+        une: à cette taille, le coût d'appel des opérations NumPy dépasse le
+        calcul lui-même. Le filtre est déroulé en flottants Python sur la ligne
+        de la piste, puis réécrit dans les tableaux; les résultats sont ceux
+        de `update` aux arrondis float32 près.
+
+        Args:
+            track: Indice de la piste
+            box: Bbox détectée (x1, y1, x2, y2), ou None (prédiction seule)
+            now: Heure de la mesure
+
+        Returns:
+            Tuple ([x, y, vx, vy], is_prediction)
+        """
+        state_offset = track * _STATE_ROW.size
+        measurement_offset = track * _POINT_ROW.size
+        if box is not None:
+            center_x, center_y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+            self.last_seen[track] = time.monotonic() if now is None else now
+            if not self.initialized[track]:
+                # Première mesure: position mesurée, vitesse nulle, covariance inchangée
+                _STATE_ROW.pack_into(self._state_buffer, state_offset, center_x, center_y, 0, 0)
+                self.initialized[track] = True
+                _POINT_ROW.pack_into(self._measurement_buffer, measurement_offset, center_x, center_y)
+                return [center_x, center_y, 0.0, 0.0], False
+
+        # Prédiction (modèle à vitesse constante): x += vx, y += vy, P = F P Fᵀ + Q
+        x, y, vx, vy = _STATE_ROW.unpack_from(self._state_buffer, state_offset)
+        state = [x + vx, y + vy, vx, vy]
+        covariance_offset = track * _COVARIANCE_ROW.size
+        (p00, p01, p02, p03, p10, p11, p12, p13,
+         p20, p21, p22, p23, p30, p31, p32, p33) = _COVARIANCE_ROW.unpack_from(self._covariance_buffer, covariance_offset)
+        q0, q1, q2, q3 = _PROCESS_NOISE_DIAGONAL
+        cov = [
+            [p00 + p20 + p02 + p22 + q0, p01 + p21 + p03 + p23, p02 + p22, p03 + p23],
+            [p10 + p30 + p12 + p32, p11 + p31 + p13 + p33 + q1, p12 + p32, p13 + p33],
+            [p20 + p22, p21 + p23, p22 + q2, p23],
+            [p30 + p32, p31 + p33, p32, p33 + q3]
+        ]
+
+        if box is not None:
+            # Correction avec la mesure (x, y): gain K = P[:, :2] S⁻¹, P -= K P[:2, :]
+            top, bottom = cov[0], cov[1]
+            a, b = top[0] + _MEASUREMENT_NOISE_DIAGONAL[0], top[1]
+            c, d = bottom[0], bottom[1] + _MEASUREMENT_NOISE_DIAGONAL[1]
+            det = a * d - b * c
+            innovation_x, innovation_y = center_x - state[0], center_y - state[1]
+            corrected = []
+            for i, row in enumerate(cov):
+                gain_x = (row[0] * d - row[1] * c) / det
+                gain_y = (row[1] * a - row[0] * b) / det
+                state[i] += gain_x * innovation_x + gain_y * innovation_y
+                corrected.append([
+                    row[0] - gain_x * top[0] - gain_y * bottom[0],
+                    row[1] - gain_x * top[1] - gain_y * bottom[1],
+                    row[2] - gain_x * top[2] - gain_y * bottom[2],
+                    row[3] - gain_x * top[3] - gain_y * bottom[3]
+                ])
+            cov = corrected
+
+        _STATE_ROW.pack_into(self._state_buffer, state_offset, *state)
+        _COVARIANCE_ROW.pack_into(self._covariance_buffer, covariance_offset, *cov[0], *cov[1], *cov[2], *cov[3])
+        if box is None:
+            return state, True
+
+        # Vitesse renvoyée après une mesure: écart avec la mesure précédente
+        last_x, last_y = _POINT_ROW.unpack_from(self._measurement_buffer, measurement_offset)
+        _POINT_ROW.pack_into(self._measurement_buffer, measurement_offset, center_x, center_y)
+        return [state[0], state[1], center_x - last_x, center_y - last_y], False
+
+    def predict_state(self, tracks: Iterable[int]) -> np.ndarray:
+        """
+        Position et vitesse attendues à la prochaine mesure, sans modifier les filtres
+
+        Returns:
+            Tableau (K, 4) [x, y, vx, vy], lignes de NaN pour les pistes non initialisées
+        """
+        tracks = np.asarray(tracks, np.intp)
+        predicted = self.state[tracks] @ TRANSITION.T
+        predicted[~self.initialized[tracks]] = np.nan
+        return predicted
+
+    def stats(self) -> dict:
+        return {"capacity": self.capacity, "active": len(self)}
+
+
+class SharedTrack:
+    """
+    Piste d'un `BatchedBallTracker` partagé, avec l'interface de `BallTracker`
+
+    Permet aux sessions de l'API (`RoiTracker`, `MotionGate`) de ranger
+    l'état de leur ballon dans les tableaux du suivi partagé au lieu d'un
+    `cv2.KalmanFilter` par session. La piste est créée à la construction et
+    doit être libérée par `retire` quand la session se termine ou expire.
+    """
+
+    def __init__(self, engine: BatchedBallTracker):
+        self.engine = engine
+        self.track = engine.add()
+
+    @property
+    def is_initialized(self) -> bool:
+        return self.track is not None and bool(self.engine.initialized[self.track])
+
+    def update(self, ball_bbox):
+        """Met à jour la piste avec une nouvelle détection (voir `BallTracker.update`)"""
+        box = None
+        if ball_bbox is not None:
+            box = (ball_bbox["x1"], ball_bbox["y1"], ball_bbox["x2"], ball_bbox["y2"])
+        (x, y, vx, vy), is_prediction = self.engine.update_one(self.track, box)
+        return {
+            "x": int(x),
+            "y": int(y),
+            "vx": vx,
+            "vy": vy,
+            "is_prediction": is_prediction
+        }
+
+    def predict_state(self):
+        """
+        Position et vitesse attendues à la prochaine mesure, sans modifier la piste
+
+        Returns:
+            Tuple (x, y, vx, vy) ou None si la piste n'est pas initialisée
+        """
+        if not self.is_initialized:
+            return None
+        x, y, vx, vy = (TRANSITION @ self.engine.state[self.track]).tolist()
+        return x, y, vx, vy
+
+    def reset(self):
+        """Repart d'une piste non initialisée (suivi perdu), sur une nouvelle ligne"""
+        self.retire()
+        self.track = self.engine.add()
+
+    def retire(self):
+        """Libère la ligne de la piste dans le suivi partagé"""
+        if self.track is not None:
+            self.engine.retire(self.track)
+            self.track = None
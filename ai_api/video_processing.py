@@ -0,0 +1,382 @@
+"""
+Traitement hors ligne d'une session enregistrée (vérification avant émission du SBT)
+
+Usage:
+    python video_processing.py session.mp4 --output session.events.jsonl
+    python video_processing.py session.mp4 --output session.events.parquet --batch-size 16
+
+La vidéo est décodée dans un thread de fond, les frames passent par batches
+dans le même détecteur que `/detect_ball`, puis dans les règles du Touch &
+Dash (horloge de la vidéo, pas de l'horloge murale). Le journal ne contient
+que les frames avec ballon et les événements de la session (touch, target,
+finished). La mémoire reste bornée quelle que soit la durée de la vidéo:
+seuls quelques batches de frames sont en vol à la fois et le journal est
+écrit au fil de l'eau.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from backends import create_backend, detections_array, select_detections
+from exercise import DEFAULT_DURATION_S, DEFAULT_TARGETS, TouchAndDashSession
+
+logger = logging.getLogger(__name__)
+
+# Frame décodée: (index dans la vidéo, horodatage en secondes, image BGR)
+VideoFrame = Tuple[int, float, np.ndarray]
+
+# Colonnes du journal d'événements (toutes optionnelles sauf frame, time_s et type)
+EVENT_FIELDS = ("frame", "time_s", "type", "x1", "y1", "x2", "y2", "confidence", "touches", "score", "side")
+EVENT_FORMATS = ("jsonl", "parquet")
+
+
+class VideoFrameReader:
+    """
+    Décodage d'une vidéo dans un thread de fond, par batches
+
+    Les batches décodés attendent dans une file bornée (`max_batches`): le
+    décodage prend de l'avance sur l'inférence sans jamais accumuler plus de
+    `(max_batches + 2) * batch_size` frames en mémoire. Avec `stride` > 1,
+    les frames intermédiaires sont sautées sans être converties en image.
+    """
+
+    def __init__(self, path: str, batch_size: int = 8, stride: int = 1, max_batches: int = 2):
+        if batch_size < 1 or stride < 1:
+            raise ValueError("batch_size et stride doivent être >= 1")
+        self.path = str(path)
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            raise ValueError(f"Impossible d'ouvrir la vidéo: {path}")
+
+        self.batch_size = batch_size
+        self.stride = stride
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+        self._queue: "queue.Queue[Optional[List[VideoFrame]]]" = queue.Queue(maxsize=max_batches)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+
+        # Compteurs
+        self.decoded = 0
+        self.skipped = 0
+        self.decode_s = 0.0
+
+    def timestamp(self, index: int) -> float:
+        """Horodatage d'une frame dans la vidéo (s)"""
+        if self.fps > 0:
+            return index / self.fps
+        return self.capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+    def start(self):
+        self._thread = threading.Thread(target=self._read_loop, name="video-decode", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        # Libérer le thread de décodage s'il attend une place dans la file
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def _put(self, item: Optional[List[VideoFrame]]) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_loop(self):
+        batch: List[VideoFrame] = []
+        index = 0
+        try:
+            while not self._stop.is_set():
+                start_time = time.perf_counter()
+                if index % self.stride:
+                    # Frame sautée: avancer sans convertir l'image
+                    if not self.capture.grab():
+                        break
+                    self.skipped += 1
+                    index += 1
+                    continue
+                ok, frame = self.capture.read()
+                self.decode_s += time.perf_counter() - start_time
+                if not ok:
+                    break
+                batch.append((index, self.timestamp(index), frame))
+                self.decoded += 1
+                index += 1
+                if len(batch) == self.batch_size:
+                    if not self._put(batch):
+                        return
+                    batch = []
+            if batch:
+                self._put(batch)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.capture.release()
+            self._put(None)
+
+    def batches(self) -> Iterator[List[VideoFrame]]:
+        """Batches de frames décodées, dans l'ordre de la vidéo"""
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield batch
+
+
+class JsonlEventLog:
+    """Journal d'événements JSON Lines (champs vides omis)"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._file = open(self.path, "w", encoding="utf-8", buffering=1 << 16)
+        self.records = 0
+
+    def write(self, record: dict):
+        compact = {key: value for key, value in record.items() if value is not None}
+        self._file.write(json.dumps(compact, separators=(",", ":")) + "\n")
+        self.records += 1
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetEventLog:
+    """Journal d'événements Parquet, écrit par groupes de lignes (pyarrow requis)"""
+
+    def __init__(self, path: str, row_group_size: int = 4096):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Le format parquet nécessite pyarrow (pip install pyarrow)")
+
+        self.path = str(path)
+        self.row_group_size = row_group_size
+        self._pa = pa
+        self._schema = pa.schema([
+            ("frame", pa.int64()), ("time_s", pa.float64()), ("type", pa.string()),
+            ("x1", pa.float32()), ("y1", pa.float32()), ("x2", pa.float32()), ("y2", pa.float32()),
+            ("confidence", pa.float32()), ("touches", pa.int32()), ("score", pa.int32()),
+            ("side", pa.string())
+        ])
+        self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._rows = {field: [] for field in EVENT_FIELDS}
+        self.records = 0
+
+    def write(self, record: dict):
+        for field in EVENT_FIELDS:
+            self._rows[field].append(record.get(field))
+        self.records += 1
+        if len(self._rows["frame"]) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows["frame"]:
+            return
+        self._writer.write_table(self._pa.Table.from_pydict(self._rows, schema=self._schema))
+        self._rows = {field: [] for field in EVENT_FIELDS}
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_event_log(path: str, event_format: Optional[str] = None):
+    """
+    Ouvre un journal d'événements
+
+    Args:
+        path: Fichier de sortie
+        event_format: "jsonl" ou "parquet" (déduit de l'extension par défaut)
+    """
+    if event_format is None:
+        event_format = "parquet" if Path(path).suffix == ".parquet" else "jsonl"
+    if event_format == "jsonl":
+        return JsonlEventLog(path)
+    if event_format == "parquet":
+        return ParquetEventLog(path)
+    raise ValueError(f"Format de journal inconnu: {event_format} (formats: {', '.join(EVENT_FORMATS)})")
+
+
+def event_record(index: int, timestamp: float, event: dict) -> dict:
+    """Ligne du journal pour un événement de session (cible: bbox dans x1..y2)"""
+    record = {
+        "frame": index,
+        "time_s": round(timestamp, 3),
+        "type": event["type"],
+        "touches": event.get("touches"),
+        "score": event.get("score"),
+        "side": event.get("side")
+    }
+    target = event.get("target_bbox")
+    if target is not None:
+        record.update(x1=target["x1"], y1=target["y1"], x2=target["x2"], y2=target["y2"])
+    return record
+
+
+def process_video(path: str, detect_batch: Callable[[List[np.ndarray]], List[np.ndarray]], log,
+                  targets: Sequence[Tuple[float, float, float, float]] = DEFAULT_TARGETS,
+                  duration: float = DEFAULT_DURATION_S, batch_size: int = 8, stride: int = 1,
+                  classes: Optional[Sequence[int]] = None, min_confidence: float = 0.0) -> dict:
+    """
+    Rejoue une session Touch & Dash enregistrée
+
+    Args:
+        path: Fichier vidéo (MP4...)
+        detect_batch: Détection sur une liste d'images, tableaux (N, 6) par image
+            (comme `detect_balls` de l'API)
+        log: Journal d'événements (`open_event_log`)
+        targets: Les deux cibles, dans les coordonnées de la vidéo
+        duration: Durée de la session (s, horloge de la vidéo)
+        batch_size: Nombre de frames par appel au détecteur
+        stride: Analyser une frame sur `stride`
+        classes, min_confidence: Sélection du ballon, comme pour /detect_ball
+
+    Returns:
+        Résumé: score, touches, événements, frames traitées et vitesse
+        par rapport au temps réel
+    """
+    session = TouchAndDashSession("video", targets, duration)
+    try:
+        reader = VideoFrameReader(path, batch_size=batch_size, stride=stride)
+    except Exception:
+        log.close()
+        raise
+    reader.start()
+    started_at = time.perf_counter()
+    inference_s = 0.0
+    processed = detections = 0
+    last_timestamp = 0.0
+    last_index = -1
+    events = []
+
+    def record_events(index: int, timestamp: float, frame_events: List[dict]):
+        for event in frame_events:
+            log.write(event_record(index, timestamp, event))
+            events.append(event)
+
+    try:
+        for batch in reader.batches():
+            inference_start = time.perf_counter()
+            results = detect_batch([frame for _, _, frame in batch])
+            inference_s += time.perf_counter() - inference_start
+
+            for (index, timestamp, _), frame_detections in zip(batch, results):
+                processed += 1
+                last_index, last_timestamp = index, timestamp
+                top = select_detections(frame_detections, classes, min_confidence, top_k=1)
+                ball_bbox = None
+                if len(top) > 0:
+                    x1, y1, x2, y2, confidence, _ = top[0].tolist()
+                    ball_bbox = (x1, y1, x2, y2)
+                    detections += 1
+                    log.write({
+                        "frame": index, "time_s": round(timestamp, 3), "type": "detection",
+                        "x1": round(x1, 1), "y1": round(y1, 1), "x2": round(x2, 1), "y2": round(y2, 1),
+                        "confidence": round(confidence, 3)
+                    })
+                record_events(index, timestamp, session.process_detection(ball_bbox, now=timestamp))
+                if session.finished:
+                    break
+            if session.finished:
+                break
+
+        if not session.finished:
+            # Vidéo plus courte que la session: fin à la dernière frame
+            record_events(last_index, last_timestamp, [session.finish(last_timestamp)])
+    finally:
+        reader.stop()
+        log.close()
+
+    processing_s = time.perf_counter() - started_at
+    video_s = last_timestamp + (1.0 / reader.fps if reader.fps > 0 else 0.0)
+    return {
+        "video": Path(path).name,
+        "fps": round(reader.fps, 2),
+        "frames_decoded": reader.decoded,
+        "frames_skipped": reader.skipped,
+        "frames_processed": processed,
+        "detections": detections,
+        "touches": session.touches,
+        "score": session.score,
+        "elapsed_s": round(session.elapsed(), 3),
+        "events": events,
+        "log_records": log.records,
+        "video_s": round(video_s, 3),
+        "processing_s": round(processing_s, 3),
+        "decode_s": round(reader.decode_s, 3),
+        "inference_s": round(inference_s, 3),
+        "realtime_factor": round(video_s / processing_s, 2) if processing_s > 0 else 0.0
+    }
+
+
+def parse_targets(value: Optional[str]) -> Sequence[Tuple[float, float, float, float]]:
+    """Cibles JSON: liste de deux bbox {"x1", "y1", "x2", "y2"} (cibles par défaut si vide)"""
+    if not value:
+        return DEFAULT_TARGETS
+    targets = json.loads(value)
+    if not isinstance(targets, list) or len(targets) != 2:
+        raise ValueError("Le Touch & Dash nécessite exactement deux cibles")
+    return [(float(t["x1"]), float(t["y1"]), float(t["x2"]), float(t["y2"])) for t in targets]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejoue une session Touch & Dash enregistrée et écrit son journal d'événements")
+    parser.add_argument("video", help="Fichier vidéo de la session (MP4...)")
+    parser.add_argument("--output", help="Journal d'événements (.jsonl ou .parquet, défaut: <vidéo>.events.jsonl)")
+    parser.add_argument("--format", choices=EVENT_FORMATS, help="Format du journal (déduit de l'extension par défaut)")
+    parser.add_argument("--weights", default=os.getenv("MODEL_PATH", "./models/best.pt"))
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "torch"))
+    parser.add_argument("--cache-dir", default=os.getenv("MODEL_CACHE_DIR") or None)
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("MODEL_INPUT_SIZE", "640")))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--stride", type=int, default=1, help="Analyser une frame sur N")
+    parser.add_argument("--targets", help="Cibles JSON: liste de deux bbox (cibles par défaut sinon)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_S, help="Durée de la session (s)")
+    parser.add_argument("--classes", type=int, nargs="*", help="Classes retenues (toutes par défaut)")
+    parser.add_argument("--min-confidence", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    output = args.output or str(Path(args.video).with_suffix(".events.jsonl"))
+
+    backend = create_backend(args.backend, args.weights, imgsz=args.imgsz, cache_dir=args.cache_dir)
+    backend.load()
+
+    def detect_batch(images: List[np.ndarray]) -> List[np.ndarray]:
+        return [detections_array(result) for result in backend.predict(images)]
+
+    summary = process_video(
+        args.video, detect_batch, open_event_log(output, args.format),
+        targets=parse_targets(args.targets), duration=args.duration,
+        batch_size=args.batch_size, stride=args.stride,
+        classes=args.classes or None, min_confidence=args.min_confidence
+    )
+    summary["log"] = output
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()